@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Index benchmarks
+----------------
+
+Timings for the main operations of ``pypiple.index.Index`` over synthetic
+package trees (see ``synthetic.py``):
+
+- ``cold_build``: first ``update`` of an empty index
+- ``noop_update``: ``update`` forced to scan the directory, without changes
+- ``scan`` and ``diff``: the steps of a no-op update in isolation
+- ``single_change_update``: ``update`` after publishing a new release
+- ``packages``: grouping the metadata by project
+- ``extract_version``: parsing all versions (memoization cleared)
+- ``render_collection`` and ``render_project``: rendering the simple index
+  and the page for the project with more files
+
+Peak memory is reported for a cold build (Python allocations, traced with
+``tracemalloc`` in a separate run, since tracing slows everything down)
+together with the maximum resident set size of the process.
+
+Results are written as JSON, and can be compared with a previous run
+(pypiple should be importable, e.g. installed with ``pip install -e .``)::
+
+    python benchmarks/bench_index.py --files 1000 10000 --output new.json
+    python benchmarks/bench_index.py --compare old.json new.json
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+
+from pypiple import __version__
+from pypiple import version as version_module
+from pypiple.handlers import SimpleCollectionHander, SimpleItemHandler
+from pypiple.index import Index
+from pypiple.records import Generation
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # pylint: disable=invalid-name
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'packages': '/packages'}
+
+
+def timed(function, *args, **kwargs):
+    """Call function, returning the elapsed time (seconds) and the result"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def best(function, repeat=3):
+    """Smallest elapsed time over a few calls of function"""
+    return min(timed(function)[0] for _ in range(repeat))
+
+
+def max_rss():
+    """Maximum resident set size of the process (bytes), if available"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def bench_tree(dirpath, files, workers=None, seed=0, memory=True):
+    """Run all benchmarks for a tree with the given number of files.
+
+    Keyword Arguments:
+        workers (int): processes used to decode packages
+        seed (int): seed used to generate the tree
+        memory (bool): trace memory allocations during a second cold build
+
+    Returns:
+        dict with timings (seconds) and memory usage (bytes)
+    """
+    synthetic.generate(dirpath, files, seed=seed)
+    results = {'files': files}
+
+    index = Index(dirpath, workers=workers)
+    results['cold_build'], _ = timed(index.update)
+    results['max_rss'] = max_rss()
+
+    if memory:  # => tracing is slow, use another index
+        tracemalloc.start()
+        Index(dirpath, workers=workers).update()
+        results['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def noop():
+        """Update forced to scan the whole directory"""
+        index.invalidate()
+        index.update()
+
+    results['noop_update'] = best(noop)
+    results['scan'], current = timed(index.scan)
+    results['diff'] = best(lambda: index.diff(current))
+
+    new = synthetic.add_release(dirpath, 'project-0', '999.0', seed=seed)
+    try:
+        # => the directory mtime might not reflect the change yet
+        index.invalidate([new])
+        results['single_change_update'], _ = timed(index.update)
+    finally:
+        os.remove(new)
+        index.invalidate([new])
+        index.update()
+
+    metadata = index.metadata
+    results['packages'] = best(lambda: Generation(metadata).packages)
+
+    def parse_versions():
+        """Parse all versions, without memoization"""
+        version_module._KEYS.clear()  # pylint: disable=protected-access
+        for data in metadata.values():
+            if data is not None:
+                version_module.version_key(data['version'])
+
+    results['extract_version'] = best(parse_versions)
+
+    generation = index.generation
+    collection = SimpleCollectionHander(index, MOUNT_POINTS, {})
+    project = SimpleItemHandler(index, MOUNT_POINTS, {})
+    largest = max(generation.packages,
+                  key=lambda name: len(generation.packages[name]))
+    results['render_collection'] = best(
+        lambda: collection.render(':response', generation))
+    results['render_project'] = best(
+        lambda: project.render(largest, generation))
+
+    index.close()
+    return results
+
+
+def compare(old, new):
+    """Print the relative change between two result files"""
+    with open(old) as file_:
+        before = {run['files']: run for run in json.load(file_)['runs']}
+    with open(new) as file_:
+        after = {run['files']: run for run in json.load(file_)['runs']}
+
+    for files in sorted(set(before) & set(after)):
+        print('{} files'.format(files))
+        for key in sorted(after[files]):
+            old_value = before[files].get(key)
+            new_value = after[files][key]
+            if key == 'files' or not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            print('  {:<22} {:>12.6g} -> {:<12.6g} ({:+.1f}%)'.format(
+                key, old_value, new_value, change))
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--files', type=int, nargs='+',
+                        default=[1000, 10000, 100000],
+                        help='sizes of the synthetic trees')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes used to decode packages')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the (slow) traced cold build')
+    parser.add_argument('--tree-dir', default=None,
+                        help='where trees are generated (and reused)')
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the results (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    tree_dir = args.tree_dir or os.path.join(
+        tempfile.gettempdir(), 'pypiple-benchmarks')
+    runs = []
+    for files in args.files:
+        dirpath = os.path.join(tree_dir, '{}-{}'.format(files, args.seed))
+        print('Benchmarking {} files...'.format(files), file=sys.stderr)
+        runs.append(bench_tree(dirpath, files, args.workers, args.seed,
+                               args.memory))
+
+    report = {
+        'pypiple': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'workers': args.workers,
+        'seed': args.seed,
+        'runs': runs,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file_:
+            file_.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP load test
+--------------
+
+Latency and throughput of the WSGI application built by
+``pypiple.app.application`` under concurrency, while the packages
+directory changes.
+
+The application is driven either in-process (calling the WSGI callable,
+no network involved) or over a local socket (``gevent.pywsgi`` server),
+by a pool of greenlets issuing a pip-like mix of requests:
+
+- ``index``: the simple index (``/simple/``)
+- ``project``: project pages (``/simple/<name>/``)
+- ``revalidate``: project pages with ``If-None-Match`` (304 expected)
+- ``download``: package files
+- ``metadata``: PEP 658 metadata files
+
+Meanwhile, a "publisher" greenlet adds and removes releases in the tree.
+Throughput and latency percentiles (overall and by request kind) are
+reported as JSON::
+
+    python benchmarks/load_test.py --files 10000 --duration 30 --socket
+"""
+from __future__ import absolute_import, division, print_function
+
+from gevent import monkey  # isort:skip
+monkey.patch_all()  # isort:skip
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+from six.moves import http_client  # noqa: E402
+from webob import Request  # noqa: E402
+
+import synthetic  # noqa: E402
+
+from pypiple import __version__  # noqa: E402
+from pypiple.app import application  # noqa: E402
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MIX = [
+    ('index', 5),
+    ('project', 45),
+    ('revalidate', 20),
+    ('download', 20),
+    ('metadata', 10),
+]
+"""Kinds of request and their relative weights"""
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    rank = int(round(pct / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+
+class InProcessClient(object):
+    """Issue requests calling the WSGI application directly"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, url, headers=None):
+        """Returns the status, headers and body for a GET request"""
+        res = Request.blank(url, headers=headers or {}).get_response(self.app)
+        return res.status_int, res.headers, res.body
+
+
+class SocketClient(object):
+    """Issue requests to a server listening on a local socket"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def get(self, url, headers=None):
+        """Returns the status, headers and body for a GET request"""
+        conn = http_client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request('GET', url, headers=headers or {})
+            res = conn.getresponse()
+            body = res.read()
+            return res.status, dict(res.getheaders()), body
+        finally:
+            conn.close()
+
+
+class LoadTest(object):
+    """Request generator and statistics"""
+
+    def __init__(self, client, tree, seed=0):
+        """Load test for a package tree.
+
+        Arguments:
+            client: ``InProcessClient`` or ``SocketClient``
+            tree (str): path to the packages directory served by the app
+        """
+        self.client = client
+        self.tree = tree
+        self.rng = random.Random(seed)
+        self.samples = {kind: [] for kind, _ in MIX}
+        self.statuses = {}
+        self.errors = 0
+        self.bytes = 0
+        self.etags = {}  # => project URL: etag (for revalidations)
+        files = sorted(os.listdir(tree))
+        self.wheels = [name for name in files if name.endswith('.whl')]
+        self.files = [name for name in files if not name.startswith('.')]
+        self.projects = sorted({  # => wheel: {distribution}-{version}-...
+            name.split('-')[0].replace('_', '-') for name in self.wheels})
+        self._kinds = [kind for kind, weight in MIX for _ in range(weight)]
+
+    def request(self):
+        """Issue a random request from the mix, recording its latency"""
+        kind = self.rng.choice(self._kinds)
+        headers = {'Accept-Encoding': 'gzip'}
+        project = self.rng.choice(self.projects)
+
+        if kind == 'index':
+            url = '/simple/'
+        elif kind in ('project', 'revalidate'):
+            url = '/simple/{}/'.format(project)
+            if kind == 'revalidate' and url in self.etags:
+                headers['If-None-Match'] = self.etags[url]
+        elif kind == 'download':
+            url = '/packages/{}'.format(self.rng.choice(self.files))
+        else:
+            url = '/packages/{}.metadata'.format(
+                self.rng.choice(self.wheels))
+
+        start = time.perf_counter()
+        try:
+            status, res_headers, body = self.client.get(url, headers)
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            return
+        self.samples[kind].append(time.perf_counter() - start)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += len(body)
+        if kind in ('project', 'revalidate') and res_headers.get('ETag'):
+            self.etags[url] = res_headers['ETag']
+
+    def wait_ready(self, timeout=600):
+        """Wait for the initial index build (``/ready`` endpoint)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            _, _, body = self.client.get('/ready')
+            if json.loads(body.decode('utf-8'))['ready']:
+                return
+            gevent.sleep(0.1)
+        raise RuntimeError('Index not ready after {}s'.format(timeout))
+
+    def worker(self, deadline):
+        """Issue requests until the deadline"""
+        while time.time() < deadline:
+            self.request()
+
+    def publisher(self, deadline, interval):
+        """Add/remove releases in the tree until the deadline"""
+        published = []
+        release = 0
+        while time.time() < deadline:
+            gevent.sleep(interval)
+            if published and self.rng.random() < 0.5:
+                os.remove(published.pop(0))
+            else:
+                release += 1
+                published.append(synthetic.add_release(
+                    self.tree, self.rng.choice(self.projects),
+                    '1000.{}'.format(release)))
+
+        for path in published:  # => leave the tree as generated
+            os.remove(path)
+
+    def run(self, duration, concurrency, mutate=0.5):
+        """Run the load test.
+
+        Arguments:
+            duration (float): seconds
+            concurrency (int): number of concurrent clients
+
+        Keyword Arguments:
+            mutate (float): seconds between changes in the tree
+                (0 disables mutations)
+
+        Returns:
+            dict with the results
+        """
+        self.wait_ready()
+        deadline = time.time() + duration
+        pool = Pool(concurrency + 1)
+        if mutate:
+            pool.spawn(self.publisher, deadline, mutate)
+        start = time.perf_counter()
+        for _ in range(concurrency):
+            pool.spawn(self.worker, deadline)
+        pool.join()
+        elapsed = time.perf_counter() - start
+
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """Summarize the collected samples"""
+        def summary(samples):
+            samples = sorted(samples)
+            stats = {'count': len(samples),
+                     'max': samples[-1] if samples else None}
+            for pct in PERCENTILES:
+                stats['p{}'.format(pct)] = percentile(samples, pct)
+            return stats
+
+        everything = [value for values in self.samples.values()
+                      for value in values]
+        return {
+            'elapsed': elapsed,
+            'requests': len(everything),
+            'throughput': len(everything) / elapsed,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'statuses': {str(key): value
+                         for key, value in sorted(self.statuses.items())},
+            'latency': summary(everything),
+            'by_kind': {kind: summary(values)
+                        for kind, values in self.samples.items()},
+        }
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--files', type=int, default=1000,
+                        help='size of the synthetic tree')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tree-dir', default=None,
+                        help='where trees are generated (and reused)')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--mutate', type=float, default=0.5,
+                        help='seconds between changes in the tree (0: none)')
+    parser.add_argument('--socket', action='store_true',
+                        help='serve the app over a local socket')
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the results (default: stdout)')
+    args = parser.parse_args(argv)
+
+    tree_dir = args.tree_dir or os.path.join(
+        tempfile.gettempdir(), 'pypiple-benchmarks')
+    tree = os.path.join(tree_dir, 'app-{}-{}'.format(args.files, args.seed),
+                        'packages')
+    synthetic.generate(tree, args.files, seed=args.seed)
+
+    app = application(packages_path=tree)
+
+    server = None
+    if args.socket:
+        server = WSGIServer(('127.0.0.1', 0), app, log=None)
+        server.start()
+        client = SocketClient('127.0.0.1', server.server_port)
+    else:
+        client = InProcessClient(app)
+
+    print('Load testing {} files ({})...'.format(
+        args.files, 'socket' if args.socket else 'in-process'),
+        file=sys.stderr)
+    try:
+        results = LoadTest(client, tree, args.seed).run(
+            args.duration, args.concurrency, args.mutate)
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        'pypiple': __version__,
+        'files': args.files,
+        'mode': 'socket' if args.socket else 'in-process',
+        'concurrency': args.concurrency,
+        'mutate': args.mutate,
+        'timestamp': time.time(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file_:
+            file_.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
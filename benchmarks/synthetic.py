@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Synthetic package repositories
+------------------------------
+
+Generation of realistic (and reproducible) package directories used by
+the benchmarks: wheels and sdists with real ``METADATA``/``PKG-INFO``
+files, long descriptions, classifiers, dependencies, and many versions
+(including pre, post and dev releases) per project.
+
+The same seed and number of files always produce the same tree, so
+results obtained with different versions of pypiple can be compared.
+"""
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+import os
+import random
+import tarfile
+import zipfile
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+CLASSIFIERS = [
+    'Development Status :: 4 - Beta',
+    'Development Status :: 5 - Production/Stable',
+    'Intended Audience :: Developers',
+    'License :: OSI Approved :: MIT License',
+    'License :: OSI Approved :: Mozilla Public License 2.0 (MPL 2.0)',
+    'Operating System :: OS Independent',
+    'Programming Language :: Python',
+    'Programming Language :: Python :: 2.7',
+    'Programming Language :: Python :: 3',
+    'Programming Language :: Python :: 3.6',
+    'Topic :: Software Development :: Libraries',
+    'Topic :: System :: Archiving :: Packaging',
+]
+
+WORDS = (
+    'package index python wheel source distribution metadata version '
+    'release repository install requirement dependency module library '
+    'application server client request response cache archive'
+).split()
+
+MARKER = '.synthetic.json'
+"""File describing the parameters used to generate a tree"""
+
+
+def _version(rng, i):
+    """i-th version of a project (with occasional pre/post/dev labels)"""
+    major, minor, patch = i // 25, (i // 5) % 5, i % 5
+    version = '{}.{}.{}'.format(major, minor, patch)
+    suffix = rng.random()
+    if suffix < 0.05:
+        version += rng.choice(['a1', 'b2', 'rc1'])
+    elif suffix < 0.08:
+        version += '.post1'
+    elif suffix < 0.10:
+        version += '.dev3'
+
+    return version
+
+
+def metadata(rng, name, version, description_size=2000):
+    """Contents of a ``METADATA``/``PKG-INFO`` file
+
+    Arguments:
+        rng (random.Random): source of randomness
+        name (str): project name
+        version (str): project version
+
+    Keyword Arguments:
+        description_size (int): approximate size of the description
+    """
+    author = 'Author {}'.format(rng.randint(0, 50))
+    headers = [
+        ('Metadata-Version', '2.1'),
+        ('Name', name),
+        ('Version', version),
+        ('Summary', ' '.join(rng.choice(WORDS) for _ in range(8))),
+        ('Home-page', 'https://example.com/{}'.format(name)),
+        ('Author', author),
+        ('Author-email', '{}@example.com'.format(author.replace(' ', '.'))),
+        ('License', 'MPL-2.0'),
+        ('Keywords', ' '.join(rng.sample(WORDS, 4))),
+        ('Platform', 'any'),
+    ]
+    headers += [('Classifier', c) for c in rng.sample(CLASSIFIERS, 6)]
+    headers += [('Requires-Dist', '{} (>=1.0)'.format(rng.choice(WORDS)))
+                for _ in range(rng.randint(0, 5))]
+    description = ' '.join(
+        rng.choice(WORDS) for _ in range(description_size // 7))
+
+    text = ''.join('{}: {}\n'.format(key, value) for key, value in headers)
+    return (text + '\n' + description + '\n').encode('utf-8')
+
+
+def write_wheel(dirpath, name, version, data, modules=3):
+    """Write a wheel containing a few modules and the METADATA file"""
+    dist = '{}-{}'.format(name.replace('-', '_'), version)
+    path = os.path.join(dirpath, '{}-py2.py3-none-any.whl'.format(dist))
+    pkg = name.replace('-', '_')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(modules):
+            archive.writestr('{}/module{}.py'.format(pkg, i),
+                             '# module {}\n'.format(i) * 50)
+        archive.writestr('{}.dist-info/METADATA'.format(dist), data)
+        archive.writestr('{}.dist-info/WHEEL'.format(dist),
+                         'Wheel-Version: 1.0\nTag: py2.py3-none-any\n')
+        archive.writestr('{}.dist-info/RECORD'.format(dist), '')
+
+    return path
+
+
+def write_sdist(dirpath, name, version, data, modules=3):
+    """Write a sdist containing a few modules and the PKG-INFO file"""
+    dist = '{}-{}'.format(name, version)
+    path = os.path.join(dirpath, '{}.tar.gz'.format(dist))
+    members = [('PKG-INFO', data), ('setup.py', b'from setuptools import '
+                                                b'setup\nsetup()\n')]
+    members += [('{}/module{}.py'.format(name.replace('-', '_'), i),
+                 '# module {}\n'.format(i).encode('utf-8') * 50)
+                for i in range(modules)]
+    with tarfile.open(path, 'w:gz') as archive:
+        for member, contents in members:
+            entry = tarfile.TarInfo('{}/{}'.format(dist, member))
+            entry.size = len(contents)
+            entry.mtime = 0
+            archive.addfile(entry, io.BytesIO(contents))
+
+    return path
+
+
+def generate(dirpath, files, versions=20, seed=0):
+    """Generate a package tree (or reuse it, if already generated).
+
+    Arguments:
+        dirpath (str): directory where the packages are written
+        files (int): total number of package files
+
+    Keyword Arguments:
+        versions (int): average number of versions per project
+            (each version has a wheel and, for most of them, a sdist)
+        seed (int): seed for the random generator
+
+    Returns:
+        list of paths for the generated files
+    """
+    params = {'files': files, 'versions': versions, 'seed': seed}
+    marker = os.path.join(dirpath, MARKER)
+    if os.path.exists(marker):
+        with open(marker) as file_:
+            if json.load(file_) == params:
+                return [os.path.join(dirpath, name)
+                        for name in os.listdir(dirpath)
+                        if not name.startswith('.')]
+        raise ValueError('{} contains a different tree'.format(dirpath))
+
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+
+    rng = random.Random(seed)
+    paths = []
+    project = 0
+    while len(paths) < files:
+        name = 'project-{}'.format(project)
+        count = max(1, int(rng.expovariate(1.0 / versions)))
+        for i in range(count):
+            if len(paths) >= files:
+                break
+            version = _version(rng, i)
+            data = metadata(rng, name, version)
+            paths.append(write_wheel(dirpath, name, version, data))
+            if len(paths) < files and rng.random() < 0.8:
+                paths.append(write_sdist(dirpath, name, version, data))
+        project += 1
+
+    with open(marker, 'w') as file_:
+        json.dump(params, file_)
+
+    return paths
+
+
+def add_release(dirpath, name, version, seed=0):
+    """Churn: publish a new wheel for a project, returning its path"""
+    rng = random.Random(seed)
+    return write_wheel(dirpath, name, version, metadata(rng, name, version))
@@ -2,9 +2,15 @@
 # -*- coding: utf-8 -*-
 """Simple and customizable Python Package Index
 """
-import pkg_resources
+try:
+    from importlib.metadata import version as _version
+except ImportError:  # python < 3.8 (pkg_resources is slow to import)
+    def _version(name):
+        """Version of the installed distribution"""
+        import pkg_resources
+        return pkg_resources.get_distribution(name).version
 
 try:
-    __version__ = pkg_resources.get_distribution(__name__).version
+    __version__ = _version(__name__)
 except:  # pylint: disable=bare-except
     __version__ = 'unknown'
@@ -1,89 +1,308 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-TODO: doc
-"""
-from gevent import monkey  # isort:skip
-monkey.patch_all()  # isort:skip
+Pypiple WSGI application
+------------------------
+
+``application`` builds the WSGI app for the index, configured by its
+arguments. Nothing happens at import time: ``app`` is built on its first
+request, with the configuration read from the environment (see
+``settings``), so it can be given directly to WSGI servers::
+
+    gunicorn -k gevent pypiple.app:app
+
+The index is built in background, and the app starts serving right away:
+listings are marked as partial (or gated, see ``application``) until the
+index is ready, which is reported by the ``/ready`` endpoint. To start
+building the index as soon as a worker boots (instead of on its first
+request), the server can call ``create_app`` (which also reads
+``settings``)::
+
+    gunicorn -k gevent 'pypiple.app:create_app()'
 
+Monkey patching (required when running with ``gevent``) is left for the
+server, e.g. the gevent worker of gunicorn, or the development server
+(``python -m pypiple.app``).
+"""
 import re
-from os import getcwd, path
-from pkg_resources import resource_filename
+import threading
+from os import environ, getcwd, path
 
-import livereload
 from selector import Selector
 from webob.static import DirectoryApp
 
-from pypiple.handlers import FancyCollectionHandler
+from pypiple import __version__  # noqa
+from pypiple.cache import LRUCache
+from pypiple.handlers import (
+    FancyCollectionHandler,
+    MetadataFileHandler,
+    MetricsHandler,
+    PackageFileHandler,
+    ReadinessHandler,
+    SearchHandler,
+    SimpleCollectionHander,
+    SimpleItemHandler,
+)
 from pypiple.index import Index
-from pypiple.middleware import filter_path
+from pypiple.metrics import REGISTRY
+from pypiple.middleware import count_responses, filter_path, profile_requests
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
 
 PREFFIX = '/'
 """Default mount point for pypiple app"""
 
-ASSETS_PATH = resource_filename(__package__, 'assets')
+ASSETS_PATH = path.join(path.dirname(path.abspath(__file__)), 'assets')
 """Default path for static files"""
 
-PACKAGES_PATH = path.join(getcwd(), 'packages')
-"""Default path for packages"""
-
-TEMPLATES_PATH = resource_filename(__package__, 'templates')
+TEMPLATES_PATH = path.join(path.dirname(path.abspath(__file__)), 'templates')
 """Default path for templates"""
 
 ASSETS_EXT = 'css|js|ico|png|jpg|svg|gif'
 """Allowed extensions for static files"""
 
-PACKAGES_EXT = 'tar.gz|whl|egg'
-"""Allowed extensions for packages"""
+BATCH_SIZE = 1000
+"""Default number of packages processed before publishing partial results
+"""
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+"""Values of environment variables considered as enabled flags"""
+
+
+def _flag(value):
+    """Boolean value of an environment variable"""
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+def settings(env=None):
+    """Configuration for the application read from environment variables:
+
+    - ``PYPIPLE_PACKAGES``: path for packages
+        (default is the ``packages`` directory under the working directory)
+    - ``PYPIPLE_SNAPSHOT``: snapshot published by a builder process
+        (see ``pypiple.snapshot``). When set, the index is loaded from
+        the snapshot instead of the packages
+    - ``PYPIPLE_PARTIAL``: policy for partial listings while the index is
+        not ready (``mark`` or ``gate``)
+    - ``PYPIPLE_BATCH_SIZE``: number of packages processed by the index
+        before publishing partial results
+    - ``PYPIPLE_STORE``: path for a database persisting the metadata
+        between restarts (see ``pypiple.store``)
+    - ``PYPIPLE_WATCH``: watch the packages directory for changes
+        (see ``pypiple.watcher``), e.g. ``1`` or ``true``
+    - ``PYPIPLE_WORKERS``: number of processes used to extract metadata
+    - ``PYPIPLE_BACKGROUND``: update the index in background, serving the
+        current contents meanwhile (e.g. ``1`` or ``true``)
+    - ``PYPIPLE_PROFILE_DIR``, ``PYPIPLE_PROFILE_RATE`` and
+        ``PYPIPLE_PROFILE_TOKEN``: options for
+        ``pypiple.middleware.profile_requests``. Profiling is disabled
+        unless a rate or a token is given
+
+    Keyword Arguments:
+        env (dict): environment variables. Default is ``os.environ``.
+
+    Returns:
+        dict with keyword arguments for ``application``
+    """
+    env = environ if env is None else env
+
+    return {
+        'packages_path': env.get('PYPIPLE_PACKAGES'),
+        'snapshot_path': env.get('PYPIPLE_SNAPSHOT'),
+        'partial': env.get('PYPIPLE_PARTIAL', 'mark'),
+        'batch_size': int(env.get('PYPIPLE_BATCH_SIZE', BATCH_SIZE)),
+        'store_path': env.get('PYPIPLE_STORE'),
+        'watch': _flag(env.get('PYPIPLE_WATCH')),
+        'workers': int(env.get('PYPIPLE_WORKERS') or 0) or None,
+        'background': _flag(env.get('PYPIPLE_BACKGROUND')),
+        'profile': {
+            'directory': env.get('PYPIPLE_PROFILE_DIR'),
+            'rate': float(env.get('PYPIPLE_PROFILE_RATE', 0)),
+            'token': env.get('PYPIPLE_PROFILE_TOKEN'),
+        },
+    }
 
 
-def application():
-    """TODO"""
+def application(packages_path=None, snapshot_path=None, prefix=PREFFIX,
+                assets_path=ASSETS_PATH, templates_path=TEMPLATES_PATH,
+                partial='mark', batch_size=BATCH_SIZE, store_path=None,
+                watch=False, workers=None, background=False, profile=None):
+    """Build the WSGI application.
+
+    Keyword Arguments:
+        packages_path (str): directory containing the packages.
+            Default is the ``packages`` directory under the working directory.
+        snapshot_path (str): load the index from a snapshot published by a
+            builder process (see ``pypiple.snapshot``). Default is None
+            (the index is built from the packages).
+        prefix (str): mount point for the app. Default is PREFFIX.
+        assets_path (str): path for static files
+        templates_path (str): path for templates
+        partial (str): policy for listings while the index is built in
+            background: ``mark`` them as partial (default) or ``gate`` them
+            (``503 Service Unavailable``, also reported by the readiness
+            endpoint). See ``pypiple.handlers``.
+        batch_size (int): packages processed by the index before
+            publishing partial results. Default is BATCH_SIZE.
+        store_path (str): database persisting the metadata between
+            restarts (see ``pypiple.store.Store``).
+            Default is None (in-memory only).
+        watch (bool): rely on a watcher to detect changes in the packages
+            directory (see ``pypiple.watcher.create_watcher``), instead of
+            checking it on requests. Default is False.
+        workers (int): number of processes used to extract metadata.
+            Default is None (serial extraction).
+        background (bool): update the index in background, serving the
+            current contents meanwhile. Default is False.
+        profile (dict): options for ``pypiple.middleware.profile_requests``.
+            Default is None (no profiling).
+
+    Returns:
+        WSGI application
+    """
 
     mount_points = {
-        'index': PREFFIX,
-        'assets': '/'.join([PREFFIX, 'assets']),
-        'packages':  '/'.join([PREFFIX, 'packages']),
+        'index': prefix,
+        'simple': prefix + 'simple/',
+        'assets': prefix + 'assets',
+        'packages': prefix + 'packages',
+        'metrics': prefix + 'metrics',
+        'ready': prefix + 'ready',
+        'search': prefix + 'search',
     }
 
     paths = {
-        'asssets': ASSETS_PATH,
-        'packages': PACKAGES_PATH,
-        'templates': TEMPLATES_PATH
+        'assets': assets_path,
+        'packages': packages_path or path.join(getcwd(), 'packages'),
+        'templates': templates_path,
     }
 
-    index = Index(paths['templates'])
+    # => imported on demand, only what is used
+    if snapshot_path:
+        from pypiple.snapshot import SnapshotIndex
+        index = SnapshotIndex(paths['packages'], snapshot_path)
+    else:
+        from pypiple.hasher import Hasher
+        store = watcher = None
+        if store_path:
+            from pypiple.store import Store
+            store = Store(store_path)
+        if watch:
+            from pypiple.watcher import create_watcher
+            watcher = create_watcher(paths['packages'])
+        index = Index(paths['packages'], workers=workers, store=store,
+                      watcher=watcher, hasher=Hasher(),
+                      background=background, batch_size=batch_size)
+    index.start()  # => serve requests while the index is built
+    cache = LRUCache()  # => shared by all handlers
+
+    REGISTRY.register('pypiple_index_files', lambda: len(index.files))
+    REGISTRY.register('pypiple_index_ready', lambda: int(index.ready))
+    REGISTRY.register('pypiple_index_progress_done',
+                      lambda: index.progress.done)
+    REGISTRY.register('pypiple_cache_hits_total', lambda: cache.hits)
+    REGISTRY.register('pypiple_cache_misses_total', lambda: cache.misses)
+    REGISTRY.register('pypiple_cache_evictions_total',
+                      lambda: cache.evictions)
+    REGISTRY.register('pypiple_cache_bytes', lambda: cache.size)
 
     filters = {
-        # filter packages by extension
-        'packages': re.compile(
-            r'\.({})$'.format(PACKAGES_EXT.replace('.', r'\.')), re.I),
         # filter static files by extension
         'assets': re.compile(
             r'\.({})$'.format(ASSETS_EXT.replace('.', r'\.')), re.I),
     }
 
     handlers = {
-        'index': FancyCollectionHandler(index, mount_points, paths),
-        'packages': filter_path(  # pylint: disable=no-value-for-parameter
-            DirectoryApp(paths['packages'], index_page=None),
-            filters['packages']),
+        'index': FancyCollectionHandler(
+            index, mount_points, paths, cache, partial),
+        'simple': SimpleCollectionHander(
+            index, mount_points, paths, cache, partial),
+        'simple_item': SimpleItemHandler(
+            index, mount_points, paths, cache, partial),
+        'search': SearchHandler(index, mount_points, paths, cache, partial),
+        'metadata': MetadataFileHandler(index, mount_points, paths, cache),
+        'metrics': MetricsHandler(REGISTRY),
+        'ready': ReadinessHandler(index, partial),
+        'packages': PackageFileHandler(index, mount_points, paths),
         'assets': filter_path(  # pylint: disable=no-value-for-parameter
             DirectoryApp(paths['assets'], index_page=None),
-            filters['assets']),
+            path_filter=filters['assets']),
     }
 
+    for resource in ('index', 'simple', 'simple_item', 'search', 'metadata',
+                     'packages'):
+        handlers[resource] = count_responses(
+            handlers[resource], type(handlers[resource]).__name__)
+
+    patterns = [  # => order matters
+        ('index', mount_points['index']),
+        ('simple', mount_points['simple']),
+        ('simple_item', mount_points['simple'] + '{name}/'),
+        ('metadata',
+         mount_points['packages'] + '/{filename:segment}.metadata'),
+        ('metrics', mount_points['metrics']),
+        ('ready', mount_points['ready']),
+        ('search', mount_points['search']),
+        # static files: '|' allows any path under the mount point
+        ('assets', mount_points['assets'] + '|'),
+        ('packages', mount_points['packages'] + '/{filename:segment}'),
+    ]
+
     routes = [
         (route, {'GET':  handlers[resource]})
-        for resource, route in mount_points.items()
+        for resource, route in patterns
     ]
 
-    return Selector(mappings=routes)
+    return profile_requests(Selector(mappings=routes), **(profile or {}))
+
+
+def create_app():
+    """Build the WSGI application configured by the environment.
+
+    Returns:
+        WSGI application (see ``application`` and ``settings``)
+    """
+    return application(**settings())
 
-app = application()  # pylint: disable=invalid-name
+
+class LazyApplication(object):
+    """WSGI application built when the first request arrives"""
+
+    def __init__(self, factory=None):
+        """Lazy application.
+
+        Keyword Arguments:
+            factory: function without arguments that builds the application.
+                Default is ``create_app``.
+        """
+        self.factory = factory or create_app
+        self._app = None
+        self._lock = threading.Lock()
+
+    @property
+    def app(self):
+        """The application (built if necessary)"""
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self.factory()
+
+        return self._app
+
+    def __call__(self, environ_, start_response):
+        return self.app(environ_, start_response)
+
+
+app = LazyApplication()  # pylint: disable=invalid-name
 
 if __name__ == '__main__':
-    server = livereload.Server(app)  # pylint: disable=invalid-name
+    from gevent import monkey
+    monkey.patch_all()
+
+    import livereload
+    server = livereload.Server(app.app)  # pylint: disable=invalid-name
 
     server.watch(
         'pypiple/static/style.scss', livereload.shell(
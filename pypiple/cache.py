@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple cache
+-------------
+
+In-memory cache for rendered responses.
+
+``pypiple.cache.LRUCache`` is bounded by the total size of the stored values
+(e.g. number of bytes in a response body): when the limit is reached, the
+least recently used entries are evicted. Entries can be associated with tags
+(e.g. the paths of the packages used to render a page), so they can be
+invalidated as soon as the underlaying data changes.
+
+.. data:: DEFAULT_MAXSIZE
+
+    default limit for the sum of the sizes of cached values (64 MiB)
+"""
+import threading
+from collections import OrderedDict
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+DEFAULT_MAXSIZE = 64 * 1024 * 1024
+
+
+class LRUCache(object):
+    """Least recently used cache, bounded by the total size of its values"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, sizeof=len):
+        """Empty cache.
+
+        Keyword Arguments:
+            maxsize (int): limit for the sum of the sizes of cached values.
+                Default is DEFAULT_MAXSIZE.
+            sizeof: function used to compute the size of values.
+                Default is ``len``.
+        """
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # => key: (value, size, tags)
+        self._tags = {}  # => tag: set of keys
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Retrieve a value, marking it as the most recently used.
+
+        Arguments:
+            key: any hashable object
+
+        Keyword Arguments:
+            default: value returned when key is not cached
+
+        Returns:
+            The cached value or default
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries[key] = entry  # => move to the end
+            return entry[0]
+
+    def set(self, key, value, tags=(), condition=None):
+        """Store a value, evicting least recently used ones if necessary.
+
+        Values bigger than ``maxsize`` are not stored.
+
+        Arguments:
+            key: any hashable object
+            value: object to be cached
+
+        Keyword Arguments:
+            tags (Iterable): tags associated with the value, see
+                ``invalidate``
+            condition: function called without arguments while holding the
+                lock (so no invalidation happens in the meantime). The value
+                is only stored if it returns True. Default is None (always
+                store).
+        """
+        size = self.sizeof(value)
+        tags = frozenset(tags)
+
+        with self._lock:
+            if condition is not None and not condition():
+                return
+
+            self.pop(key)
+            if size > self.maxsize:
+                return
+
+            while self.size + size > self.maxsize:
+                self.pop(next(iter(self._entries)))
+                self.evictions += 1
+
+            self._entries[key] = (value, size, tags)
+            self.size += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def pop(self, key, default=None):
+        """Remove a value from cache.
+
+        Returns:
+            The removed value or default, if key is not cached
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+
+            value, size, tags = entry
+            self.size -= size
+            for tag in tags:
+                keys = self._tags[tag]
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+            return value
+
+    def invalidate(self, tags):
+        """Remove all values associated with any of the given tags.
+
+        Arguments:
+            tags (Iterable): tags, as given to ``set``
+
+        Returns:
+            int: number of removed values
+        """
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self.pop(key)
+
+            return len(keys)
+
+    def clear(self):
+        """Remove all values from cache"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def stats(self):
+        """Usage statistics.
+
+        Returns:
+            dict with the number of ``hits``, ``misses``, ``evictions``,
+            ``entries``, and the current ``size`` and ``maxsize``
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'size': self.size,
+            'maxsize': self.maxsize,
+        }
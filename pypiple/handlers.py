@@ -3,50 +3,433 @@
 """
 Pypiple Request Handlers
 ------------------------
+
+Handlers render the contents of ``pypiple.index.Index`` and cache the
+results in a ``pypiple.cache.LRUCache`` (that can be shared between
+handlers). Each cached page is tagged with the packages used to render it,
+and handlers subscribe to the index, so pages are invalidated (and rendered
+again on demand) only when the related packages change.
+
+While the index is not ready (e.g. its initial update is running in
+background, see ``pypiple.index.Index.start``), listings are partial.
+Depending on the ``partial`` policy, handlers either mark these responses
+(``X-Pypiple-Partial`` header with the progress of the update, and
+``Cache-Control: no-store``) or gate them (``503 Service Unavailable``).
+Projects (and files) not found in a partial index are always answered with
+503, since they might just not be indexed yet.
+
+Cached pages carry a strong ``ETag`` (digest of the body) and
+``Last-Modified`` header, so conditional requests can be answered with
+``304 Not Modified``. Compressed variants of each page (gzip, and brotli
+when the ``brotli`` package is installed) are produced once, when the page
+is cached, and selected according to the ``Accept-Encoding`` header.
+
+- ``SimpleCollectionHander`` and ``SimpleItemHandler`` implement the
+    "Simple Repository API" (PEP 503) used by pip.
+- ``MetadataFileHandler`` serves the metadata files extracted from
+    packages (PEP 658), so pip can resolve dependencies without
+    downloading whole wheels.
+- ``PackageFileHandler`` serves the package files themselves, using
+    ``wsgi.file_wrapper`` (usually implemented by servers with
+    ``os.sendfile``) when available, and supporting ``Range`` requests.
+- ``SearchHandler`` lists the projects matching a query (see
+    ``pypiple.search``).
+- ``MetricsHandler`` exposes the metrics collected by ``pypiple.metrics``.
+- ``ReadinessHandler`` reports if the index is ready, and the progress of
+    its update.
 """
+import hashlib
+import json
+import os
+import zlib
+from itertools import chain
+from os.path import basename, join
+from xml.sax.saxutils import escape, quoteattr
+
+from six.moves.urllib.parse import quote
 from webob import Response
 from webob.dec import wsgify
+from webob.exc import (
+    HTTPMovedPermanently,
+    HTTPNotFound,
+    HTTPServiceUnavailable,
+)
+
+from pypiple import metrics
+from pypiple.cache import LRUCache
+from pypiple.index import fingerprint
+from pypiple.records import normalize
+from pypiple.search import SearchIndex
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None  # pylint: disable=invalid-name
+
+SIMPLE_TEMPLATE = u"""<!DOCTYPE html>
+<html>
+  <head>
+    <meta name="pypi:repository-version" content="1.0">
+    <title>{title}</title>
+  </head>
+  <body>
+    <h1>{title}</h1>
+{links}
+  </body>
+</html>
+"""
+
+LINK_TEMPLATE = u'    <a href={href}{attrs}>{text}</a><br/>'
+
+SEARCH_TEMPLATE = u"""<!DOCTYPE html>
+<html>
+  <head>
+    <title>{title}</title>
+  </head>
+  <body>
+    <form action={action} method="get">
+      <input type="search" name="q" value={query} autofocus>
+      <button type="submit">Search</button>
+    </form>
+    <h1>{title}</h1>
+    <ol>
+{results}
+    </ol>
+  </body>
+</html>
+"""
+
+RESULT_TEMPLATE = (u'      <li><a href={href}>{name}</a> {version}'
+                   u'<p>{summary}</p></li>')
+
+PARTIAL_POLICIES = ('mark', 'gate')
+"""How partial listings are served while the index is not ready"""
+
+PARTIAL_HEADER = 'X-Pypiple-Partial'
+"""Header marking partial listings (value is ``done/total``)"""
+
+RETRY_AFTER = 5
+"""Seconds clients should wait before retrying when the index is not ready
+"""
+
+BLOCK_SIZE = 1 << 20
+"""Size of the chunks used to send package files (when read by Python)"""
+
+BROTLI_QUALITY = 6
+"""Compression level for brotli (the maximum, 11, is too slow for pages
+rendered while serving requests)"""
+
+
+def gzip_compress(data):
+    """Compress data using gzip format (without timestamp in header)"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(data) + compressor.flush()
+
+
+def brotli_compress(data):
+    """Compress data using brotli (see BROTLI_QUALITY)"""
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+ENCODERS = {'gzip': gzip_compress}
+"""Functions used to produce compressed variants, by content coding"""
+
+if brotli:
+    ENCODERS['br'] = brotli_compress
+
+ENCODINGS = [enc for enc in ('br', 'gzip') if enc in ENCODERS] + ['identity']
+"""Available content codings, from the most preferred"""
+
+
+class Page(object):
+    """Rendered resource, ready to be served"""
+
+    __slots__ = ('variants', 'etag', 'last_modified')
+
+    def __init__(self, body, last_modified=None):
+        """Page with validators derived from its contents.
+
+        Compressed variants are only kept if smaller than the original body.
+
+        Arguments:
+            body (bytes): encoded response body
+
+        Keyword Arguments:
+            last_modified (float): timestamp of the index state used to
+                render the page
+        """
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = last_modified
+        self.variants = {'identity': body}  # => content coding: bytes
+
+        for encoding, compress in ENCODERS.items():
+            compressed = compress(body)
+            if len(compressed) < len(body):
+                self.variants[encoding] = compressed
+
+    def __len__(self):
+        """Number of bytes stored (considering all variants)"""
+        return sum(len(variant) for variant in self.variants.values())
+
+    @property
+    def body(self):
+        """Uncompressed body"""
+        return self.variants['identity']
+
+    def negotiate(self, req):
+        """Choose the best content coding accepted by the client.
+
+        Returns:
+            One of the keys of ``variants``
+        """
+        if 'Accept-Encoding' not in req.headers:
+            return 'identity'
+
+        offers = [enc for enc in ENCODINGS if enc in self.variants]
+        accepted = req.accept_encoding.acceptable_offers(offers)
+
+        return accepted[0][0] if accepted else 'identity'
+
+    def response(self, req, **kwargs):
+        """Build a response for the page.
+
+        The response is conditional, i.e. ``304 Not Modified`` is sent
+        instead, if the request validators (``If-None-Match`` or
+        ``If-Modified-Since``) match the page.
+
+        Arguments:
+            req (webob.Request): request being answered
+
+        Keyword Arguments:
+            Forwarded to ``webob.Response``
+        """
+        encoding = self.negotiate(req)
+        res = Response(body=self.variants[encoding],
+                       conditional_response=True, **kwargs)
+        res.vary = ('Accept-Encoding',)
+        res.last_modified = self.last_modified
+
+        if encoding == 'identity':
+            res.etag = self.etag
+        else:  # => each representation needs a different strong etag
+            res.content_encoding = encoding
+            res.etag = '{}-{}'.format(self.etag, encoding)
+
+        return res
+
+
+def progress(index):
+    """Progress of the index update, as ``done/total``"""
+    done, total = index.progress
+    return '{}/{}'.format(done, '?' if total is None else total)
+
+
+def unavailable(index):
+    """Error for requests that cannot be answered before the index is ready
+    """
+    return HTTPServiceUnavailable(
+        'Index not ready, {} packages processed'.format(progress(index)),
+        headers={'Retry-After': str(RETRY_AFTER),
+                 PARTIAL_HEADER: progress(index)})
 
 
 class AbstractHandler(object):
-    """docstring for """
+    """Base class for handlers, responsible for caching rendered pages.
+
+    Subclasses should implement ``render`` and, when serving more than
+    one resource, ``identify``.
+    """
+
+    content_type = 'text/html'
+    charset = 'utf-8'
+    listing = True  # => partial while the index is not ready
+
+    def __init__(self, index, mount_points, paths, cache=None,
+                 partial='mark'):
+        """Handler for resources stored in the index.
+
+        Arguments:
+            index (pypiple.index.Index): index of packages
+            mount_points (dict): URL prefixes for each kind of resource
+            paths (dict): file system paths used by the application
+
+        Keyword Arguments:
+            cache (pypiple.cache.LRUCache): storage for rendered pages,
+                possibly shared with other handlers.
+                Default is None (a new cache is created).
+            partial (str): one of PARTIAL_POLICIES, ``mark`` (default) or
+                ``gate`` listings while the index is not ready.
+        """
+        if partial not in PARTIAL_POLICIES:
+            raise ValueError('Invalid policy for partial listings: {}'
+                             .format(partial))
 
-    def __init__(self, index, mount_points, paths):
-        """TODO"""
         self.index = index
         self.mount_points = mount_points
         self.paths = paths
-        self._cache = {}
+        self.partial = partial
+        self._cache = LRUCache() if cache is None else cache
+        # => package names when the index last changed
+        self._names = frozenset(index.generation.packages)
+        index.subscribe(self.expire)
 
     def cache(self, key, default, *args, **kwargs):
-        """TODO"""
-        return (
-            self.cache.get(key) or  # pylint: disable=no-member
-            self.cache.setdefault(key, default(  # pylint: disable=no-member
-                *args, **kwargs))
+        """Retrieve a cached value, generating it if missing.
+
+        Arguments:
+            key (str): package name, or an arbitrary string starting with
+                ``:`` for values related to the whole index
+            default: function called with the remaining arguments to
+                generate the value
+
+        Keyword Arguments:
+            generation (pypiple.records.Generation): state of the index used
+                to generate the value. The value is not stored when the
+                index changes in the meantime (it would be outdated).
+                Default is the current generation.
+
+        Returns:
+            The cached value
+        """
+        generation = kwargs.pop('generation', None) or self.index.generation
+        entry_key = (id(self), key)  # => cache may be shared
+        value = self._cache.get(entry_key)
+
+        if value is None:
+            value = default(*args, **kwargs)
+            # => checked under the cache lock: if the index changes, either
+            # the value is not stored or it is invalidated afterwards
+            self._cache.set(entry_key, value, self.tags(key, generation),
+                            lambda: self.index.generation is generation)
+
+        return value
+
+    def tags(self, key, generation):
+        """Tags used to invalidate the cached value for key.
+
+        Arguments:
+            key (str): as given to ``cache``
+            generation (pypiple.records.Generation): state of the index used
+                to generate the value
+
+        Returns:
+            set containing the key and, for package names, the paths to all
+            files of the package (values related to the whole index are
+            tagged with ``:index``, and values that only depend on the names
+            of the packages with ``:names``).
+        """
+        if key.startswith(':'):
+            return {key, ':index'}
+
+        releases = generation.packages.get(key, [])
+        return set(releases.paths()) | {key} if releases else {key}
+
+    def expire(self, modified, removed):
+        """Invalidate cached values affected by changes in the index.
+
+        Arguments:
+            modified (set): paths for packages added or modified
+            removed (set): paths for packages removed
+        """
+        generation = self.index.generation
+        metadata = generation.metadata
+        names = (
+            normalize(metadata[path]['name'])
+            for path in modified if metadata.get(path)
         )
+        tags = [':index']
+        current = frozenset(generation.packages)
+        if current != self._names:  # => e.g. not just new digests
+            self._names = current
+            tags.append(':names')
+        self._cache.invalidate(chain(modified, removed, names, tags))
 
-    def expire(self, key):
-        """TODO"""
-        self._cache[key] = None
+    def identify(self, req, generation):  # pylint: disable=unused-argument
+        """Identify the requested resource.
 
-    @wsgify
-    def __call__(self, req):
-        """TODO"""
-        changed = self.index.update()
+        Arguments:
+            req (webob.Request): request being answered
+            generation (pypiple.records.Generation): state of the index
+                used for the whole request
 
-        if changed is not None:
-            self.expire(':response')
+        Raises:
+            HTTPNotFound if the resource does not exist
 
+        Returns:
+            cache key for the resource
+        """
         # since the character ':' is forbidden for file paths and
         # package names, it will not interfere with 'per-packages' cache
-        return Response(self.cache(':response', self.render))
+        return ':response'
+
+    @wsgify
+    def __call__(self, req):
+        """Render the requested resource (or retrieve it from cache)"""
+        self.index.revalidate()
+        # a consistent view of the index, even if it changes meanwhile
+        generation = self.index.generation
+        ready = self.index.ready
+        partial = self.listing and not ready
+        if partial and self.partial == 'gate':
+            raise unavailable(self.index)
+
+        try:
+            key = self.identify(req, generation)
+        except HTTPNotFound:
+            if not ready:  # => maybe not indexed yet
+                raise unavailable(self.index)
+            raise
+
+        page = self.cache(key, self.build, key, generation,
+                          generation=generation)
+
+        res = page.response(
+            req, content_type=self.content_type, charset=self.charset)
+        if partial:
+            res.headers[PARTIAL_HEADER] = progress(self.index)
+            res.cache_control = 'no-store'
+
+        return res
 
-    def render(self):
-        """TODO"""
+    def build(self, key, generation):
+        """Render the resource, producing a ``Page``"""
+        with metrics.REGISTRY.timer('pypiple_render_seconds',
+                                    handler=type(self).__name__):
+            body = self.render(key, generation).encode(self.charset)
+            return Page(body, generation.mtime)
+
+    def render(self, key, generation):
+        """Render the resource identified by key as text"""
         raise NotImplementedError
 
 
+# => still abstract, render is implemented by the subclasses
+class SimpleHandler(AbstractHandler):  # pylint: disable=abstract-method
+    """Common functionality for PEP 503 pages"""
+
+    def page(self, title, links):
+        """Render a PEP 503 page.
+
+        Arguments:
+            title (str): page title
+            links (Iterable[Tuple[str, str, dict]]): ``(href, text, attrs)``
+                triples, where ``attrs`` contains extra attributes for the
+                anchor element
+        """
+        return SIMPLE_TEMPLATE.format(
+            title=escape(title),
+            links=u'\n'.join(
+                LINK_TEMPLATE.format(
+                    href=quoteattr(href),
+                    attrs=u''.join(
+                        u' {}={}'.format(name, quoteattr(value))
+                        for name, value in sorted(attrs.items())),
+                    text=escape(text))
+                for href, text, attrs in links
+            ),
+        )
+
+
 # pylint: disable=abstract-method,missing-docstring
 class FancyCollectionHandler(AbstractHandler):
     pass
@@ -54,11 +437,305 @@ class FancyCollectionHandler(AbstractHandler):
 
 class FancyItemHandler(AbstractHandler):
     pass
+# pylint: enable=abstract-method,missing-docstring
 
 
-class SimpleCollectionHander(AbstractHandler):
-    pass
+class SimpleCollectionHander(SimpleHandler):
+    """List of all packages in the index (PEP 503 root URL)"""
 
+    def tags(self, key, generation):  # pylint: disable=unused-argument
+        return {key, ':names'}
 
-class SimpleItemHandler(AbstractHandler):
-    pass
+    def render(self, key, generation):
+        prefix = self.mount_points['simple']
+        names = sorted(generation.packages)  # => already normalized
+
+        return self.page('Simple index', (
+            ('{}{}/'.format(prefix, quote(name)), name, {}) for name in names
+        ))
+
+
+class SimpleItemHandler(SimpleHandler):
+    """Links for all files of a package (PEP 503 project URL)"""
+
+    def identify(self, req, generation):
+        name = req.urlvars['name']
+        if name in generation.packages:
+            return name  # => pip already requests normalized names
+
+        normalized = normalize(name)
+        if normalized not in generation.packages:
+            raise HTTPNotFound
+
+        raise HTTPMovedPermanently(location='{}{}/'.format(
+            self.mount_points['simple'], quote(normalized)))
+
+    def render(self, key, generation):
+        prefix = self.mount_points['packages']
+        algorithm = self.index.algorithm
+        releases = generation.packages[key]
+        files = sorted(
+            (basename(path), data)
+            for path, data in zip(releases.paths(), releases)
+        )
+
+        return self.page('Links for {}'.format(key), (
+            (self.link(prefix, name, data.get(algorithm)), name,
+             self.attributes(data))
+            for name, data in files
+        ))
+
+    @staticmethod
+    def attributes(data):
+        """Extra attributes for the link of a package file"""
+        if not data.get('core_metadata'):
+            return {}
+
+        # PEP 714 renamed the PEP 658 attribute, both are kept for older pips
+        digest = 'sha256={}'.format(data['core_metadata'])
+        return {'data-core-metadata': digest,
+                'data-dist-info-metadata': digest}
+
+    def link(self, prefix, name, digest=None):
+        """URL for a package file, including the digest fragment, if known"""
+        url = '{}/{}'.format(prefix, quote(name))
+        if digest:
+            url += '#{}={}'.format(self.index.algorithm, digest)
+
+        return url
+
+
+class SearchHandler(AbstractHandler):
+    """Projects matching the query given by the ``q`` parameter.
+
+    Results are not cached: queries are cheap (see ``pypiple.search``) and
+    too diverse, they would just evict other pages from the cache.
+    """
+
+    limit = 50
+
+    def __init__(self, index, mount_points, paths, cache=None,
+                 partial='mark', search=None):
+        """Handler for searches in the index.
+
+        Keyword Arguments:
+            search (pypiple.search.SearchIndex): full-text index for the
+                packages. Default is None (a new one is built).
+
+        See ``AbstractHandler``.
+        """
+        super(SearchHandler, self).__init__(
+            index, mount_points, paths, cache, partial)
+        self.search = SearchIndex(index) if search is None else search
+
+    def identify(self, req, generation):
+        return u':search:' + req.GET.get('q', u'').strip()
+
+    def cache(self, key, default, *args, **kwargs):
+        kwargs.pop('generation', None)
+        return default(*args, **kwargs)
+
+    def render(self, key, generation):
+        query = key[len(':search:'):]
+        results = []
+        for _, name in self.search.search(query, self.limit):
+            releases = generation.packages.get(name)
+            if releases:  # => the search index might be ahead
+                results.append(RESULT_TEMPLATE.format(
+                    href=quoteattr('{}{}/'.format(
+                        self.mount_points['simple'], quote(name))),
+                    name=escape(name),
+                    version=escape(releases[0]['version'] or u''),
+                    summary=escape(releases[0]['summary'] or u'')))
+
+        return SEARCH_TEMPLATE.format(
+            title=escape(u'Results for "{}"'.format(query) if query
+                         else u'Search'),
+            action=quoteattr(self.mount_points['search']),
+            query=quoteattr(query),
+            results=u'\n'.join(results),
+        )
+
+
+# => build is overridden (bytes are served as is), render is never used
+class MetadataFileHandler(AbstractHandler):  # pylint: disable=abstract-method
+    """Metadata file extracted from a package (PEP 658)"""
+
+    content_type = 'text/plain'
+    listing = False
+
+    def identify(self, req, generation):
+        path = join(self.index.path, req.urlvars['filename'])
+        data = generation.metadata.get(path)
+        if not (data and data.get('core_metadata')):
+            raise HTTPNotFound
+
+        return path
+
+    def tags(self, key, generation):  # pylint: disable=unused-argument
+        return {key}
+
+    def build(self, key, generation):
+        body = self.index.metadata_file(key)
+        if body is None:
+            raise HTTPNotFound
+
+        return Page(body, generation.mtime)
+
+
+class FileIter(object):
+    """Body of a package file response, supporting ranges.
+
+    Ranges reaching the end of the file are also sent with the server's
+    ``wsgi.file_wrapper`` (if any), so only bounded ranges are actually read
+    by Python (by the ``FileIter`` itself, so the file is always closed with
+    the response, even if the body is never iterated).
+    """
+
+    def __init__(self, file_, size, wrapper=None):
+        """Iterable over the contents of an open file.
+
+        Arguments:
+            file_: file object opened in binary mode
+            size (int): size of the file
+
+        Keyword Arguments:
+            wrapper: ``wsgi.file_wrapper`` provided by the server
+        """
+        self.file = file_
+        self.size = size
+        self.wrapper = wrapper
+        self.remaining = size  # => bytes to be read from current position
+
+    def __iter__(self):
+        while self.remaining > 0:
+            data = self.file.read(min(BLOCK_SIZE, self.remaining))
+            if not data:
+                return
+            self.remaining -= len(data)
+            yield data
+
+    def app_iter_range(self, start=None, stop=None):
+        """Iterable over the bytes from start (inclusive) to stop"""
+        start = start or 0
+        stop = self.size if stop is None else stop
+        self.file.seek(start)
+        if self.wrapper and stop >= self.size:
+            return self.wrapper(self.file, BLOCK_SIZE)
+
+        self.remaining = stop - start
+        return self
+
+    def close(self):
+        """Close the file (called by the server after sending the body)"""
+        self.file.close()
+
+
+class PackageFileHandler(object):
+    """Package files, served directly from the packages directory.
+
+    Only files present in the index are served. Responses are conditional
+    (the ``ETag`` is derived from the same fingerprint used by the index to
+    detect changes) and can be cached by clients and proxies for
+    ``max_age`` seconds.
+    """
+
+    content_type = 'application/octet-stream'
+    max_age = 24 * 60 * 60
+
+    def __init__(self, index, mount_points, paths):
+        """Handler for the files in the index.
+
+        Arguments:
+            index (pypiple.index.Index): index of packages
+            mount_points (dict): URL prefixes for each kind of resource
+            paths (dict): file system paths used by the application
+        """
+        self.index = index
+        self.mount_points = mount_points
+        self.paths = paths
+
+    @wsgify
+    def __call__(self, req):
+        self.index.revalidate()
+        path = join(self.index.path, req.urlvars['filename'])
+        if path not in self.index.generation.metadata:
+            if not self.index.ready:  # => maybe not indexed yet
+                raise unavailable(self.index)
+            raise HTTPNotFound
+
+        try:
+            file_ = open(path, 'rb')
+        except (IOError, OSError):
+            raise HTTPNotFound
+
+        stat = fingerprint(os.fstat(file_.fileno()))
+        wrapper = req.environ.get('wsgi.file_wrapper')
+        if wrapper and req.range is None:  # => whole file
+            app_iter = wrapper(file_, BLOCK_SIZE)
+        else:
+            app_iter = FileIter(file_, stat.size, wrapper)
+
+        res = Response(app_iter=app_iter, content_length=stat.size,
+                       content_type=self.content_type, charset=None,
+                       conditional_response=True, accept_ranges='bytes',
+                       cache_control='public, max-age={}'.format(
+                           self.max_age))
+        res.etag = '{:x}-{:x}-{:x}'.format(
+            stat.inode, stat.size, stat.mtime_ns)
+        res.last_modified = stat.mtime_ns // 10**9
+
+        return res
+
+
+class MetricsHandler(object):
+    """Metrics in the Prometheus text format (see ``pypiple.metrics``)"""
+
+    def __init__(self, registry=None):
+        """Handler for the given registry.
+
+        Keyword Arguments:
+            registry (pypiple.metrics.Registry): source of the metrics.
+                Default is ``pypiple.metrics.REGISTRY``.
+        """
+        self.registry = metrics.REGISTRY if registry is None else registry
+
+    @wsgify
+    def __call__(self, req):
+        return Response(body=self.registry.render().encode('utf-8'),
+                        content_type=metrics.CONTENT_TYPE, charset=None,
+                        cache_control='no-cache')
+
+
+class ReadinessHandler(object):
+    """Readiness of the index (e.g. for load balancers and orchestrators).
+
+    The body is a JSON object with the ``ready`` flag and the progress of
+    the index update (``done`` and ``total`` packages). The status is
+    ``503 Service Unavailable`` while the index is not ready, when partial
+    listings are gated, so traffic is only routed to ready instances.
+    """
+
+    def __init__(self, index, partial='mark'):
+        """Handler for the given index.
+
+        Arguments:
+            index (pypiple.index.Index): index of packages
+
+        Keyword Arguments:
+            partial (str): policy for partial listings (PARTIAL_POLICIES)
+        """
+        self.index = index
+        self.partial = partial
+
+    @wsgify
+    def __call__(self, req):
+        self.index.revalidate()
+        ready = self.index.ready
+        done, total = self.index.progress
+        body = json.dumps({'ready': ready, 'done': done, 'total': total})
+        status = 503 if self.partial == 'gate' and not ready else 200
+
+        return Response(body=body.encode('utf-8'), status=status,
+                        content_type='application/json', charset=None,
+                        cache_control='no-cache')
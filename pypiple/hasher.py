@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple hasher
+--------------
+
+Computation of package digests (e.g. for ``#sha256=`` fragments in
+the simple API).
+
+Hashing big files can take a long time, so ``pypiple.hasher.Hasher`` runs
+in a background thread: packages are listed as soon as their metadata is
+extracted, and their digest becomes available later. Files are read in
+fixed-size chunks, so they are never completely loaded into memory.
+
+.. data:: CHUNK_SIZE
+
+    number of bytes read from the file at once (1 MiB)
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from six.moves import queue
+
+from pypiple import __version__  # noqa
+from pypiple.index import fingerprint
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path, algorithm='sha256', chunk_size=CHUNK_SIZE):
+    """Compute the digest of a file, reading it in chunks.
+
+    Arguments:
+        path (str): path to the file
+
+    Keyword Arguments:
+        algorithm (str): name of a ``hashlib`` algorithm
+        chunk_size (int): number of bytes read at once
+
+    Returns:
+        Tuple with the hex digest and the Fingerprint of the file
+        (taken after reading it).
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as file_:
+        for chunk in iter(lambda: file_.read(chunk_size), b''):
+            digest.update(chunk)
+            time.sleep(0)  # => give other (green)threads a chance to run
+        stat = fingerprint(os.fstat(file_.fileno()))
+
+    return digest.hexdigest(), stat
+
+
+class Hasher(object):
+    """Background thread computing digests for package files"""
+
+    def __init__(self, algorithm='sha256', chunk_size=CHUNK_SIZE):
+        """Idle hasher.
+
+        Keyword Arguments:
+            algorithm (str): name of a ``hashlib`` algorithm.
+                Default is ``sha256``.
+            chunk_size (int): number of bytes read at once.
+        """
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self._callback = None
+        self._thread = None
+        self._queue = queue.Queue()
+
+    def start(self, callback):
+        """Start processing files in background.
+
+        Arguments:
+            callback: function called with the path, the Fingerprint of the
+                file (as given to ``submit``) and the hex digest
+        """
+        self._callback = callback
+        self._thread = threading.Thread(
+            target=self._run, name='pypiple-hasher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop processing files"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, path, stat=None):
+        """Schedule the computation of a digest.
+
+        Arguments:
+            path (str): path to the file
+
+        Keyword Arguments:
+            stat (Fingerprint): stat info of the file when the metadata was
+                extracted. The digest is discarded if the file changes in
+                the meantime. Default is None (no verification).
+        """
+        self._queue.put((path, stat))
+
+    def join(self):
+        """Block until all the submitted files are processed"""
+        self._queue.join()
+
+    def _run(self):
+        """Thread main loop"""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._process(*job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, path, stat):
+        """Hash a single file and report the result"""
+        try:
+            digest, current = file_digest(
+                path, self.algorithm, self.chunk_size)
+        except (IOError, OSError):
+            LOGGER.warning('Unable to compute digest for %s', path)
+            return
+
+        if stat is not None and stat != current:
+            return  # => file changed, will be submitted again
+
+        try:
+            self._callback(path, stat, digest)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Error while handling digest for %s', path)
@@ -13,26 +13,56 @@ search methods. The index is also groups different versions of the same
 package and is able to recognize if the cached metadata is uptodate with
 the underlaying file system.
 
-.. _PKG_FIELDS:
-.. data:: PKG_FIELDS
-
-    list of metadata to be retrieved from package
+The records for the packages (and the generations of the index) are
+defined in ``pypiple.records``.
 
 .. data:: PKG_DECODERS
     mechanism used to extract package information, according to extension
+
+.. _METADATA_FILE_TYPES:
+.. data:: METADATA_FILE_TYPES
+    package formats whose metadata file is served separately (PEP 658)
+
+.. _Fingerprint:
+.. class:: Fingerprint
+
+    ``(mtime_ns, size, inode)`` tuple, obtained from the file stat info.
+    Used to detect changes in packages without reading them.
+
+.. _Progress:
+.. class:: Progress
+
+    ``(done, total)`` tuple, number of packages processed by an update.
 """
+import hashlib
 import logging
-from glob import glob
-from itertools import groupby
-from operator import add, itemgetter
-from os.path import basename, getmtime, join, splitext
-from time import time
+import os
+import tarfile
+import threading
+import time
+import zlib
+from collections import namedtuple
+from os.path import basename, getmtime
+from stat import S_ISREG
+from timeit import default_timer
+from zipfile import BadZipfile
 
 import pkginfo
-from property_manager import PropertyManager, cached_property
-from six.moves import reduce  # noqa, pylint: disable=redefined-builtin
+from property_manager import PropertyManager, writable_property
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    from scandir import scandir  # pylint: disable=import-error
 
 from pypiple import __version__  # noqa
+from pypiple.metrics import REGISTRY
+from pypiple.readers import READERS
+from pypiple.records import PKG_FIELDS, Generation, Package, group_packages
+# => also part of the API of this module
+from pypiple.records import (  # noqa  # pylint: disable=unused-import
+    extract_version, normalize)
+from pypiple.refresher import Refresher
 
 __author__ = 'Anderson Bravalheri'
 __copyright__ = 'Anderson Bravalheri'
@@ -40,18 +70,69 @@ __license__ = 'Mozilla Public License Version 2.0'
 
 LOGGER = logging.getLogger(__name__)
 
-PKG_FIELDS = (
-    'name', 'version', 'summary', 'home_page ', 'description', 'keywords',
-    'platform', 'classifiers', 'download_url', 'author', 'author_email',
-    'maintainer', 'maintainer_email',
-)
-
 PKG_DECODERS = {
     'whl': pkginfo.Wheel,
     'egg': pkginfo.BDist,
     'tar.gz': pkginfo.SDist,
 }
 
+METADATA_FILE_TYPES = ('whl',)
+
+DECODING_ERRORS = (
+    RuntimeError, ValueError, IOError, EOFError, BadZipfile,
+    tarfile.TarError, zlib.error,
+)
+
+Fingerprint = namedtuple('Fingerprint', 'mtime_ns size inode')
+
+Progress = namedtuple('Progress', 'done total')
+
+
+def fingerprint(stat):
+    """Build a Fingerprint_ from a ``os.stat_result``"""
+    return Fingerprint(stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def fingerprint_all(paths):
+    """Stat the given packages.
+
+    Arguments:
+        paths (Iterable[str]): paths to packages
+
+    Returns:
+        dict mapping paths to Fingerprint_. Paths that do not correspond
+        to an existing package file are excluded.
+    """
+    stats = {}
+    for path in paths:
+        if not pkg_type(path):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:  # => removed
+            continue
+        if S_ISREG(stat.st_mode):
+            stats[path] = fingerprint(stat)
+
+    return stats
+
+
+def pkg_type(path):
+    """Deduce package format from file name.
+
+    Arguments:
+        path (string): path to the package
+
+    Returns:
+        The extension, as used in PKG_DECODERS, or None if the file
+        is not a supported package.
+    """
+    for ext in PKG_DECODERS:
+        if path.endswith('.' + ext):
+            return ext
+
+    return None
+
 
 def filter_info(info):
     """Select most relevant information about package.
@@ -60,9 +141,9 @@ def filter_info(info):
         info (object): object with all attributes defined in PKG_FIELDS_.
 
     Returns:
-        A dict with all keys in defined PKG_FIELDS_.
+        A Package_ with all keys in defined PKG_FIELDS_.
     """
-    filtered = {field: getattr(info, field) for field in PKG_FIELDS}
+    filtered = Package({field: getattr(info, field) for field in PKG_FIELDS})
 
     if not info.maintainer:
         filtered['maintainer'] = info.author
@@ -71,44 +152,155 @@ def filter_info(info):
     return filtered
 
 
-def retrieve_data(path):
+def decode(path):
+    """Read the metadata of a python package.
+
+    Arguments:
+        path (string): path to the package
+
+    The fast readers in ``pypiple.readers`` are tried first, falling back
+    to PKG_DECODERS when they cannot find a valid metadata file.
+
+    Returns:
+        Tuple with the ``pkginfo.Distribution`` object and the raw contents
+        of the metadata file (e.g. ``PKG-INFO`` or ``METADATA``).
+    """
+    ext = pkg_type(path)
+    try:
+        raw = READERS[ext](path)
+    except DECODING_ERRORS:
+        raw = None
+
+    if raw and b'Metadata-Version' in raw:
+        info = pkginfo.Distribution()
+        info.parse(raw)
+        return info, raw
+
+    info = PKG_DECODERS[ext](path)
+    # => the archive is read again, but this is rare (e.g. unusual layouts)
+    return info, info.read()
+
+
+def retrieve_data(path, stat=None):
     """Retrieve metadata about a python package.
 
     Arguments:
         path (string): path to the package
 
+    Keyword Arguments:
+        stat (Fingerprint): stat info previously obtained for the file
+            (e.g. by ``Index.scan``). Default is None (stat the file).
+
     Returns:
-        A dict with all keys defined in PKG_FIELDS_.
+        A Package_ with all keys defined in PKG_FIELDS_, plus the file
+        ``mtime`` (in seconds) and the fields of its Fingerprint_.
+        For the formats in METADATA_FILE_TYPES_, the raw contents of the
+        metadata file (``metadata_file``) and its sha256 digest
+        (``core_metadata``) are also included.
     """
     try:
-        _, ext = splitext(path)
-        info = PKG_DECODERS[ext](path)
+        info, raw = decode(path)
         data = filter_info(info)
-        data['mtime'] = getmtime(path)
+        stat = stat or fingerprint(os.stat(path))
+        data.update(stat._asdict())
+        data['mtime'] = stat.mtime_ns / 1e9
+        if pkg_type(path) in METADATA_FILE_TYPES:
+            data['metadata_file'] = raw
+            data['core_metadata'] = hashlib.sha256(raw).hexdigest()
         return data
-    except (RuntimeError, ValueError):
+    except DECODING_ERRORS:
         LOGGER.error('Unnable to read information about %s', basename(path))
 
 
-def extract_version(pkg):
-    """Produce a comparable object from package version string.
+def _retrieve_item(item):
+    """Picklable helper for ``retrieve_all``, keeps path next to data
+    (and the time spent, since workers cannot record metrics)."""
+    path, stat = item
+    start = default_timer()
+    data = retrieve_data(path, stat)
+    return path, data, default_timer() - start
+
 
-    This functions assumes the package uses Semantic Versioning conventions.
-    See `<http://semver.org>`_
+START_METHODS = ('forkserver', 'spawn')
+"""Preferred ways to start worker processes (forking the current process
+is avoided, since other threads, e.g. the hasher, might be running)"""
+
+
+def create_pool(workers):
+    """Pool of processes used to decode packages (see ``retrieve_all``).
+
+    Note:
+        Processes are not forked (see START_METHODS), so scripts using
+        workers should be guarded by ``if __name__ == '__main__'``.
 
     Arguments:
-        pkg: ``dict``-like object containing package metadata.
-            Required key: ``version``.
+        workers (int): number of processes
 
     Returns:
-        tuple: components of a semantic version
+        ``multiprocessing.pool.Pool``, to be closed by the caller
     """
-    relevant = pkg['version'].split('+')[0]  # ignore build info
-    components = relevant.split('-')
-    main = components[0]
-    alias = components[1] if len(components) > 1 else ''  # e.g.: alpha, beta
+    # => only imported when workers are used (e.g. not by app workers)
+    import multiprocessing  # pylint: disable=import-outside-toplevel
+
+    available = multiprocessing.get_all_start_methods()
+    method = next(method for method in START_METHODS if method in available)
 
-    return tuple(main.split('.') + [alias])
+    return multiprocessing.get_context(method).Pool(workers)
+
+
+def retrieve_all(pkgs, workers=None, chunksize=None, pool=None):
+    """Retrieve metadata about several python packages.
+
+    When more than one worker is requested, packages are decoded by a pool
+    of processes, so decompression is not bounded by the GIL.
+
+    Arguments:
+        pkgs (Iterable[str]): paths to the packages. When a dict mapping
+            paths to Fingerprint_ is given, files are not stat'd again.
+
+    Keyword Arguments:
+        workers (int): number of processes used to decode packages.
+            Default is None (decode serially in the current process).
+        chunksize (int): number of packages sent to a worker at once.
+            By default, each worker receives around 4 chunks.
+        pool: pool of processes (see ``create_pool``), reused by several
+            calls (e.g. each batch of an update). It is not closed.
+            Default is None (a pool is created when workers are given).
+
+    Returns:
+        A dict mapping each path to the value returned by ``retrieve_data``
+        (None if pkg decoding fails).
+    """
+    stats = pkgs if isinstance(pkgs, dict) else dict.fromkeys(pkgs)
+    items = list(stats.items())
+
+    if len(items) < 2 or (pool is None and (not workers or workers < 2)):
+        return _collect(_retrieve_item(item) for item in items)
+
+    chunksize = chunksize or max(1, len(items) // ((workers or 1) * 4))
+    if pool is not None:
+        return _collect(pool.imap_unordered(_retrieve_item, items, chunksize))
+
+    pool = create_pool(min(workers, len(items)))
+    try:
+        return _collect(pool.imap_unordered(_retrieve_item, items, chunksize))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _collect(results):
+    """Build the dict returned by ``retrieve_all``, recording metrics"""
+    retrieved = {}
+    for path, data, elapsed in results:
+        REGISTRY.observe('pypiple_index_decode_seconds', elapsed)
+        if data is None:
+            REGISTRY.inc('pypiple_index_decode_failures_total')
+        retrieved[path] = data
+        # => with gevent, requests are served while long updates run
+        time.sleep(0)
+
+    return retrieved
 
 
 class Index(PropertyManager):
@@ -116,7 +308,9 @@ class Index(PropertyManager):
 
     This class assumes all packages are store into a single directory.
     The ``update`` method is used to sync the in-memory index with the
-    current state of the storage directory.
+    current state of the storage directory. Each update publishes a new
+    Generation_ (replacing the previous one at once), so readers never
+    need to lock the index.
 
     .. _support:
 
@@ -130,19 +324,268 @@ class Index(PropertyManager):
         Package format is deduced from file extension.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, workers=None, store=None, watcher=None,
+                 hasher=None, background=False, batch_size=None):
         """Cache-enabled index generator instance.
 
-        After created the index is empty. In order to synchronize its contents
+        After created the index is empty (or contains the metadata
+        persisted in the store). In order to synchronize its contents
         with the underlaying directory, please use the method ``update``.
 
         Arguments:
             path (str): path to the directory used to store packages
+
+        Keyword Arguments:
+            workers (int): number of processes used to extract metadata
+                from packages during ``update``. Default is None (serial
+                extraction). See ``retrieve_all``.
+            store (pypiple.store.Store): persistent storage for metadata.
+                When given, the index is loaded from the store and changes
+                are saved back on each ``update``, so only packages
+                modified in between need to be decoded again.
+                Default is None (in-memory only).
+            watcher (pypiple.watcher.AbstractWatcher): when given, the index
+                relies on the notifications of the watcher to know when
+                the directory changes (and which files should be updated),
+                instead of checking the file system. Default is None.
+            hasher (pypiple.hasher.Hasher): when given, digests for the
+                packages are computed in background and stored in the
+                metadata (under the key given by the hasher algorithm,
+                e.g. ``sha256``) as soon as they are ready.
+                Default is None (no digests).
+            background (bool): when True, ``revalidate`` does not block:
+                updates run in a background thread, while the current
+                contents of the index keep being served.
+                Default is False.
+            batch_size (int): when given, updates publish a new generation
+                each time this number of packages is processed, so partial
+                results can be served during long updates (e.g. the initial
+                build, see ``start``). Default is None (a single generation
+                is published at the end of the update).
         """
         super(Index, self).__init__()
         self.path = path
-        self._mtime = None  # => last index update
-        self._metadata = {}  # => primary source of true
+        self.workers = workers
+        self.store = store
+        self.watcher = watcher
+        self.hasher = hasher
+        self.batch_size = batch_size
+        # primary source of true (replaced, never modified, by updates):
+        self._generation = Generation({
+            path: self.compact(data)
+            for path, data in (store.load() if store else {}).items()
+        })
+        self._lock = threading.Lock()  # => protect invalidation info
+        self._writer = threading.RLock()  # => serialize updates
+        self._digests = {}  # => path: (stat, digest) waiting for update
+        self._rescan = True  # => the next update should scan the directory
+        self._pending = set()  # => paths to be checked in the next update
+        self._failures = {}  # => stat info for packages that can't be read
+        self._metadata_files = {}  # => PEP 658 files (when without store)
+        self._listeners = []  # => functions notified about changes
+        self._background = background
+        self._refresher = Refresher(self.update)
+        self._started = False  # => initial update running in background
+        self._ready = False  # => at least one update was completed
+        self._progress = Progress(0, None)
+        self._scanned = None  # => when the directory was last synchronized
+
+        if watcher:
+            watcher.start(self.invalidate)
+
+        if hasher:
+            hasher.start(self.digested)
+            self.digest(self._generation.metadata)
+
+    def close(self):
+        """Stop the background activities, and close the store (if any)"""
+        self._refresher.stop()
+        if self.watcher:
+            self.watcher.stop()
+        if self.hasher:
+            self.hasher.stop()
+        if self.store:
+            self.store.close()
+
+    def invalidate(self, paths=None):
+        """Mark packages as changed, so they are checked by the next update.
+
+        This method is used as callback for watchers (see ``pypiple.watcher``)
+
+        Keyword Arguments:
+            paths (Iterable[str]): paths that changed inside the directory.
+                Default is None (the whole directory is scanned again).
+        """
+        with self._lock:
+            if paths is None:
+                self._rescan = True
+            else:
+                self._pending.update(paths)
+
+    def digest(self, records, stats=None):
+        """Submit packages without digest to the hasher.
+
+        Arguments:
+            records (dict): metadata indexed by package path
+
+        Keyword Arguments:
+            stats (dict): Fingerprint_ for (some of) the packages
+        """
+        stats = stats or {}
+        for path, data in records.items():
+            if data is not None and not data.get(self.hasher.algorithm):
+                self.hasher.submit(path, stats.get(path) or Fingerprint(
+                    data['mtime_ns'], data['size'], data['inode']))
+
+    def digested(self, path, stat, digest):
+        """Schedule the digest of a package to be stored in its metadata.
+
+        This method is used as callback for the hasher. Digests are
+        published in batch by the next ``update`` (listeners are notified,
+        the packages are reported as modified).
+
+        Arguments:
+            path (str): path to the package
+            stat (Fingerprint): stat info of the hashed file
+            digest (str): hex digest
+        """
+        with self._lock:
+            self._digests[path] = (stat, digest)
+
+    def _apply_digests(self, metadata):
+        """Copies of the records with the digests received from hasher.
+
+        Arguments:
+            metadata (dict): current metadata, indexed by path
+
+        Returns:
+            dict with the new records, indexed by path
+        """
+        with self._lock:
+            digests, self._digests = self._digests, {}
+
+        records = {}
+        for path, (stat, digest) in digests.items():
+            data = metadata.get(path)
+            if data is None or self.changed(path, stat):
+                continue  # => outdated digest
+            record = records[path] = self.compact(Package(data))
+            record[self.hasher.algorithm] = digest
+
+        return records
+
+    @property
+    def algorithm(self):
+        """Name of the algorithm used for package digests (or None)"""
+        return self.hasher and self.hasher.algorithm
+
+    def compact(self, data):
+        """Prepare metadata to be kept in memory.
+
+        The description is released, and retrieved again only when needed
+        (see ``description``).
+
+        Arguments:
+            data (dict): package metadata
+
+        Returns:
+            Package_
+        """
+        record = data if isinstance(data, Package) else Package(data)
+        record.unload()
+        return record
+
+    def description(self, pkg):
+        """Retrieve the long description of a package.
+
+        Descriptions are not kept in memory: they are read from the store
+        (when available) or extracted from the package file again.
+
+        Arguments:
+            pkg (str): path to the package
+
+        Returns:
+            str or None, if not available
+        """
+        if self.store:
+            text = self.store.load_description(pkg)
+            if text is not None:
+                return text
+
+        try:
+            info, _ = decode(pkg)
+        except (DECODING_ERRORS + (OSError, KeyError)):
+            LOGGER.error('Unnable to read description of %s', basename(pkg))
+            return None
+
+        return info.description
+
+    def metadata_file(self, pkg):
+        """Retrieve the contents of the metadata file for a package.
+
+        See PEP 658.
+
+        Arguments:
+            pkg (str): path to the package
+
+        Returns:
+            bytes or None, if not available
+        """
+        if self.store:
+            return self.store.load_file(pkg)
+
+        return self._metadata_files.get(pkg)
+
+    def subscribe(self, callback):
+        """Register a function to be notified about changes in the index.
+
+        Arguments:
+            callback: function called after each ``update`` that modifies
+                the index, with the same ``(modified, removed)`` sets
+                returned by ``update``.
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start updating the index in background (without blocking).
+
+        Until the update finishes, ``revalidate`` does not block (even if
+        the index is not in background mode), so the contents of the index
+        can be served meanwhile (see ``ready`` and ``progress``).
+        """
+        self._started = True
+        self._refresher.trigger()
+
+    @property
+    def ready(self):
+        """True after the first update is completed (the contents of the
+        index reflect the directory)"""
+        return self._ready
+
+    @property
+    def progress(self):
+        """Progress_ of the current (or last) update decoding packages"""
+        return self._progress
+
+    def revalidate(self):
+        """Make sure the index is (or will soon be) uptodate.
+
+        In background mode (or while the update triggered by ``start`` is
+        running), the update is just scheduled and the current contents are
+        kept until it finishes. Otherwise, it is the same as ``update``.
+
+        Returns:
+            True if the index is uptodate
+        """
+        if self.uptodate():
+            return True
+
+        if self._background or (self._started and not self._ready):
+            self._refresher.trigger()
+            return False
+
+        self.update()
+        return True
 
     def uptodate(self):
         """Discover if the index cache is uptodate.
@@ -150,9 +593,17 @@ class Index(PropertyManager):
         Returns:
             True if no change in index directory since the last update
         """
-        mtime = self.mtime()
+        return not self._digests and self._synchronized()
 
-        return mtime and mtime >= getmtime(self.path)
+    def _synchronized(self):
+        """Same as ``uptodate``, but ignoring digests waiting for update"""
+        if self._rescan or self._pending:
+            return False
+
+        if self.watcher:
+            return True  # changes are notified, no need to check the disk
+
+        return self._scanned and self._scanned >= getmtime(self.path)
 
     def mtime(self, pkg=None):
         """Retrieve the time instant when the index where updated.
@@ -169,26 +620,65 @@ class Index(PropertyManager):
         if pkg:
             return self.metadata[pkg]['mtime']  # pylint: disable=unsubscriptable-object
 
-        return self._mtime
+        return self._generation.mtime
 
     def scan(self):
         """Scan the index directory searching for python packages.
 
+        The directory is listed only once, and the stat info obtained for each
+        package is returned, so it does not need to be read again.
+
         See support_.
 
         Returns:
-            List of paths for package files inside index directory.
+            dict mapping paths of package files inside index directory
+            to their Fingerprint_.
+        """
+        pkgs = {}
+        for entry in scandir(self.path):
+            if pkg_type(entry.name) and entry.is_file():
+                pkgs[entry.path] = fingerprint(entry.stat())
+
+        return pkgs
+
+    def changed(self, pkg, stat=None):
+        """Discover if a package changed since its metadata was extracted.
+
+        Arguments:
+            pkg (str): path to a package present in the index cache
+
+        Keyword Arguments:
+            stat (Fingerprint): current stat info for the package.
+                Default is None (compare modification time on disk).
+
+        Returns:
+            True if the package was modified.
         """
-        types = PKG_DECODERS.keys()
-        pkgs = [glob(join(self.path, '*.{}'.format(ext))) for ext in types]
-        return reduce(add, pkgs)  # merge arrays
+        data = self.metadata[pkg]  # pylint: disable=unsubscriptable-object
+
+        if data is None:  # => package decoding failed
+            return stat is None or self._failures.get(pkg) != stat
+
+        if stat is None or 'mtime_ns' not in data:
+            return getmtime(pkg) > data['mtime']
+
+        return stat != Fingerprint(
+            data['mtime_ns'], data['size'], data['inode'])
 
-    def diff(self, pkgs):
+    def diff(self, pkgs, scope=None):
         """Compute the difference between index cache and the given list
         of paths for packages.
 
         Arguments:
-            pks (List[str]): List of paths pointing to python packages
+            pks (List[str]): List of paths pointing to python packages.
+                When a dict mapping paths to Fingerprint_ is given (e.g.
+                the result of ``scan``), files are not stat'd again.
+
+        Keyword Arguments:
+            scope (Iterable[str]): when given, only these paths are
+                considered part of the index cache, e.g. when ``pkgs`` is
+                not the result of a complete directory scan.
+                Default is None.
 
         Returns:
             Tuple with 3 elements.
@@ -200,12 +690,15 @@ class Index(PropertyManager):
             but present in the index cache.
         """
         cached = set(self.files)
+        if scope is not None:
+            cached &= set(scope)
         current = set(pkgs)
+        stats = pkgs if isinstance(pkgs, dict) else {}
 
         added = current - cached
         removed = cached - current
         suspects = current & cached  # intersection
-        dirty = {pkg for pkg in suspects if getmtime(pkg) > self.mtime(pkg)}
+        dirty = {pkg for pkg in suspects if self.changed(pkg, stats.get(pkg))}
 
         return (added, dirty, removed)
 
@@ -220,59 +713,199 @@ class Index(PropertyManager):
             the last update.
         """
         if self.uptodate():
+            self._ready = True
             return None
 
-        current = self.scan()
-        (added, dirty, removed) = self.diff(current)
+        with self._writer:
+            # => concurrent callers waiting for the lock find it uptodate
+            if self.uptodate():
+                self._ready = True
+                return None
+
+            with REGISTRY.timer('pypiple_index_update_seconds'):
+                REGISTRY.inc('pypiple_index_updates_total')
+                changes = self._update()
+                self._ready = True
+                return changes
+
+    def _update(self):
+        """Same as ``update``, but must be called by a single thread"""
+        generation = self._generation
+        metadata = generation.metadata
+
+        if self._synchronized():
+            # => just digests to publish, no need to look at the directory
+            current, (added, dirty, removed) = {}, (set(), set(), set())
+            scanned = self._scanned
+        else:
+            with self._lock:
+                rescan, self._rescan = self._rescan, False
+                pending, self._pending = self._pending, set()
+
+            scanned = time.time()
+            with REGISTRY.timer('pypiple_index_scan_seconds'):
+                if rescan or not self.watcher:
+                    current, scope = self.scan(), None
+                else:
+                    # just the paths notified by the watcher need checking
+                    current, scope = fingerprint_all(pending), pending
+            with REGISTRY.timer('pypiple_index_diff_seconds'):
+                (added, dirty, removed) = self.diff(current, scope=scope)
 
         for path in removed:
-            del self._metadata[path]
+            self._failures.pop(path, None)
+            self._metadata_files.pop(path, None)
 
         modified = added | dirty  # union off sets
-        self._metadata.update(
-            {path: retrieve_data(path) for path in modified})
-        # retrieve_data will return None if pkg decoding fails,
-        # therefore, it's necessary to check null values
+        digested = {
+            path: data for path, data in self._apply_digests(metadata).items()
+            if path not in removed and path not in dirty
+        }
+        changes = (modified | set(digested), removed)
+
+        if self.store:
+            self.store.delete(removed)
+            self.store.save(digested)
+
+        # removals and digests are published with the first batch
+        stale = {path: metadata[path] for path in removed}
+        stale.update((path, metadata[path]) for path in digested)
+        fresh = digested
+        notified = set(digested)
+
+        queue = sorted(modified)
+        size = self.batch_size or len(queue) or 1
+        # updates with nothing to decode (e.g. only digests) keep the
+        # progress of the previous one (e.g. the initial build)
+        tracked = queue or self._progress.total is None
+        if tracked:
+            self._progress = Progress(0, len(queue))
+        pool = None  # => shared by all the batches
+        if self.workers and self.workers > 1 and len(queue) > 1:
+            pool = create_pool(min(self.workers, len(queue)))
+        try:
+            for start in range(0, len(queue) or 1, size):
+                batch = queue[start:start + size]
+                done = start + len(batch)
+                stale.update((path, metadata[path])
+                             for path in batch if path in metadata)
+                fresh.update(self._retrieve(batch, current, pool))
+                notified.update(batch)
+                # publish the new generation (a single reference swap).
+                # Partial results keep the old mtime, so the index is not
+                # considered uptodate before the last batch
+                self._generation = self._generation.evolve(
+                    stale, fresh, time.time() if done == len(queue) else
+                    generation.mtime)
+                if tracked:
+                    self._progress = Progress(done, len(queue))
+                self.notify(notified, removed)
+                stale, fresh, notified, removed = {}, {}, set(), set()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self._scanned = scanned
+        return changes
+
+    def _retrieve(self, paths, current, pool=None):
+        """Extract (and save) the metadata of packages during ``update``.
 
-        # Expire cache: be lazy and regenerate it on demand
-        self.clear_cached_properties()
+        Arguments:
+            paths (List[str]): paths to the packages
+            current (dict): Fingerprint_ for (some of) the packages
 
-        # Store 'last-updated' info
-        self._mtime = time()
+        Keyword Arguments:
+            pool: pool of processes (see ``retrieve_all``)
 
-        return (modified, removed)
+        Returns:
+            dict with the (compact) metadata indexed by path.
+            The metadata is None when decoding fails.
+        """
+        retrieved = retrieve_all(
+            {path: current.get(path) for path in paths}, self.workers,
+            pool=pool)
+        files = {
+            path: data and data.pop('metadata_file', None)
+            for path, data in retrieved.items()
+        }
+        # retrieve_data will return None if pkg decoding fails,
+        # therefore, it's necessary to check null values
+        # (the stat info is kept to avoid retrying until the file changes)
+        for path, data in retrieved.items():
+            if data is None:
+                self._failures[path] = current.get(path)
+            else:
+                self._failures.pop(path, None)
+
+        if self.store:
+            self.store.save(retrieved)
+            self.store.save_files(files)
+        else:
+            for path, data in files.items():
+                if data:
+                    self._metadata_files[path] = data
+                else:
+                    self._metadata_files.pop(path, None)
+
+        for path, data in retrieved.items():
+            if data is not None:  # => already saved, release description
+                retrieved[path] = self.compact(data)
+
+        if self.hasher:
+            self.digest(retrieved, current)
+
+        return retrieved
+
+    def notify(self, modified, removed):
+        """Inform the listeners (see ``subscribe``) about changes, if any"""
+        if modified or removed:
+            for callback in self._listeners:
+                callback(modified, removed)
+
+    @property
+    def generation(self):
+        """Current Generation_ of the index.
+
+        Readers that need a consistent view of the index (e.g. during a whole
+        request) should retrieve the generation once and use its contents.
+        """
+        return self._generation
 
-    @cached_property
+    @writable_property
     def files(self):
         """List of indexed files
 
-        Lazy generated list containing all the files inside index
-        directory whose type is supported.
+        All the files inside index directory whose type is supported,
+        according to the current generation.
 
         See support_.
         """
 
-        return self.metadata.keys()  # pylint: disable=no-member
+        return self._generation.files
 
-    @cached_property
+    @writable_property
     def metadata(self):
         """List of metadata about packages
 
-        Lazy generated list containing all the metadata about indexed packages.
+        All the metadata about indexed packages, according to the current
+        generation.
         """
 
-        return self._metadata
+        return self._generation.metadata
 
-    @cached_property
+    @writable_property
     def packages(self):
         """List of packages
 
-        Lazy generated dictionary containing all different versions
-        for each package, indexed by its name.
+        Dictionary containing all different versions for each package
+        (see ``Releases``), indexed by its normalized name.
+        Generated on demand for the current generation.
         """
 
-        cache = self.metadata.values()  # pylint: disable=no-member
-        return {
-            name: sorted(infos, key=extract_version, reverse=True)
-            for name, infos in groupby(cache, key=itemgetter('name'))
-        }
+        generation = self._generation
+        if self.metadata is not generation.metadata:  # => assigned directly
+            return group_packages(self.metadata)
+
+        return generation.packages
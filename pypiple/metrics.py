@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple metrics
+---------------
+
+Lightweight instrumentation, exposed in the Prometheus text format.
+
+Counters and timers are kept in a ``Registry`` (recording a value is just
+a dict update under a lock, cheap enough to stay on in production).
+Values that are already tracked somewhere else (e.g. the statistics of
+``pypiple.cache.LRUCache``) can be registered as callbacks, evaluated only
+when the metrics are rendered.
+
+Timers are exposed as summaries (``<name>_sum`` and ``<name>_count``),
+so the average duration can be computed by the monitoring system.
+
+.. data:: REGISTRY
+
+    default registry, used by the index and the handlers
+
+.. data:: DESCRIPTIONS
+
+    type and help text for the metrics produced by pypiple
+"""
+import threading
+from contextlib import contextmanager
+from timeit import default_timer
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+DESCRIPTIONS = {
+    'pypiple_index_updates_total': (
+        'counter', 'Index updates that checked the packages directory'),
+    'pypiple_index_update_seconds': (
+        'summary', 'Time spent updating the index'),
+    'pypiple_index_scan_seconds': (
+        'summary', 'Time spent listing the packages directory'),
+    'pypiple_index_diff_seconds': (
+        'summary', 'Time spent comparing the directory with the index'),
+    'pypiple_index_decode_seconds': (
+        'summary', 'Time spent extracting metadata from each package'),
+    'pypiple_index_decode_failures_total': (
+        'counter', 'Packages whose metadata could not be extracted'),
+    'pypiple_index_files': (
+        'gauge', 'Package files in the index'),
+    'pypiple_index_ready': (
+        'gauge', '1 after the first update of the index is completed'),
+    'pypiple_index_progress_done': (
+        'gauge', 'Packages processed by the current (or last) update'),
+    'pypiple_render_seconds': (
+        'summary', 'Time spent rendering pages'),
+    'pypiple_responses_total': (
+        'counter', 'Responses produced by the handlers'),
+    'pypiple_response_bytes_total': (
+        'counter', 'Bytes sent in the bodies of the responses'),
+    'pypiple_cache_hits_total': (
+        'counter', 'Rendered pages found in cache'),
+    'pypiple_cache_misses_total': (
+        'counter', 'Rendered pages missing from cache'),
+    'pypiple_cache_evictions_total': (
+        'counter', 'Rendered pages evicted from cache'),
+    'pypiple_cache_bytes': (
+        'gauge', 'Size of the pages stored in cache'),
+}
+
+
+def _labels(labels):
+    """Hashable (and sorted) representation of the labels"""
+    return tuple(sorted(labels.items()))
+
+
+def _format(name, labels, value):
+    """Single line of the Prometheus text format"""
+    if labels:
+        name += '{{{}}}'.format(','.join(
+            '{}="{}"'.format(key, str(val).replace('\\', r'\\')
+                             .replace('"', r'\"').replace('\n', r'\n'))
+            for key, val in labels))
+
+    return '{} {!r}'.format(name, float(value))
+
+
+class Registry(object):
+    """Collection of metrics"""
+
+    def __init__(self, descriptions=None):
+        """Empty registry.
+
+        Keyword Arguments:
+            descriptions (dict): type and help text for each metric name.
+                Default is DESCRIPTIONS.
+        """
+        self.descriptions = DESCRIPTIONS if descriptions is None \
+            else descriptions
+        self._values = {}  # => (name, labels): value or [sum, count]
+        self._callbacks = {}  # => (name, labels): function
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration for a timer"""
+        key = (name, _labels(labels))
+        with self._lock:
+            totals = self._values.get(key)
+            if totals is None:
+                totals = self._values[key] = [0.0, 0]
+            totals[0] += seconds
+            totals[1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Context manager recording the time spent inside the block"""
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.observe(name, default_timer() - start, **labels)
+
+    def register(self, name, function, **labels):
+        """Register a callback that produces the value of a metric.
+
+        Arguments:
+            name (str): metric name
+            function: callable without arguments, returning a number.
+                It is called every time the metrics are rendered.
+        """
+        with self._lock:
+            self._callbacks[(name, _labels(labels))] = function
+
+    def value(self, name, **labels):
+        """Current value of a metric (``(sum, count)`` for timers)"""
+        key = (name, _labels(labels))
+        if key in self._callbacks:
+            return self._callbacks[key]()
+
+        value = self._values.get(key)
+        return tuple(value) if isinstance(value, list) else value
+
+    def clear(self):
+        """Reset all the counters and timers (callbacks are kept)"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        """Produce the Prometheus text exposition of all metrics"""
+        with self._lock:
+            samples = [(key, list(value) if isinstance(value, list)
+                        else value) for key, value in self._values.items()]
+            callbacks = sorted(self._callbacks.items(),
+                               key=lambda item: item[0])
+
+        samples += [(key, function()) for key, function in callbacks]
+        lines = []
+        described = set()
+        for (name, labels), value in sorted(samples, key=lambda s: s[0]):
+            if name not in described:
+                described.add(name)
+                kind, text = self.descriptions.get(name, ('untyped', name))
+                lines.append('# HELP {} {}'.format(name, text))
+                lines.append('# TYPE {} {}'.format(name, kind))
+            if isinstance(value, list):
+                lines.append(_format(name + '_sum', labels, value[0]))
+                lines.append(_format(name + '_count', labels, value[1]))
+            else:
+                lines.append(_format(name, labels, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
@@ -8,11 +8,32 @@ Usefull Middleware for WSGI applications.
 
 - ``filter_path`` can be used to abort requests based on the path, e.g. allow
     access for static files with specifics extensions.
+- ``profile_requests`` can be used to profile (some of the) requests with
+    ``cProfile``.
+- ``count_responses`` records the status and size of the responses
+    actually sent (see ``pypiple.metrics``).
 """
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
 
+from webob import Response
 from webob.dec import wsgify
 from webob.exc import HTTPNotFound
 
+from pypiple import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Pypiple-Profile'
+"""Header used to request profiling (see ``profile_requests``)"""
+
 
 @wsgify.middleware
 def filter_path(req, app, path_filter):
@@ -35,3 +56,165 @@ def filter_path(req, app, path_filter):
         raise HTTPNotFound
 
     return app
+
+
+def count_responses(app, handler, registry=None):
+    """Record the responses of an app in ``pypiple_responses_total`` and
+    ``pypiple_response_bytes_total``, labeled with ``handler``.
+
+    Responses are recorded as they leave the app, i.e. after conditional
+    requests and ranges are evaluated (a ``304 Not Modified`` counts as
+    such, without body). Files passed to the server's
+    ``wsgi.file_wrapper`` are not iterated here (so the server can still
+    use ``sendfile``), and their ``Content-Length`` is counted instead.
+
+    Arguments:
+        app: WSGI application
+        handler (str): value for the ``handler`` label
+
+    Keyword Arguments:
+        registry (pypiple.metrics.Registry): where the values are recorded.
+            Default is ``pypiple.metrics.REGISTRY``.
+
+    Returns:
+        The wrapped app
+    """
+    registry = metrics.REGISTRY if registry is None else registry
+
+    def record(status, size):
+        """Record a response sent"""
+        registry.inc('pypiple_responses_total',
+                     handler=handler, status=int(status.split(None, 1)[0]))
+        registry.inc('pypiple_response_bytes_total', size, handler=handler)
+
+    def counter(environ, start_response):
+        """App wrapped by ``count_responses``"""
+        sent = {}
+
+        def _start_response(status, headers, *args):
+            sent['status'] = status
+            sent['headers'] = headers
+            return start_response(status, headers, *args)
+
+        app_iter = app(environ, _start_response)
+        wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(wrapper, type) and isinstance(app_iter, wrapper):
+            size = next((value for name, value in sent['headers']
+                         if name.lower() == 'content-length'), 0)
+            record(sent['status'], int(size))
+            return app_iter
+
+        return _CountedIter(app_iter, lambda size: record(
+            sent.get('status', '500'), size))
+
+    return counter
+
+
+class _CountedIter(object):
+    """Iterable that reports the number of bytes produced when closed"""
+
+    def __init__(self, app_iter, callback):
+        self.app_iter = app_iter
+        self.callback = callback
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self.app_iter:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        """Close the original iterable, and report the size"""
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            if self.callback:
+                self.callback(self.size)
+                self.callback = None
+
+
+def profile_requests(app, directory=None, rate=0.0, token=None,
+                     header=PROFILE_HEADER):
+    """Profile requests with ``cProfile``.
+
+    Requests are profiled when sampled (according to ``rate``) or when
+    they carry ``header`` with the value ``token``. Stats are dumped to
+    ``directory`` (one ``.prof`` file per request, that can be opened with
+    ``pstats`` or tools like ``snakeviz``). For requests with the header,
+    a text report replaces the response (so it works as an admin flag)::
+
+        app = profile_requests(app, '/tmp/profiles', rate=0.01,
+                               token='secret')
+
+    When neither ``rate`` nor ``token`` is given, profiling is disabled and
+    the original app is returned (no overhead at all). Otherwise,
+    ``directory`` is required (and created if missing). Failures to dump the
+    stats are logged, and do not affect the response.
+
+    Note:
+        Only the time until the app returns the response is profiled: the
+        body is not consumed (so package files are still streamed).
+        With ``gevent``, other greenlets running while the request waits
+        for I/O are included in the profile.
+
+    Arguments:
+        app: WSGI application
+
+    Keyword Arguments:
+        directory (str): where profile stats are dumped.
+            Required when profiling is enabled.
+        rate (float): fraction of the requests to be sampled (0 to 1)
+        token (str): value for the header that triggers profiling.
+            Default is None (header is ignored).
+        header (str): name of the header. Default is PROFILE_HEADER.
+
+    Returns:
+        The wrapped app
+
+    Raises:
+        ValueError if ``rate`` or ``token`` is given without ``directory``
+    """
+    if not (rate or token):
+        return app
+
+    if not directory:
+        raise ValueError('A directory is required to profile requests')
+
+    os.makedirs(directory, exist_ok=True)
+
+    return _profile(  # pylint: disable=no-value-for-parameter
+        app, directory=directory, rate=rate, token=token, header=header)
+
+
+@wsgify.middleware
+def _profile(req, app, directory, rate, token, header):
+    """Middleware for ``profile_requests``"""
+    value = req.headers.get(header)
+    requested = (token is not None and value is not None and
+                 hmac.compare_digest(value.encode('utf-8'),
+                                     token.encode('utf-8')))
+    if not (requested or (rate and random.random() < rate)):
+        return app
+
+    profiler = cProfile.Profile()
+    res = profiler.runcall(req.get_response, app)
+
+    name = '{:.6f}-{}{}.prof'.format(
+        time.time(), os.getpid(), re.sub(r'[^\w.-]+', '_', req.path))
+    try:
+        profiler.dump_stats(os.path.join(directory, name))
+    except (IOError, OSError):  # => e.g. disk full, never fail the request
+        LOGGER.exception('Unable to dump profile stats to %s', directory)
+
+    if not requested:
+        return res
+
+    if hasattr(res.app_iter, 'close'):  # => replaced by the report
+        res.app_iter.close()
+
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(50)
+    text = u'{} {}\n{}'.format(res.status, req.path, report.getvalue())
+    return Response(text=text, content_type='text/plain', charset='utf-8')
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple readers
+---------------
+
+Fast extraction of the raw metadata file from package archives.
+
+``pkginfo`` lists all the members of an archive before looking for the
+metadata file, which for compressed tarballs means decompressing the whole
+sdist. The readers in this module go straight to the relevant entry:
+
+- wheels and eggs (zip files): the entry is looked up in the central
+    directory, and only that entry is decompressed.
+- sdists (tar.gz): the tarball is streamed, and reading stops at the
+    first ``<dir>/PKG-INFO`` member.
+
+.. data:: READERS
+
+    reader function to be used, according to the package extension
+    (same keys used in ``pypiple.index.PKG_DECODERS``)
+"""
+import re
+import tarfile
+import zipfile
+from os.path import basename
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+WHEEL_METADATA = re.compile(r'^[^/]+\.dist-info/METADATA$')
+SDIST_METADATA = re.compile(r'^\.?/?[^/]+/PKG-INFO$')
+
+
+def read_zip_member(path, candidates, pattern):
+    """Read the first member of a zip file that matches the given criteria.
+
+    Arguments:
+        path (str): path to the zip file
+        candidates (List[str]): names to be tried first (exact match)
+        pattern: compiled regex used as fallback, matched against all names.
+            None means the candidates are the only acceptable names.
+
+    Returns:
+        bytes or None if no member is found
+    """
+    with zipfile.ZipFile(path) as archive:
+        for name in candidates:
+            try:
+                return archive.read(name)
+            except KeyError:
+                pass
+
+        if pattern is None:
+            return None
+
+        for name in archive.namelist():
+            if pattern.match(name):
+                return archive.read(name)
+
+    return None
+
+
+def read_wheel(path):
+    """Read the ``METADATA`` file inside a wheel.
+
+    The ``.dist-info`` directory name is derived from the file name
+    (``{distribution}-{version}-...whl``), according to PEP 427.
+    """
+    parts = basename(path).split('-')
+    candidates = ['{}-{}.dist-info/METADATA'.format(*parts[:2])]
+
+    return read_zip_member(path, candidates, WHEEL_METADATA)
+
+
+def read_egg(path):
+    """Read the ``PKG-INFO`` file inside an egg"""
+    return read_zip_member(path, ['EGG-INFO/PKG-INFO'], None)
+
+
+def read_sdist(path):
+    """Read the ``PKG-INFO`` file in the top level directory of an sdist.
+
+    The archive is streamed: members after ``PKG-INFO`` are never read.
+    """
+    with tarfile.open(path, 'r|gz') as archive:
+        for member in archive:
+            if member.isfile() and SDIST_METADATA.match(member.name):
+                return archive.extractfile(member).read()
+
+    return None
+
+
+READERS = {
+    'whl': read_wheel,
+    'egg': read_egg,
+    'tar.gz': read_sdist,
+}
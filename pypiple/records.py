@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple records
+---------------
+
+In-memory representation of the contents of ``pypiple.index.Index``.
+
+Each package file is described by a compact ``Package`` record. Records
+are grouped by (normalized) package name into ``Releases``, sorted by
+version, and the whole state of the index at a given instant is kept in a
+``Generation``, replaced (never modified) by each update.
+
+.. _PKG_FIELDS:
+.. data:: PKG_FIELDS
+
+    list of metadata to be retrieved from package
+
+.. _Package:
+.. class:: Package
+
+    compact (``dict``-like) record for the metadata of a package file.
+
+.. _Generation:
+.. class:: Generation
+
+    immutable state of the index, replaced by each update.
+"""
+import re
+from bisect import bisect_left, bisect_right
+
+from six.moves import collections_abc, intern
+
+from pypiple import __version__  # noqa
+from pypiple.version import version_key
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+PKG_FIELDS = (
+    'name', 'version', 'summary', 'home_page', 'description', 'keywords',
+    'platforms', 'classifiers', 'download_url', 'author', 'author_email',
+    'maintainer', 'maintainer_email',
+)
+
+INTERNED_FIELDS = frozenset([
+    'name', 'author', 'author_email', 'maintainer', 'maintainer_email',
+    'platforms', 'classifiers',
+])
+"""Fields whose values repeat a lot between packages (shared in memory)"""
+
+NOT_LOADED = object()
+"""Marker for descriptions released from memory"""
+
+
+def _intern(value):
+    """Share equal strings in memory (sequences are converted to tuples)"""
+    if isinstance(value, str):
+        return intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_intern(item) for item in value)
+
+    return value
+
+
+class Package(collections_abc.MutableMapping):
+    """Metadata about a package file.
+
+    Packages behave like dicts (so they can be serialized and compared as
+    such), but store the known fields in slots. Strings that repeat a lot
+    (e.g. author and classifiers) are interned and the long ``description``
+    can be released from memory (see ``unload``), being retrieved again by
+    the index only when needed (see ``pypiple.index.Index.description``).
+    Unknown keys are kept in a separate dict.
+
+    Like in the dict produced by the record, known fields are only
+    considered to be present if they are not None (although reading them
+    returns None), and the description only while it is loaded.
+    """
+
+    FIELDS = tuple(field for field in PKG_FIELDS if field != 'description') + (
+        'mtime', 'mtime_ns', 'size', 'inode', 'sha256', 'core_metadata')
+
+    __slots__ = FIELDS + ('_description', '_extra')
+
+    _FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, fields=None):
+        """Record containing the given fields.
+
+        Keyword Arguments:
+            fields (dict): initial metadata. Default is None (empty).
+        """
+        super(Package, self).__init__()
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self._description = None
+        self._extra = None  # => dict created on demand
+        if fields:
+            self.update(fields)
+
+    def __reduce__(self):
+        return (Package, (dict(self),))
+
+    def unload(self):
+        """Release the description from memory.
+
+        Afterwards, the record no longer contains the ``description`` key.
+        """
+        self._description = NOT_LOADED
+
+    def __getitem__(self, key):
+        if key == 'description':
+            if self._description is NOT_LOADED:
+                raise KeyError(key)
+            return self._description
+        if key in self._FIELD_SET:
+            return getattr(self, key)
+        if self._extra is None:
+            raise KeyError(key)
+
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in INTERNED_FIELDS:
+            value = _intern(value)
+
+        if key == 'description':
+            self._description = value
+        elif key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key == 'description' or key in self._FIELD_SET:
+            self[key] = None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        # => consistent with __iter__, without building the list of keys
+        if key == 'description':
+            return self._description is not NOT_LOADED
+        if key in self._FIELD_SET:
+            return getattr(self, key) is not None
+
+        return bool(self._extra) and key in self._extra
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._description is not NOT_LOADED:
+            yield 'description'
+        for key in self._extra or ():
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '<Package {}>'.format(dict(
+            (key, value) for key, value in self.items()
+            if key != 'description'))
+
+
+def extract_version(pkg):
+    """Produce a comparable object from package version string.
+
+    Versions are compared according to PEP 440 (see ``pypiple.version``).
+
+    Arguments:
+        pkg: ``dict``-like object containing package metadata.
+            Required key: ``version``.
+
+    Returns:
+        tuple: sorting key for the version (memoized)
+    """
+    return version_key(pkg['version'])
+
+
+def normalize(name):
+    """Normalize a package name according to PEP 503.
+
+    Arguments:
+        name (str): name of the package, as found in its metadata
+
+    Returns:
+        Lowercase name, with runs of ``-``, ``_`` and ``.`` replaced by ``-``.
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+class Releases(list):
+    """Metadata for all versions of a package, sorted from the newest
+    to the oldest.
+
+    The sorting keys are kept aside, so releases can be added or removed
+    without sorting the whole list again (or parsing versions).
+    The newest release is always the first element.
+    """
+
+    def __init__(self, pkgs=None):
+        """Sorted list of releases.
+
+        Keyword Arguments:
+            pkgs (dict): metadata indexed by package path
+        """
+        items = sorted(
+            ((extract_version(data), path), data)
+            for path, data in (pkgs or {}).items()
+        )
+        self._keys = [key for key, _ in items]  # => ascending order
+        super(Releases, self).__init__(data for _, data in reversed(items))
+
+    def add(self, path, data):
+        """Insert a release in its sorted position.
+
+        Arguments:
+            path (str): path to the package file
+            data (dict): package metadata
+        """
+        key = (extract_version(data), path)
+        i = bisect_right(self._keys, key)
+        self.insert(len(self._keys) - i, data)
+        self._keys.insert(i, key)
+
+    def copy(self):
+        """Shallow copy (the same metadata objects are shared)"""
+        releases = Releases()
+        releases.extend(self)
+        releases._keys = list(self._keys)  # pylint: disable=protected-access
+        return releases
+
+    def paths(self):
+        """Paths to the package files, in the same order of the releases"""
+        return [path for _, path in reversed(self._keys)]
+
+    def discard(self, path, data):
+        """Remove a release (if present).
+
+        Arguments:
+            path (str): path to the package file
+            data (dict): package metadata, as given to ``add``
+        """
+        key = (extract_version(data), path)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self[len(self._keys) - 1 - i]
+            del self._keys[i]
+
+
+def group_packages(metadata):
+    """Group package files by (normalized) package name.
+
+    Arguments:
+        metadata (dict): metadata indexed by package path.
+            Packages whose metadata is None (decoding failed) are ignored.
+
+    Returns:
+        dict mapping names to ``Releases``
+    """
+    groups = {}
+    for path, data in metadata.items():
+        if data is not None:
+            groups.setdefault(normalize(data['name']), {})[path] = data
+
+    return {name: Releases(pkgs) for name, pkgs in groups.items()}
+
+
+class Generation(object):
+    """State of the index at a given instant.
+
+    Generations are never modified once published by ``Index``: changes
+    produce a new generation instead (see ``evolve``), sharing the records
+    of unchanged packages. Readers holding a generation can use it for as
+    long as they need (e.g. a whole request) without locking, and always
+    see a consistent state.
+    """
+
+    __slots__ = ('metadata', 'mtime', '_packages')
+
+    def __init__(self, metadata=None, mtime=None, packages=None):
+        """Generation with the given contents.
+
+        Keyword Arguments:
+            metadata (dict): metadata indexed by package path
+            mtime (float): time instant when the generation was produced
+            packages (dict): result of ``group_packages`` for the metadata.
+                Default is None (computed on demand).
+        """
+        self.metadata = {} if metadata is None else metadata
+        self.mtime = mtime
+        self._packages = packages
+
+    @property
+    def files(self):
+        """Paths of the indexed packages"""
+        return self.metadata.keys()
+
+    @property
+    def packages(self):
+        """Releases indexed by normalized package name"""
+        if self._packages is None:
+            # => concurrent readers may compute it twice, with same result
+            self._packages = group_packages(self.metadata)
+
+        return self._packages
+
+    def evolve(self, stale, fresh, mtime=None):
+        """Produce a new generation with the given changes.
+
+        The releases of the affected packages are copied and patched (each
+        change costing a binary search in the list of versions), the other
+        ones are shared.
+
+        Arguments:
+            stale (dict): metadata no longer valid, indexed by path
+            fresh (dict): new metadata, indexed by path
+
+        Keyword Arguments:
+            mtime (float): time instant for the new generation
+
+        Returns:
+            Generation
+        """
+        if not (stale or fresh):  # => nothing to copy
+            return Generation(self.metadata, mtime, self._packages)
+
+        metadata = dict(self.metadata)
+        for path in stale:
+            metadata.pop(path, None)
+        metadata.update(fresh)
+
+        if self._packages is None:
+            return Generation(metadata, mtime)
+
+        pkgs = dict(self._packages)
+        copied = set()
+
+        def releases(name):
+            """Releases that can be modified in the new generation"""
+            if name not in copied:
+                pkgs[name] = pkgs[name].copy() if name in pkgs else Releases()
+                copied.add(name)
+            return pkgs[name]
+
+        for path, data in stale.items():
+            name = data and normalize(data['name'])
+            if name in pkgs:
+                releases(name).discard(path, data)
+                if not pkgs[name]:
+                    del pkgs[name]
+                    copied.discard(name)
+
+        for path, data in fresh.items():
+            if data is not None:
+                releases(normalize(data['name'])).add(path, data)
+
+        return Generation(metadata, mtime, pkgs)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple refresher
+-----------------
+
+Background execution of index updates (stale-while-revalidate).
+
+``pypiple.refresher.Refresher`` runs a function in a single background
+thread (or greenlet, when ``gevent`` patches the standard library) each
+time it is triggered. Triggers received while the function is running are
+coalesced into a single subsequent run, so any number of concurrent
+requests noticing a change produce at most one extra update.
+
+With ``gevent``, the function is expected to cooperate (the index yields
+after each package it decodes), otherwise it would block all the other
+greenlets while it runs.
+"""
+import logging
+import threading
+from time import time
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Refresher(object):
+    """Run a function in background, on demand"""
+
+    def __init__(self, function, name='pypiple-refresher'):
+        """Idle refresher. The thread is started by the first ``trigger``.
+
+        Arguments:
+            function: callable without arguments (e.g. ``Index.update``)
+
+        Keyword Arguments:
+            name (str): name of the background thread
+        """
+        self.function = function
+        self.name = name
+        self.runs = 0  # => number of times the function was called
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pending = False  # => triggered, but not running yet
+        self._running = False
+        self._stopped = False
+
+    def trigger(self):
+        """Schedule the execution of the function (without blocking)"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until all the triggered executions are finished.
+
+        Keyword Arguments:
+            timeout (float): maximum number of seconds to wait.
+                Default is None (no limit).
+
+        Returns:
+            True if the refresher is idle
+        """
+        deadline = None if timeout is None else time() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            return not (self._pending or self._running)
+
+    def stop(self):
+        """Stop the background thread (after the current execution)"""
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        """Thread main loop"""
+        while True:
+            with self._cond:
+                while not (self._pending or self._stopped):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._pending = False
+                self._running = True
+
+            try:
+                self.function()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception('Error while refreshing in background')
+            finally:
+                with self._cond:
+                    self._running = False
+                    self.runs += 1
+                    self._cond.notify_all()
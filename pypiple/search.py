@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple search
+--------------
+
+Full-text search over the metadata of the packages in the index.
+
+``pypiple.search.SearchIndex`` keeps an inverted index (term -> projects)
+built from the newest release of each project. It subscribes to
+``pypiple.index.Index``, so only the projects affected by each update are
+indexed again.
+
+Queries are split into terms, and a project matches when all terms are
+found in its metadata, either exactly or as a prefix of an indexed term
+(so results appear while the user types). Matches are ranked according to
+the field where each term was found (see FIELD_WEIGHTS).
+
+.. data:: FIELD_WEIGHTS
+
+    relevance of the terms found in each metadata field
+"""
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+
+from six import string_types
+
+from pypiple import __version__  # noqa
+from pypiple.records import normalize
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = (
+    ('name', 10.0),
+    ('keywords', 4.0),
+    ('summary', 2.0),
+    ('classifiers', 1.0),
+    ('author', 1.0),
+)
+
+PREFIX_WEIGHT = 0.5
+"""Factor applied to the weight of terms matched only by prefix"""
+
+EXACT_NAME_BONUS = 100.0
+"""Score added when the query is exactly the name of the project"""
+
+TERM = re.compile(r'[^\W_]+', re.U)
+
+
+def tokenize(text):
+    """Split text into lowercase terms.
+
+    Arguments:
+        text (str or Iterable[str]): e.g. the value of a metadata field
+
+    Returns:
+        List of terms
+    """
+    if not text:
+        return []
+    if not isinstance(text, string_types):  # => e.g. classifiers
+        text = u' '.join(text)
+
+    return TERM.findall(text.lower())
+
+
+def weigh(data):
+    """Terms in the metadata of a package, with their weights.
+
+    Arguments:
+        data (dict): metadata of a package
+
+    Returns:
+        dict mapping terms to weights (summed over all fields)
+    """
+    terms = {}
+    for field, weight in FIELD_WEIGHTS:
+        for term in set(tokenize(data.get(field))):
+            terms[term] = terms.get(term, 0) + weight
+
+    return terms
+
+
+class SearchIndex(object):
+    """Inverted index over the metadata of the projects in an index"""
+
+    def __init__(self, index):
+        """Search index, kept in sync with the given index.
+
+        Arguments:
+            index (pypiple.index.Index): index of packages
+        """
+        self.index = index
+        self._postings = {}  # => term: {project: weight}
+        self._terms = []  # => sorted list of terms (for prefix queries)
+        self._documents = {}  # => project: terms
+        self._projects = {}  # => path: project
+        self._paths = {}  # => project: paths
+        self._lock = threading.Lock()
+
+        # => subscribe first, so no change is missed (e.g. during the
+        # initial update running in background)
+        index.subscribe(self.refresh)
+        with self._lock:
+            for name, releases in index.generation.packages.items():
+                self._remove(name)  # => maybe already refreshed
+                self._add(name, releases)
+
+    def __len__(self):
+        """Number of indexed projects"""
+        return len(self._documents)
+
+    def refresh(self, modified, removed):
+        """Index again the projects affected by changes in the index.
+
+        This method is used as callback for the index (see
+        ``pypiple.index.Index.subscribe``).
+
+        Arguments:
+            modified (set): paths for packages added or modified
+            removed (set): paths for packages removed
+        """
+        with self._lock:
+            generation = self.index.generation
+            metadata = generation.metadata
+            affected = {self._projects.get(path)
+                        for path in modified | removed}
+            affected.update(normalize(metadata[path]['name'])
+                            for path in modified if metadata.get(path))
+            affected.discard(None)
+
+            for name in affected:
+                self._remove(name)
+                releases = generation.packages.get(name)
+                if releases:
+                    self._add(name, releases)
+
+    def _add(self, name, releases):
+        """Index a project (the lock should be held)"""
+        self._paths[name] = paths = releases.paths()
+        for path in paths:
+            self._projects[path] = name
+
+        terms = weigh(releases[0])  # => newest release
+        for term in set(tokenize(name)):  # => normalized name
+            terms[term] = max(terms.get(term, 0), FIELD_WEIGHTS[0][1])
+        self._documents[name] = terms
+        for term, weight in terms.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                insort(self._terms, term)
+            self._postings[term][name] = weight
+
+    def _remove(self, name):
+        """Remove a project from the index (the lock should be held)"""
+        for path in self._paths.pop(name, ()):
+            self._projects.pop(path, None)
+
+        for term in self._documents.pop(name, ()):
+            postings = self._postings[term]
+            postings.pop(name, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _match(self, token):
+        """Projects matching a query term, with their scores"""
+        scores = dict(self._postings.get(token, {}))
+        i = bisect_left(self._terms, token)
+        while i < len(self._terms) and self._terms[i].startswith(token):
+            term = self._terms[i]
+            i += 1
+            if term == token:
+                continue
+            for name, weight in self._postings[term].items():
+                # => the best prefix match counts, but less than exact ones
+                scores[name] = max(scores.get(name, 0),
+                                   weight * PREFIX_WEIGHT)
+
+        return scores
+
+    def search(self, query, limit=20):
+        """Find projects whose metadata contain all terms of the query.
+
+        Arguments:
+            query (str): search terms (separated by spaces or punctuation)
+
+        Keyword Arguments:
+            limit (int): maximum number of results.
+                Default is 20 (None means no limit).
+
+        Returns:
+            List of ``(score, name)`` tuples, from the best to the worst
+        """
+        tokens = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores = None
+            for token in tokens:  # => longest (most selective) first
+                matches = self._match(token)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {name: score + matches[name]
+                              for name, score in scores.items()
+                              if name in matches}
+                if not scores:
+                    return []
+
+        exact = normalize(query.strip())
+        if exact in scores:
+            scores[exact] += EXACT_NAME_BONUS
+
+        results = sorted(((score, name) for name, score in scores.items()),
+                         key=lambda item: (-item[0], item[1]))
+
+        return results if limit is None else results[:limit]
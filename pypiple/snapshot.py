@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple snapshot
+----------------
+
+Index shared between several worker processes.
+
+Instead of each worker decoding the whole packages directory, a single
+builder process keeps an ``pypiple.index.Index`` uptodate and publishes its
+contents as a snapshot file (see ``SnapshotBuilder``). Workers use
+``SnapshotIndex``, that maps the latest snapshot in memory (read-only) and
+switches to a new one as soon as it is published.
+
+Snapshots are written to a temporary file and renamed, so publishing is
+atomic: workers never see a partially written file, and the snapshot they
+already mapped remains valid until they switch.
+
+The header only locates the data of each package file in the snapshot:
+package records are serialized separately, and a worker only parses the
+records that changed since the snapshot it used before (unchanged records
+are recognized by comparing their bytes). The bulky data (descriptions and
+PEP 658 metadata files) is only sliced from the mapped file on demand, so
+it is shared through the OS page cache.
+When publishing, the bulky data of unchanged package files is copied from
+the previous snapshot, instead of being retrieved again from the index
+(which, without a store, would have to decode the packages again).
+
+File layout::
+
+    MAGIC | records, descriptions and metadata files | JSON header | offset
+
+.. data:: MAGIC
+
+    bytes used to recognize snapshot files (and their format version)
+
+Example::
+
+    # builder process
+    index = Index('/srv/packages', store=Store('/srv/packages.sqlite'))
+    SnapshotBuilder(index, '/srv/packages.snapshot').run()
+
+    # worker processes
+    index = SnapshotIndex('/srv/packages', '/srv/packages.snapshot')
+
+The builder process can also be started from the command line (see
+``main``)::
+
+    python -m pypiple.snapshot /srv/packages /srv/packages.snapshot \\
+        --store /srv/packages.sqlite --watch
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from pypiple import __version__  # noqa
+from pypiple.index import Index, Progress, fingerprint
+from pypiple.records import Package
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b'PYPIPLE-SNAPSHOT-2\n'
+TRAILER = struct.Struct('<Q')  # => offset of the JSON header
+
+
+REUSE_FIELDS = ('inode', 'size', 'mtime_ns')
+"""Fields that should match to reuse data from the previous snapshot"""
+
+
+def write_snapshot(index, path, previous=None):
+    """Publish the current contents of an index as a snapshot file.
+
+    Arguments:
+        index (pypiple.index.Index): index to be published
+        path (str): path to the snapshot file. A temporary file is created
+            in the same directory, and renamed when complete.
+
+    Keyword Arguments:
+        previous (Snapshot): snapshot whose descriptions and metadata files
+            are reused for unchanged package files. Default is None.
+    """
+    metadata = dict(index.metadata)  # => the index may change meanwhile
+    table = {}
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+
+    try:
+        with open(tmp, 'wb') as file_:
+            file_.write(MAGIC)
+            offset = len(MAGIC)
+            for pkg, data in metadata.items():
+                if data is None:  # => decoding failed
+                    continue
+                blobs = previous and previous.blobs(pkg, data)
+                if blobs:
+                    description, contents = blobs
+                else:
+                    if 'description' in data:
+                        description = data['description']
+                    else:  # => released from memory
+                        description = index.description(pkg)
+                    description = (description or u'').encode('utf-8')
+                    contents = index.metadata_file(pkg) or b''
+                record = json.dumps(  # => sorted, so it can be compared
+                    {key: value for key, value in data.items()
+                     if key != 'description'}, sort_keys=True).encode('utf-8')
+                for blob in (record, description, contents):
+                    file_.write(blob)
+                table[pkg] = [offset, len(record), len(description),
+                              len(contents)]
+                offset += len(record) + len(description) + len(contents)
+
+            header = {
+                'mtime': index.mtime(),
+                'algorithm': index.algorithm,
+                'packages': table,
+            }
+            file_.write(json.dumps(header).encode('utf-8'))
+            file_.write(TRAILER.pack(offset))
+            file_.flush()
+            os.fsync(file_.fileno())
+        os.rename(tmp, path)  # => atomic
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Snapshot(object):
+    """Snapshot file mapped in memory"""
+
+    def __init__(self, path):
+        """Map a snapshot file (read-only).
+
+        Arguments:
+            path (str): path to the snapshot file
+
+        Raises:
+            ValueError if the file is not a valid snapshot
+        """
+        self.path = path
+        with open(path, 'rb') as file_:
+            self.stat = fingerprint(os.fstat(file_.fileno()))
+            self._map = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+
+        end = len(self._map) - TRAILER.size
+        if end < len(MAGIC) or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('Invalid snapshot: {}'.format(path))
+
+        start, = TRAILER.unpack(self._map[end:])
+        header = json.loads(self._map[start:end].decode('utf-8'))
+        self.mtime = header['mtime']
+        self.algorithm = header['algorithm']
+        # => path: (offset, record size, description size, file size)
+        self._blobs = header['packages']
+
+    @property
+    def files(self):
+        """Paths of the packages in the snapshot"""
+        return self._blobs.keys()
+
+    def raw_record(self, pkg):
+        """Serialized record of a package (or None), see ``record``"""
+        if pkg not in self._blobs:
+            return None
+
+        offset, record_size, _, _ = self._blobs[pkg]
+        return self._map[offset:offset + record_size]
+
+    def record(self, pkg):
+        """Metadata of a package (or None), parsed on each call"""
+        raw = self.raw_record(pkg)
+        return raw and Package(json.loads(raw.decode('utf-8')))
+
+    def description(self, pkg):
+        """Long description of a package (or None if not available)"""
+        if pkg not in self._blobs:
+            return None
+
+        offset, record_size, desc_size, _ = self._blobs[pkg]
+        start = offset + record_size
+        return self._map[start:start + desc_size].decode('utf-8')
+
+    def metadata_file(self, pkg):
+        """Contents of the metadata file of a package (or None)"""
+        if pkg not in self._blobs:
+            return None
+
+        offset, record_size, desc_size, file_size = self._blobs[pkg]
+        start = offset + record_size + desc_size
+        return self._map[start:start + file_size] or None
+
+    def blobs(self, pkg, data):
+        """Raw description and metadata file of a package, if the package
+        file did not change since the snapshot was written.
+
+        Arguments:
+            pkg (str): path to the package
+            data (dict): current metadata of the package
+
+        Returns:
+            ``(description, metadata file)`` pair of bytes, or None
+        """
+        previous = self.record(pkg)
+        if previous is None or any(
+                previous[field] is None or previous[field] != data.get(field)
+                for field in REUSE_FIELDS):
+            return None
+
+        offset, record_size, desc_size, file_size = self._blobs[pkg]
+        start = offset + record_size
+        middle = start + desc_size
+        return (self._map[start:middle],
+                self._map[middle:middle + file_size])
+
+    def close(self):
+        """Unmap the file"""
+        self._map.close()
+
+
+class SnapshotIndex(Index):
+    """Read-only index, loaded from the snapshots published by a builder.
+
+    The packages directory is never read by this class (``update`` just
+    switches to the latest snapshot, if a new one was published).
+    """
+
+    def __init__(self, path, snapshot):
+        """Empty index, see ``update``.
+
+        Arguments:
+            path (str): path to the directory used to store packages
+            snapshot (str): path to the snapshot file published by
+                the builder
+        """
+        super(SnapshotIndex, self).__init__(path)
+        self.snapshot_path = snapshot
+        self._snapshot = None
+
+    @property
+    def algorithm(self):
+        return self._snapshot and self._snapshot.algorithm
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def uptodate(self):
+        try:
+            stat = fingerprint(os.stat(self.snapshot_path))
+        except OSError:
+            return True  # => nothing published yet
+
+        return self._snapshot is not None and self._snapshot.stat == stat
+
+    def _update(self):
+        """Switch to the latest snapshot.
+
+        Records are compared with the ones from the previous snapshot, so
+        listeners are notified only about the packages that changed (and
+        only those are parsed).
+        """
+        try:
+            snapshot = Snapshot(self.snapshot_path)
+        except (IOError, OSError, ValueError):
+            LOGGER.exception('Unable to load snapshot %s', self.snapshot_path)
+            return None
+
+        previous = self._snapshot
+        generation = self.generation
+        current = generation.metadata
+        metadata = {}
+        modified = set()
+        for path in snapshot.files:
+            if (path in current and previous is not None and
+                    previous.raw_record(path) == snapshot.raw_record(path)):
+                metadata[path] = current[path]  # => keep the same record
+            else:
+                metadata[path] = self.compact(snapshot.record(path))
+                modified.add(path)
+
+        removed = set(current) - set(metadata)
+        stale = {path: current[path] for path in modified | removed
+                 if path in current}
+
+        self._snapshot = snapshot
+        self._generation = generation.evolve(
+            stale, {path: metadata[path] for path in modified},
+            snapshot.mtime)
+        self._progress = Progress(len(metadata), len(metadata))
+        self.notify(modified, removed)
+
+        return (modified, removed)
+
+    def description(self, pkg):
+        return self._snapshot and self._snapshot.description(pkg)
+
+    def metadata_file(self, pkg):
+        return self._snapshot and self._snapshot.metadata_file(pkg)
+
+
+class SnapshotBuilder(object):
+    """Keeps a snapshot file in sync with an index"""
+
+    def __init__(self, index, path):
+        """Builder for the given index.
+
+        Arguments:
+            index (pypiple.index.Index): index to be published
+            path (str): path to the snapshot file
+        """
+        self.index = index
+        self.path = path
+        self._dirty = True  # => index changed since the last snapshot
+        index.subscribe(self.touch)
+
+    def touch(self, modified, removed):  # pylint: disable=unused-argument
+        """Mark the snapshot as outdated (callback for the index)"""
+        self._dirty = True
+
+    def publish(self):
+        """Update the index and publish a new snapshot, if it changed.
+
+        Returns:
+            True if a new snapshot was written
+        """
+        self.index.update()
+        if not self._dirty:
+            return False
+
+        self._dirty = False
+        try:
+            previous = Snapshot(self.path)
+        except (IOError, OSError, ValueError):  # => first snapshot
+            previous = None
+        try:
+            write_snapshot(self.index, self.path, previous)
+        finally:
+            if previous is not None:
+                previous.close()
+        return True
+
+    def run(self, interval=1.0, stopped=None):
+        """Publish snapshots periodically.
+
+        Keyword Arguments:
+            interval (float): seconds between updates
+            stopped (threading.Event): the method returns when set.
+                Default is None (run forever).
+        """
+        stopped = stopped or threading.Event()
+        while not stopped.is_set():
+            try:
+                self.publish()
+            except (IOError, OSError):
+                LOGGER.exception('Unable to publish snapshot %s', self.path)
+            stopped.wait(interval)
+
+
+def main(argv=None):
+    """Command line entry point: keep a snapshot in sync with a packages
+    directory (``pypiple-snapshot`` script, or
+    ``python -m pypiple.snapshot``).
+
+    Keyword Arguments:
+        argv (List[str]): command line arguments.
+            Default is None (``sys.argv``).
+    """
+    parser = argparse.ArgumentParser(
+        description='Publish snapshots of a packages directory, to be '
+                    'shared by the workers of pypiple')
+    parser.add_argument('packages', help='directory used to store packages')
+    parser.add_argument('snapshot', help='path to the snapshot file')
+    parser.add_argument('--store', default=None,
+                        help='database persisting the metadata between '
+                             'restarts (see pypiple.store)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes used to decode packages')
+    parser.add_argument('--watch', action='store_true',
+                        help='watch the packages directory for changes')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between updates (default: 1)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    # => imported on demand, only what is used
+    from pypiple.hasher import Hasher
+    store = watcher = None
+    if args.store:
+        from pypiple.store import Store
+        store = Store(args.store)
+    if args.watch:
+        from pypiple.watcher import create_watcher
+        watcher = create_watcher(args.packages)
+
+    index = Index(args.packages, workers=args.workers, store=store,
+                  watcher=watcher, hasher=Hasher())
+    try:
+        SnapshotBuilder(index, args.snapshot).run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple store
+-------------
+
+Persistent storage for the metadata extracted by ``pypiple.index.Index``.
+
+Decoding packages is expensive, so ``pypiple.store.Store`` keeps the
+metadata of each package in a SQLite database, together with the
+fingerprint of the file it was extracted from (modification time and size).
+The raw contents of the metadata files (PEP 658) and the (long) package
+descriptions are also kept in the database, and loaded only on demand.
+When a process restarts, the index is loaded from the store and only files
+that changed in the meantime have to be decoded again.
+
+The database should preferably live outside the packages directory (e.g.
+right next to it), since SQLite creates temporary files while writing,
+which would change the directory modification time.
+
+.. data:: SCHEMA_VERSION
+
+    version of the database layout. Databases created with a different
+    layout are discarded (and rebuilt from the packages).
+"""
+import json
+import logging
+import sqlite3
+import threading
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 4
+
+
+class Store(object):
+    """SQLite database containing package metadata, indexed by file path.
+
+    Example::
+
+        store = Store('/srv/packages.sqlite')
+        index = Index('/srv/packages', store=store)
+    """
+
+    def __init__(self, path):
+        """Open (or create) the database.
+
+        Arguments:
+            path (str): path to the database file. ``:memory:`` can be used
+                for a non-persistent store.
+        """
+        self.path = path
+        # Index updates may happen in any (green)thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()  # => avoid interleaved transactions
+        self._migrate()
+
+    def _migrate(self):
+        """Make sure the database layout matches SCHEMA_VERSION"""
+        with self._conn as conn:
+            version, = conn.execute('PRAGMA user_version').fetchone()
+            if version != SCHEMA_VERSION:
+                LOGGER.info('Discarding metadata stored in %s (schema %s)',
+                            self.path, version)
+                conn.execute('DROP TABLE IF EXISTS packages')
+                conn.execute('DROP TABLE IF EXISTS metadata_files')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS packages ('
+                ' path TEXT PRIMARY KEY,'
+                ' mtime REAL NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' data TEXT NOT NULL,'
+                ' description TEXT)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metadata_files ('
+                ' path TEXT PRIMARY KEY,'
+                ' data BLOB NOT NULL)')
+            conn.execute('PRAGMA user_version = {:d}'.format(SCHEMA_VERSION))
+
+    def load(self):
+        """Read all the metadata persisted in the store.
+
+        Returns:
+            A dict mapping package paths to metadata (as produced by
+            ``pypiple.index.retrieve_data``).
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT path, data FROM packages')
+            return {path: json.loads(data) for path, data in rows}
+
+    def save(self, records):
+        """Insert or replace metadata in the store.
+
+        Arguments:
+            records (dict): metadata indexed by package path.
+                Packages whose metadata is None (decoding failed) are
+                removed from the store, so they can be retried later.
+        """
+        rows = [
+            self._row(path, data)
+            for path, data in records.items() if data is not None
+        ]
+        failed = [(path,) for path, data in records.items() if data is None]
+
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                'INSERT INTO packages (path, mtime, size, data, description) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (path) DO UPDATE SET '
+                ' mtime = excluded.mtime, size = excluded.size,'
+                ' data = excluded.data,'
+                ' description = COALESCE(excluded.description, description)',
+                rows)
+            conn.executemany('DELETE FROM packages WHERE path = ?', failed)
+
+    @staticmethod
+    def _row(path, data):
+        """Values for a row in the packages table.
+
+        The description is kept in a separate column, so it is not loaded
+        with the remaining metadata. When the metadata does not contain a
+        description (e.g. released from memory), the stored one is kept.
+        """
+        data = dict(data)
+        if 'description' in data:  # => u'' means "no description"
+            description = data.pop('description') or u''
+        else:
+            description = None
+
+        return (path, data['mtime'], data['size'], json.dumps(data),
+                description)
+
+    def load_description(self, path):
+        """Read the description of a package.
+
+        Arguments:
+            path (str): path to the package
+
+        Returns:
+            str or None, if not stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT description FROM packages WHERE path = ?',
+                (path,)).fetchone()
+
+        return row and row[0]
+
+    def delete(self, paths):
+        """Remove metadata (and metadata files) from the store.
+
+        Arguments:
+            paths (Iterable[str]): paths of the removed packages
+        """
+        rows = [(path,) for path in paths]
+        with self._lock, self._conn as conn:
+            conn.executemany('DELETE FROM packages WHERE path = ?', rows)
+            conn.executemany('DELETE FROM metadata_files WHERE path = ?', rows)
+
+    def save_files(self, files):
+        """Insert or replace the contents of metadata files.
+
+        Arguments:
+            files (dict): raw contents (bytes) indexed by package path.
+                None values remove the file from the store.
+        """
+        rows = [(path, sqlite3.Binary(data))
+                for path, data in files.items() if data is not None]
+        missing = [(path,) for path, data in files.items() if data is None]
+
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO metadata_files (path, data) '
+                'VALUES (?, ?)', rows)
+            conn.executemany(
+                'DELETE FROM metadata_files WHERE path = ?', missing)
+
+    def load_file(self, path):
+        """Read the contents of a metadata file.
+
+        Arguments:
+            path (str): path of the package
+
+        Returns:
+            bytes or None if there is no metadata file for the package
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM metadata_files WHERE path = ?',
+                (path,)).fetchone()
+
+        return bytes(row[0]) if row else None
+
+    def close(self):
+        """Close the underlaying database connection"""
+        self._conn.close()
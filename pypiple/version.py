@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple version
+---------------
+
+Sorting of package versions, according to PEP 440.
+
+``pypiple.version.version_key`` converts a version string into a tuple that
+can be directly compared, taking into account epochs, pre, post, development
+releases and local version labels. Parsing is memoized, so each distinct
+version string is parsed only once per process.
+
+Versions that do not comply with PEP 440 are still accepted, but sort
+before any compliant version.
+"""
+import re
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+VERSION_PATTERN = re.compile(r"""
+    ^\s*v?
+    (?:(?P<epoch>[0-9]+)!)?
+    (?P<release>[0-9]+(?:\.[0-9]+)*)
+    (?P<pre>
+        [-_.]?
+        (?P<pre_l>a|b|c|rc|alpha|beta|pre|preview)
+        [-_.]?
+        (?P<pre_n>[0-9]+)?
+    )?
+    (?P<post>
+        (?:-(?P<post_n1>[0-9]+))
+        |
+        (?:
+            [-_.]?
+            (?P<post_l>post|rev|r)
+            [-_.]?
+            (?P<post_n2>[0-9]+)?
+        )
+    )?
+    (?P<dev>
+        [-_.]?
+        (?P<dev_l>dev)
+        [-_.]?
+        (?P<dev_n>[0-9]+)?
+    )?
+    (?:\+(?P<local>[a-z0-9]+(?:[-_.][a-z0-9]+)*))?
+    \s*$
+""", re.VERBOSE | re.IGNORECASE)
+
+PRE_RELEASES = {
+    'a': 0, 'alpha': 0,
+    'b': 1, 'beta': 1,
+    'c': 2, 'rc': 2, 'pre': 2, 'preview': 2,
+}
+
+# Sentinels used inside keys, chosen to keep all keys comparable
+NO_PRE = (3, 0)  # => final releases sort after pre-releases
+DEV_ONLY = (-1, 0)  # => X.devN sorts before X.aN
+NO_POST = -1
+NO_DEV = float('inf')
+
+_KEYS = {}  # => memoized keys
+
+
+def _segments(label):
+    """Comparable representation for local labels (and legacy versions)
+
+    Numeric segments sort after alphanumeric ones, as required by PEP 440.
+    """
+    return tuple(
+        (1, int(part), '') if part.isdigit() else (0, 0, part)
+        for part in re.split(r'[-_.]+', label.lower()) if part
+    )
+
+
+def parse(version):
+    """Produce a comparable key from a version string.
+
+    Prefer ``version_key``, that memoizes the results.
+
+    Arguments:
+        version (str): PEP 440 version
+
+    Returns:
+        tuple: ``(epoch, release, pre, post, dev, local)``
+    """
+    match = VERSION_PATTERN.match(version)
+
+    if not match:  # => legacy version, sort before everything else
+        return (-1, (), NO_PRE, NO_POST, NO_DEV, _segments(version))
+
+    release = tuple(int(i) for i in match.group('release').split('.'))
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]  # => 1.0 == 1.0.0
+
+    if match.group('pre'):
+        pre = (PRE_RELEASES[match.group('pre_l').lower()],
+               int(match.group('pre_n') or 0))
+    elif match.group('dev') and not match.group('post'):
+        pre = DEV_ONLY
+    else:
+        pre = NO_PRE
+
+    post = NO_POST
+    if match.group('post'):
+        post = int(match.group('post_n1') or match.group('post_n2') or 0)
+
+    dev = NO_DEV
+    if match.group('dev'):
+        dev = int(match.group('dev_n') or 0)
+
+    local = _segments(match.group('local') or '')
+
+    return (int(match.group('epoch') or 0), release, pre, post, dev, local)
+
+
+def version_key(version):
+    """Memoized version of ``parse``.
+
+    Arguments:
+        version (str): PEP 440 version
+
+    Returns:
+        tuple: sorting key for the version
+    """
+    try:
+        return _KEYS[version]
+    except KeyError:
+        return _KEYS.setdefault(version, parse(version))
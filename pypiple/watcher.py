@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pypiple watcher
+---------------
+
+Change notification for the packages directory.
+
+A watcher runs in a background thread and reports which files inside
+a directory changed, so ``pypiple.index.Index`` can be invalidated only
+when necessary (and update just the changed packages), instead of checking
+the directory on every request.
+
+- ``InotifyWatcher`` relies on the Linux ``inotify`` API.
+- ``PollingWatcher`` periodically lists the directory, and is used
+    as fallback for other platforms.
+- ``create_watcher`` picks the best option available.
+
+Watchers report changes through a callback that receives a set of paths.
+``None`` is passed instead, when the watcher cannot tell what changed
+(e.g. events were lost) and the whole directory should be scanned again.
+This also happens when the directory itself is replaced (e.g. a new
+directory is renamed into place during a deploy): the watch follows the
+path, not the old directory.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from os.path import join
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    from scandir import scandir  # pylint: disable=import-error
+
+from pypiple import __version__  # noqa
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+LOGGER = logging.getLogger(__name__)
+
+# Constants from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+IN_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+           IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+IN_SELF = IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF  # => watch lost
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class AbstractWatcher(object):
+    """Background thread reporting changes inside a directory"""
+
+    def __init__(self, path, interval=1.0):
+        """Watcher for the given directory.
+
+        Arguments:
+            path (str): directory to be watched
+
+        Keyword Arguments:
+            interval (float): maximum number of seconds between checks
+                for new events (or between scans, for polling watchers)
+        """
+        self.path = path
+        self.interval = interval
+        self._callback = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, callback):
+        """Start watching the directory in background.
+
+        Arguments:
+            callback: function called with the set of changed paths
+                (or None if the whole directory must be scanned again)
+        """
+        self._callback = callback
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='pypiple-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the directory"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _notify(self, paths):
+        """Forward changes to the callback, protecting the thread"""
+        try:
+            self._callback(paths)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Error while handling changes in %s', self.path)
+
+    def _run(self):
+        """Thread main loop"""
+        raise NotImplementedError
+
+
+class PollingWatcher(AbstractWatcher):
+    """Watcher that periodically compares the stat info of directory entries
+    """
+
+    def __init__(self, path, interval=2.0):
+        super(PollingWatcher, self).__init__(path, interval)
+        self._entries = self.listing()
+
+    def listing(self):
+        """Current state of the directory.
+
+        Returns:
+            dict mapping paths to (mtime, size) tuples
+        """
+        entries = {}
+        for entry in scandir(self.path):
+            try:
+                stat = entry.stat()
+            except OSError:  # removed while listing
+                continue
+            entries[entry.path] = (stat.st_mtime, stat.st_size)
+
+        return entries
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                current = self.listing()
+            except OSError:
+                LOGGER.exception('Unable to list %s', self.path)
+                continue
+
+            previous, self._entries = self._entries, current
+            changed = {
+                path for path in set(previous) | set(current)
+                if previous.get(path) != current.get(path)
+            }
+            if changed:
+                self._notify(changed)
+
+
+class InotifyWatcher(AbstractWatcher):
+    """Watcher based on the Linux ``inotify`` API
+
+    Raises:
+        OSError if inotify is not available
+    """
+
+    def __init__(self, path, interval=1.0):
+        super(InotifyWatcher, self).__init__(path, interval)
+
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self._wd = None  # => watch descriptor for the directory
+        if not self.watch():
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, 'inotify_add_watch failed', path)
+
+    def watch(self):
+        """Add a watch for the directory currently found in the path.
+
+        Returns:
+            True if successful
+        """
+        encoded = self.path.encode(sys.getfilesystemencoding())
+        wd = self._libc.inotify_add_watch(self._fd, encoded, IN_MASK)
+        self._wd = None if wd < 0 else wd
+
+        return self._wd is not None
+
+    def events(self, data):
+        """Parse raw ``inotify_event`` structures.
+
+        When the watched directory is moved or removed, the watch is
+        released (so it can be added again for the path, see ``watch``).
+
+        Returns:
+            Set of changed paths or None if the whole directory must be
+            scanned again.
+        """
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if wd != self._wd:  # => e.g. events for a replaced directory
+                continue
+            if mask & IN_SELF:
+                if not mask & IN_IGNORED:  # => the watch is still active
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                self._wd = None
+                return None
+            if name:
+                encoding = sys.getfilesystemencoding()
+                changed.add(join(self.path, name.decode(encoding)))
+
+        return changed
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                if self._wd is None:  # => directory replaced or removed
+                    if not self.watch():
+                        self._stopped.wait(self.interval)
+                        continue
+                    self._notify(None)  # => changes before the new watch
+                readable, _, _ = select.select([self._fd], [], [],
+                                               self.interval)
+                if not readable:
+                    continue
+                changed = self.events(os.read(self._fd, 64 * 1024))
+                if changed is None or changed:
+                    self._notify(changed)
+        finally:
+            os.close(self._fd)
+
+
+def create_watcher(path, interval=None):
+    """Create the most efficient watcher available for the platform.
+
+    Arguments:
+        path (str): directory to be watched
+
+    Keyword Arguments:
+        interval (float): see ``AbstractWatcher``
+
+    Returns:
+        An ``InotifyWatcher`` on Linux, or a ``PollingWatcher`` otherwise.
+    """
+    kwargs = {} if interval is None else {'interval': interval}
+    try:
+        return InotifyWatcher(path, **kwargs)
+    except (OSError, AttributeError):
+        LOGGER.info('inotify not available, polling %s for changes', path)
+        return PollingWatcher(path, **kwargs)
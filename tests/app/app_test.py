@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.app
+"""
+import json
+import subprocess
+import sys
+import time
+
+from webob import Request
+
+from conftest import build_wheel
+from pypiple.app import LazyApplication, application, create_app, settings
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_import_has_no_side_effects():
+    """importing the app should not build it, patch modules or import gevent
+    """
+    code = ('import sys, pypiple.app; '
+            'assert pypiple.app.app._app is None; '
+            'assert "gevent" not in sys.modules; '
+            'assert "pkg_resources" not in sys.modules')
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def wait_ready(app, url='/ready', timeout=10):
+    """Poll the readiness endpoint until the index is ready"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        res = Request.blank(url).get_response(app)
+        if json.loads(res.text)['ready']:
+            return res
+        time.sleep(0.01)
+
+    raise AssertionError('index not ready')
+
+
+def test_application_configuration(tmpdir):
+    """application should serve the given directory under the prefix"""
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+    app = application(packages_path=str(tmpdir), prefix='/pypi/')
+    res = wait_ready(app, '/pypi/ready')
+    status = json.loads(res.text)
+    assert status['done'] == status['total']
+
+    res = Request.blank('/pypi/simple/').get_response(app)
+    assert res.status_int == 200
+    assert '/pypi/simple/pkg/' in res.text
+
+    res = Request.blank('/pypi/packages/pkg-1.0-py2.py3-none-any.whl') \
+        .get_response(app)
+    assert res.status_int == 200
+
+
+def test_lazy_application(tmpdir):
+    """LazyApplication should build the application once, when used"""
+    built = []
+
+    def factory():
+        built.append(application(packages_path=str(tmpdir)))
+        return built[-1]
+
+    app = LazyApplication(factory)
+    assert not built
+
+    wait_ready(app)
+    assert Request.blank('/simple/').get_response(app).status_int == 200
+    assert len(built) == 1
+
+
+def test_settings_from_environment():
+    """settings should read the configuration from environment variables"""
+    config = settings({'PYPIPLE_PACKAGES': '/srv/packages',
+                       'PYPIPLE_PROFILE_RATE': '0.5'})
+    assert config['packages_path'] == '/srv/packages'
+    assert config['snapshot_path'] is None
+    assert config['profile']['rate'] == 0.5
+    assert config['store_path'] is None
+    assert not config['watch'] and not config['background']
+    assert config['workers'] is None
+
+    config = settings({'PYPIPLE_STORE': '/srv/packages.sqlite',
+                       'PYPIPLE_WATCH': 'true', 'PYPIPLE_WORKERS': '4',
+                       'PYPIPLE_BACKGROUND': '1'})
+    assert config['store_path'] == '/srv/packages.sqlite'
+    assert config['watch'] and config['background']
+    assert config['workers'] == 4
+
+
+def test_application_with_store_and_watcher(tmpdir):
+    """application should persist the index and watch the directory"""
+    pkg_dir = tmpdir.mkdir('packages')
+    build_wheel(str(pkg_dir), 'pkg', '1.0')
+    store = str(tmpdir.join('packages.sqlite'))
+    app = application(packages_path=str(pkg_dir), store_path=store,
+                      watch=True)
+    wait_ready(app)
+    assert '/simple/pkg/' in Request.blank('/simple/').get_response(app).text
+
+    build_wheel(str(pkg_dir), 'other', '1.0')
+    deadline = time.time() + 10
+    while '/simple/other/' not in Request.blank('/simple/') \
+            .get_response(app).text:
+        assert time.time() < deadline, 'change not detected'
+        time.sleep(0.05)
+
+    assert tmpdir.join('packages.sqlite').size() > 0
+
+
+def test_create_app_reads_settings(tmpdir, monkeypatch):
+    """create_app should build the application configured by the environment
+    """
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+    monkeypatch.setenv('PYPIPLE_PACKAGES', str(tmpdir))
+    app = create_app()
+    wait_ready(app)
+
+    res = Request.blank('/simple/').get_response(app)
+    assert '/simple/pkg/' in res.text
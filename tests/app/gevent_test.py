@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.app running with gevent (monkey patched)
+"""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import build_wheel
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+PACKAGES = 300
+
+READY_SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+
+import json
+import sys
+
+import gevent
+from webob import Request
+
+from pypiple.app import application
+
+
+def status(app):
+    return json.loads(Request.blank('/ready').get_response(app).text)
+
+
+app = application(packages_path=sys.argv[1], batch_size=50)
+gevent.sleep(0.01)  # => the initial build starts meanwhile
+first = status(app)
+assert not first['ready'], first
+assert first['total'], first  # => the build is in progress
+assert Request.blank('/simple/').get_response(app).status_int == 200
+
+with gevent.Timeout(30):
+    while not status(app)['ready']:
+        gevent.sleep(0.01)
+"""
+
+
+def test_ready_answered_during_initial_build(tmpdir):
+    """with gevent, requests should be served while the index is built"""
+    pytest.importorskip('gevent')
+    for i in range(PACKAGES):
+        build_wheel(str(tmpdir), 'pkg{}'.format(i), '1.0')
+
+    subprocess.check_call([sys.executable, '-c', READY_SCRIPT, str(tmpdir)])
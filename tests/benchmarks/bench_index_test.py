@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for the benchmark suite (benchmarks/bench_index.py)
+"""
+import json
+import os
+import subprocess
+import sys
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def test_benchmarks_report(tmpdir):
+    """benchmarks should run on a tiny tree and produce a JSON report"""
+    output = str(tmpdir.join('results.json'))
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.check_call([
+        sys.executable, os.path.join(ROOT, 'benchmarks', 'bench_index.py'),
+        '--files', '30', '--tree-dir', str(tmpdir.join('trees')),
+        '--output', output,
+    ], env=env)
+
+    with open(output) as file_:
+        run, = json.load(file_)['runs']
+
+    assert run['files'] == 30
+    for key in ('cold_build', 'noop_update', 'single_change_update',
+                'render_project', 'peak_memory'):
+        assert run[key] > 0
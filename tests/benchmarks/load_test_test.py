@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for the HTTP load test (benchmarks/load_test.py)
+"""
+import json
+import os
+import subprocess
+import sys
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def test_load_test_report(tmpdir):
+    """
+    load test should serve a tiny tree over a socket, while mutating it,
+    and report latency percentiles
+    """
+    output = str(tmpdir.join('results.json'))
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.check_call([
+        sys.executable, os.path.join(ROOT, 'benchmarks', 'load_test.py'),
+        '--files', '30', '--tree-dir', str(tmpdir.join('trees')),
+        '--duration', '1', '--concurrency', '4', '--mutate', '0.1',
+        '--socket', '--output', output,
+    ], env=env)
+
+    with open(output) as file_:
+        results = json.load(file_)['results']
+
+    assert results['requests'] > 0
+    assert results['errors'] == 0
+    assert set(results['statuses']) <= {'200', '304'}
+    assert results['latency']['p50'] <= results['latency']['p99']
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.cache.LRUCache
+"""
+from pypiple.cache import LRUCache
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_lru_evicts_least_recently_used():
+    """LRUCache should evict old values when the size limit is reached"""
+
+    cache = LRUCache(maxsize=10)
+    cache.set('a', b'1234')
+    cache.set('b', b'1234')
+    assert cache.get('a') == b'1234'  # => 'b' is now the oldest
+    cache.set('c', b'1234')
+
+    assert 'b' not in cache
+    assert cache.get('a') and cache.get('c')
+    assert cache.size == 8
+    assert cache.stats()['evictions'] == 1
+
+    cache.set('huge', b'12345678901')  # => bigger than maxsize
+    assert 'huge' not in cache
+    assert len(cache) == 2
+
+
+def test_lru_counts_hits_and_misses():
+    """LRUCache should count hits and misses"""
+
+    cache = LRUCache()
+    cache.set('a', 'value')
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+
+
+def test_lru_invalidate_by_tags():
+    """LRUCache should remove all values associated with given tags"""
+
+    cache = LRUCache()
+    cache.set('page1', 'value', tags=['/pkg-1.0.whl', 'pkg'])
+    cache.set('page2', 'value', tags=['/other-1.0.whl', 'other'])
+    cache.set('index', 'value', tags=[':index'])
+
+    assert cache.invalidate(['/pkg-1.0.whl', ':index', 'missing']) == 2
+    assert 'page1' not in cache and 'index' not in cache
+    assert 'page2' in cache
+    assert cache.size == len('value')
+
+    cache.set('page2', 'new value', tags=['other'])  # => replace
+    assert cache.invalidate(['/other-1.0.whl']) == 0
+    assert cache.invalidate(['other']) == 1
+    assert cache.size == 0
+
+
+def test_lru_conditional_set():
+    """LRUCache should only store values when the condition holds"""
+
+    cache = LRUCache()
+    cache.set('page', 'value')
+    cache.set('page', 'outdated', condition=lambda: False)
+    assert cache.get('page') == 'value'
+
+    cache.set('page', 'new value', condition=lambda: True)
+    assert cache.get('page') == 'new value'
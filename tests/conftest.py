@@ -14,6 +14,9 @@
 from __future__ import print_function, absolute_import, division
 
 import os
+import tarfile
+import zipfile
+from io import BytesIO
 from time import time
 
 import pytest
@@ -27,6 +30,53 @@ def filename(pkg):
     return '{}-{}.{}'.format(pkg['name'], pkg['version'], pkg['ext'])
 
 
+def pkg_info(name, version, **fields):
+    """Build the contents of a PKG-INFO/METADATA file"""
+
+    headers = [
+        ('Metadata-Version', '2.1'),
+        ('Name', name),
+        ('Version', version),
+        ('Summary', fields.get('summary', 'The {} package'.format(name))),
+        ('Author', fields.get('author', 'Some Author')),
+        ('Author-email', fields.get('author_email', 'author@example.com')),
+    ]
+    if 'keywords' in fields:
+        headers.append(('Keywords', fields['keywords']))
+    headers += [('Classifier', c) for c in fields.get('classifiers', [])]
+    text = ''.join('{}: {}\n'.format(key, value) for key, value in headers)
+
+    return (text + '\n' + fields.get('description', '')).encode('utf-8')
+
+
+def build_wheel(dirpath, name, version, **fields):
+    """Create a minimal (but valid) wheel file, returning its path"""
+
+    dist = '{}-{}'.format(name.replace('-', '_'), version)
+    path = os.path.join(dirpath, '{}-py2.py3-none-any.whl'.format(dist))
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('{}/__init__.py'.format(name.replace('-', '_')), '')
+        archive.writestr('{}.dist-info/METADATA'.format(dist),
+                         pkg_info(name, version, **fields))
+
+    return path
+
+
+def build_sdist(dirpath, name, version, **fields):
+    """Create a minimal (but valid) source distribution, returning its path"""
+
+    dist = '{}-{}'.format(name, version)
+    path = os.path.join(dirpath, '{}.tar.gz'.format(dist))
+    with tarfile.open(path, 'w:gz') as archive:
+        for name_, data in [('setup.py', b''),
+                            ('PKG-INFO', pkg_info(name, version, **fields))]:
+            entry = tarfile.TarInfo('{}/{}'.format(dist, name_))
+            entry.size = len(data)
+            archive.addfile(entry, BytesIO(data))
+
+    return path
+
+
 @pytest.fixture()
 def extra_files():
     """Dummy files"""
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.handlers.PackageFileHandler
+"""
+import os
+from wsgiref.util import FileWrapper
+
+from webob import Request
+
+from conftest import build_sdist, build_wheel
+from pypiple.handlers import MetadataFileHandler, PackageFileHandler
+from pypiple.index import Index
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'packages': '/packages'}
+
+
+def get(handler, filename, **kwargs):
+    """Issue a GET request for the package file"""
+    req = Request.blank('/packages/' + filename, **kwargs)
+    req.urlvars = {'filename': filename}
+
+    return req.get_response(handler)
+
+
+def read(path):
+    """Contents of a file"""
+    with open(path, 'rb') as file_:
+        return file_.read()
+
+
+def test_package_file_served(tmpdir):
+    """PackageFileHandler should serve files in the index, with validators"""
+    sdist = build_sdist(str(tmpdir), 'pkg', '1.0')
+    tmpdir.join('notes.txt').write('not a package')
+    handler = PackageFileHandler(Index(str(tmpdir)), MOUNT_POINTS, {})
+
+    res = get(handler, 'pkg-1.0.tar.gz')
+    assert res.status_int == 200
+    assert res.body == read(sdist)
+    assert res.content_type == 'application/octet-stream'
+    assert res.content_encoding is None  # => clients should not decompress
+    assert res.accept_ranges == 'bytes'
+    assert res.cache_control.max_age == handler.max_age
+    assert res.etag
+
+    res = get(handler, 'pkg-1.0.tar.gz',
+              headers={'If-None-Match': '"{}"'.format(res.etag)})
+    assert res.status_int == 304
+
+    assert get(handler, 'notes.txt').status_int == 404
+    assert get(handler, 'missing-1.0.tar.gz').status_int == 404
+
+
+def test_range_requests(tmpdir):
+    """PackageFileHandler should honor Range requests"""
+    wheel = build_wheel(str(tmpdir), 'pkg', '1.0', description='x' * 5000)
+    contents = read(wheel)
+    handler = PackageFileHandler(Index(str(tmpdir)), MOUNT_POINTS, {})
+    filename = 'pkg-1.0-py2.py3-none-any.whl'
+
+    res = get(handler, filename, range=(10, 100))
+    assert res.status_int == 206
+    assert res.body == contents[10:100]
+
+    res = get(handler, filename, headers={'Range': 'bytes=-22'})
+    assert res.status_int == 206
+    assert res.body == contents[-22:]
+
+    res = get(handler, filename, headers={'Range': 'bytes=999999-'})
+    assert res.status_int == 416
+
+
+def test_range_file_closed(tmpdir):
+    """files should be closed with bounded ranges, even if not iterated"""
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+    handler = PackageFileHandler(Index(str(tmpdir)), MOUNT_POINTS, {})
+    filename = 'pkg-1.0-py2.py3-none-any.whl'
+    environ = {'wsgi.file_wrapper': FileWrapper}
+
+    req = Request.blank('/packages/' + filename, environ, range=(10, 100))
+    req.urlvars = {'filename': filename}
+    status, _, app_iter = req.call_application(handler)
+    assert status.startswith('206')
+    assert not app_iter.file.closed
+    app_iter.close()  # => e.g. client disconnected before the body
+    assert app_iter.file.closed
+
+
+def test_file_wrapper_used(tmpdir):
+    """PackageFileHandler should use the server's wsgi.file_wrapper"""
+    wheel = build_wheel(str(tmpdir), 'pkg', '1.0')
+    handler = PackageFileHandler(Index(str(tmpdir)), MOUNT_POINTS, {})
+    filename = 'pkg-1.0-py2.py3-none-any.whl'
+    environ = {'wsgi.file_wrapper': FileWrapper}
+
+    req = Request.blank('/packages/' + filename, environ)
+    req.urlvars = {'filename': filename}
+    status, _, app_iter = req.call_application(handler)
+    assert status.startswith('200')
+    assert isinstance(app_iter, FileWrapper)
+    assert b''.join(app_iter) == read(wheel)
+
+    req = Request.blank('/packages/' + filename, environ, range=(100, None))
+    req.urlvars = {'filename': filename}
+    status, _, app_iter = req.call_application(handler)
+    assert status.startswith('206')
+    assert isinstance(app_iter, FileWrapper)  # => range until the end
+    assert b''.join(app_iter) == read(wheel)[100:]
+
+
+def test_files_unavailable_before_ready(tmpdir, monkeypatch):
+    """files missing from an index that is not ready should get 503"""
+    sdist = build_sdist(str(tmpdir), 'pkg', '1.0')
+    index = Index(str(tmpdir))
+    index.update()
+    wheel = build_wheel(str(tmpdir), 'pkg', '2.0')  # => not indexed yet
+    monkeypatch.setattr(Index, 'ready', property(lambda self: False))
+    monkeypatch.setattr(Index, 'uptodate', lambda self: True)
+    files = PackageFileHandler(index, MOUNT_POINTS, {})
+    metadata = MetadataFileHandler(index, MOUNT_POINTS, {})
+
+    assert get(files, os.path.basename(sdist)).status_int == 200
+    res = get(files, os.path.basename(wheel))
+    assert res.status_int == 503
+    assert res.headers['Retry-After']
+
+    filename = os.path.basename(wheel) + '.metadata'
+    req = Request.blank('/packages/' + filename)
+    req.urlvars = {'filename': os.path.basename(wheel)}
+    assert req.get_response(metadata).status_int == 503
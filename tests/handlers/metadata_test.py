@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.handlers.MetadataFileHandler (PEP 658)
+"""
+import hashlib
+import zipfile
+
+import pytest
+from webob import Request
+
+from conftest import build_sdist, build_wheel
+from pypiple.handlers import MetadataFileHandler, SimpleItemHandler
+from pypiple.index import Index
+from pypiple.store import Store
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'packages': '/packages'}
+
+
+def raw_metadata(path):
+    """Read the METADATA file directly from the wheel"""
+    with zipfile.ZipFile(path) as archive:
+        name, = [n for n in archive.namelist() if n.endswith('METADATA')]
+        return archive.read(name)
+
+
+def get(handler, filename):
+    """Issue a GET request for the metadata file"""
+    req = Request.blank('/packages/{}.metadata'.format(filename))
+    req.urlvars = {'filename': filename}
+
+    return req.get_response(handler)
+
+
+@pytest.mark.parametrize('with_store', [False, True])
+def test_metadata_file_served(tmpdir, with_store):
+    """MetadataFileHandler should serve the METADATA file of wheels"""
+    pkg_dir = str(tmpdir.mkdir('packages'))
+    wheel = build_wheel(pkg_dir, 'pkg', '1.0', description='Long text')
+    build_sdist(pkg_dir, 'pkg', '1.0')
+    store = Store(str(tmpdir.join('db.sqlite'))) if with_store else None
+
+    index = Index(pkg_dir, store=store)
+    handler = MetadataFileHandler(index, MOUNT_POINTS, {})
+
+    res = get(handler, 'pkg-1.0-py2.py3-none-any.whl')
+    assert res.status_int == 200
+    assert res.body == raw_metadata(wheel)
+    assert 'metadata_file' not in index.metadata[wheel]
+
+    assert get(handler, 'pkg-1.0.tar.gz').status_int == 404
+    assert get(handler, 'missing-1.0.whl').status_int == 404
+
+
+def test_simple_item_advertises_metadata(tmpdir):
+    """SimpleItemHandler should include PEP 658/714 attributes for wheels"""
+    wheel = build_wheel(str(tmpdir), 'pkg', '1.0')
+    build_sdist(str(tmpdir), 'pkg', '1.0')
+    index = Index(str(tmpdir))
+    handler = SimpleItemHandler(index, MOUNT_POINTS, {})
+
+    req = Request.blank('/simple/pkg/')
+    req.urlvars = {'name': 'pkg'}
+    text = req.get_response(handler).text
+
+    digest = hashlib.sha256(raw_metadata(wheel)).hexdigest()
+    expected = 'data-core-metadata="sha256={0}" ' \
+        'data-dist-info-metadata="sha256={0}"'.format(digest)
+    wheel_line, = [l for l in text.splitlines() if '.whl' in l]
+    sdist_line, = [l for l in text.splitlines() if '.tar.gz' in l]
+    assert expected in wheel_line
+    assert 'data-' not in sdist_line
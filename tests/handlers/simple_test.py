@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=redefined-outer-name
+"""Automated tests for pypiple.handlers.Simple*
+"""
+import os
+import time
+
+import pytest
+from webob import Request
+
+from conftest import build_sdist, build_wheel
+from pypiple.cache import LRUCache
+from pypiple.handlers import SimpleCollectionHander, SimpleItemHandler
+from pypiple.hasher import Hasher
+from pypiple.index import Index
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'packages': '/packages'}
+
+
+@pytest.fixture()
+def simple_index(tmpdir):
+    """Index with a couple of real packages"""
+    dirpath = str(tmpdir)
+    build_wheel(dirpath, 'Some_Pkg', '1.0')
+    build_sdist(dirpath, 'Some_Pkg', '1.0')
+    build_wheel(dirpath, 'other', '0.1')
+
+    return Index(dirpath)
+
+
+def get(handler, name=None):
+    """Issue a GET request to the handler"""
+    req = Request.blank('/simple/{}'.format(name + '/' if name else ''))
+    req.urlvars = {'name': name} if name else {}
+
+    return req.get_response(handler)
+
+
+def test_simple_collection_lists_normalized_names(simple_index):
+    """SimpleCollectionHander should link all packages"""
+    handler = SimpleCollectionHander(simple_index, MOUNT_POINTS, {})
+    res = get(handler)
+
+    assert res.status_int == 200
+    assert res.content_type == 'text/html'
+    assert '<a href="/simple/some-pkg/">some-pkg</a>' in res.text
+    assert '<a href="/simple/other/">other</a>' in res.text
+
+
+def test_simple_item_lists_files(simple_index):
+    """SimpleItemHandler should link all files of a package"""
+    handler = SimpleItemHandler(simple_index, MOUNT_POINTS, {})
+    res = get(handler, 'some-pkg')
+
+    assert res.status_int == 200
+    assert 'href="/packages/Some_Pkg-1.0.tar.gz"' in res.text
+    assert 'href="/packages/Some_Pkg-1.0-py2.py3-none-any.whl"' in res.text
+    assert 'other' not in res.text
+
+    assert get(handler, 'missing').status_int == 404
+
+    res = get(handler, 'Some.Pkg')
+    assert res.status_int == 301
+    assert res.location.endswith('/simple/some-pkg/')
+
+
+def test_simple_item_cached_until_package_changes(simple_index):
+    """SimpleItemHandler should render pages again only when needed"""
+    handler = SimpleItemHandler(simple_index, MOUNT_POINTS, {})
+    rendered = []
+    original = handler.render
+    handler.render = lambda key, *args: (
+        rendered.append(key) or original(key, *args))
+
+    first = get(handler, 'some-pkg').body
+    get(handler, 'other')
+    assert get(handler, 'some-pkg').body == first
+    assert rendered == ['some-pkg', 'other']
+
+    time.sleep(0.01)
+    build_wheel(simple_index.path, 'some-pkg', '2.0')
+    second = get(handler, 'some-pkg').body
+    get(handler, 'other')
+
+    assert second != first
+    assert rendered == ['some-pkg', 'other', 'some-pkg']
+
+    time.sleep(0.01)
+    os.remove(os.path.join(simple_index.path,
+                           'other-0.1-py2.py3-none-any.whl'))
+    assert get(handler, 'other').status_int == 404
+
+
+def test_simple_conditional_requests(simple_index):
+    """Handlers should answer conditional requests with 304"""
+    handler = SimpleCollectionHander(simple_index, MOUNT_POINTS, {})
+    res = get(handler)
+    assert res.etag and res.last_modified
+
+    req = Request.blank('/simple/', if_none_match=res.etag)
+    cached = req.get_response(handler)
+    assert cached.status_int == 304
+    assert cached.body == b''
+
+    req = Request.blank('/simple/', if_modified_since=res.last_modified)
+    assert req.get_response(handler).status_int == 304
+
+    time.sleep(0.01)
+    build_wheel(simple_index.path, 'new-pkg', '1.0')
+    req = Request.blank('/simple/', if_none_match=res.etag)
+    modified = req.get_response(handler)
+    assert modified.status_int == 200
+    assert modified.etag != res.etag
+
+
+def test_simple_compressed_variants(simple_index):
+    """Handlers should serve pre-compressed pages when accepted"""
+    for i in range(30):  # => make the page big enough to be compressed
+        build_wheel(simple_index.path, 'pkg{}'.format(i), '1.0')
+    handler = SimpleCollectionHander(simple_index, MOUNT_POINTS, {})
+    plain = get(handler)
+    assert plain.content_encoding is None
+
+    req = Request.blank('/simple/', accept_encoding='gzip, deflate')
+    res = req.get_response(handler)
+    assert res.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in res.vary
+    assert res.etag != plain.etag
+    assert len(res.body) < len(plain.body)
+    res.decode_content()
+    assert res.body == plain.body
+
+    req = Request.blank('/simple/', accept_encoding='gzip;q=0, identity')
+    assert req.get_response(handler).content_encoding is None
+
+    req = Request.blank('/simple/', accept_encoding='gzip',
+                        if_none_match=res.etag)
+    assert req.get_response(handler).status_int == 304
+
+
+def test_simple_brotli_preferred(simple_index):
+    """brotli should be preferred over gzip, when both are accepted"""
+    pytest.importorskip('brotli')
+    for i in range(30):  # => make the page big enough to be compressed
+        build_wheel(simple_index.path, 'pkg{}'.format(i), '1.0')
+    handler = SimpleCollectionHander(simple_index, MOUNT_POINTS, {})
+    plain = get(handler)
+
+    req = Request.blank('/simple/', accept_encoding='gzip, br')
+    res = req.get_response(handler)
+    assert res.content_encoding == 'br'
+    assert len(res.body) < len(plain.body)
+
+    req = Request.blank('/simple/', accept_encoding='gzip, br;q=0.5')
+    assert req.get_response(handler).content_encoding == 'gzip'
+
+
+def test_simple_shared_cache_targeted_invalidation(simple_index):
+    """Changes in a package should only invalidate the related pages"""
+    cache = LRUCache()
+    collection = SimpleCollectionHander(simple_index, MOUNT_POINTS, {}, cache)
+    item = SimpleItemHandler(simple_index, MOUNT_POINTS, {}, cache)
+    get(collection)
+    get(item, 'some-pkg')
+    get(item, 'other')
+    assert len(cache) == 3
+
+    time.sleep(0.01)
+    build_wheel(simple_index.path, 'other', '0.2')
+    simple_index.update()  # => any caller triggers invalidation
+
+    assert len(cache) == 2  # => the collection only lists names
+    get(item, 'some-pkg')
+    get(collection)
+    assert cache.stats()['hits'] == 2
+
+    time.sleep(0.01)
+    build_wheel(simple_index.path, 'new', '1.0')
+    simple_index.update()
+    assert len(cache) == 1  # => some-pkg
+
+
+def test_simple_item_digest_fragment(tmpdir):
+    """SimpleItemHandler should include the digest, once available"""
+    path = build_wheel(str(tmpdir), 'pkg', '1.0')
+    index = Index(str(tmpdir), hasher=Hasher())
+    handler = SimpleItemHandler(index, MOUNT_POINTS, {})
+    index.update()
+    index.hasher.join()
+
+    text = get(handler, 'pkg').text
+    digest = index.metadata[path]['sha256']
+    assert '#sha256={}"'.format(digest) in text
+
+
+def test_outdated_pages_not_cached(simple_index):
+    """
+    pages rendered from a generation replaced in the meantime should be
+    served, but not cached
+    """
+    cache = LRUCache()
+    handler = SimpleCollectionHander(simple_index, MOUNT_POINTS, {}, cache)
+    original = handler.render
+
+    def render(key, generation):
+        """Simulate an update finishing during the rendering"""
+        # pylint: disable=protected-access
+        simple_index._generation = generation.evolve({}, {}, time.time())
+        return original(key, generation)
+
+    handler.render = render
+    assert get(handler).status_int == 200
+    assert not cache
+
+
+@pytest.mark.parametrize('partial', ['mark', 'gate'])
+def test_partial_listings(simple_index, monkeypatch, partial):
+    """listings should be marked or gated while the index is not ready"""
+    simple_index.update()
+    monkeypatch.setattr(Index, 'ready', property(lambda self: False))
+    collection = SimpleCollectionHander(
+        simple_index, MOUNT_POINTS, {}, partial=partial)
+    item = SimpleItemHandler(simple_index, MOUNT_POINTS, {}, partial=partial)
+
+    res = get(collection)
+    assert res.headers['X-Pypiple-Partial'] == '3/3'
+    if partial == 'gate':
+        assert res.status_int == 503
+        assert res.headers['Retry-After']
+    else:
+        assert res.status_int == 200
+        assert 'some-pkg' in res.text
+        assert res.cache_control.no_store
+
+    # => missing projects might just not be indexed yet
+    assert get(item, 'missing').status_int == 503
+
+    monkeypatch.undo()
+    assert get(item, 'missing').status_int == 404
+    assert 'X-Pypiple-Partial' not in get(collection).headers
+
+
+def test_digests_published_without_scan(tmpdir):
+    """
+    digests should be published without scanning the directory, and
+    without rendering the collection page again
+    """
+    path = build_wheel(str(tmpdir), 'pkg', '1.0')
+    index = Index(str(tmpdir), hasher=Hasher())
+    cache = LRUCache()
+    collection = SimpleCollectionHander(index, MOUNT_POINTS, {}, cache)
+    item = SimpleItemHandler(index, MOUNT_POINTS, {}, cache)
+    rendered = []
+    original = collection.render
+    collection.render = lambda key, *args: (
+        rendered.append(key) or original(key, *args))
+
+    get(collection)
+    index.hasher.join()
+    scans = []
+    scan = index.scan
+    index.scan = lambda: scans.append(1) or scan()
+    assert not index.uptodate()  # => digest waiting
+
+    assert '#sha256=' in get(item, 'pkg').text
+    assert index.metadata[path]['sha256']
+    get(collection)
+    assert not scans
+    assert rendered == [':response']
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.hasher
+"""
+import hashlib
+
+from conftest import build_wheel
+from pypiple.hasher import Hasher, file_digest
+from pypiple.index import Index
+from pypiple.store import Store
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def sha256(path):
+    """Reference digest"""
+    with open(path, 'rb') as file_:
+        return hashlib.sha256(file_.read()).hexdigest()
+
+
+def test_file_digest_in_chunks(tmpdir):
+    """file_digest should produce the same result regardless of chunks"""
+    path = build_wheel(str(tmpdir), 'pkg', '1.0', description='x' * 1000)
+
+    digest, _ = file_digest(path, chunk_size=7)
+    assert digest == sha256(path)
+
+
+def test_index_digests_in_background(tmpdir):
+    """
+    Index with hasher should store digests in the metadata (and in
+    the store), notifying listeners
+    """
+    pkg_dir = tmpdir.mkdir('packages')
+    path = build_wheel(str(pkg_dir), 'pkg', '1.0')
+    db_path = str(tmpdir.join('db.sqlite'))
+    notified = []
+
+    index = Index(str(pkg_dir), store=Store(db_path), hasher=Hasher())
+    index.subscribe(lambda modified, removed: notified.append(modified))
+    index.update()
+    index.hasher.join()
+    assert not index.uptodate()  # => digests are published by next update
+    index.update()
+
+    assert index.metadata[path]['sha256'] == sha256(path)
+    assert notified == [{path}, {path}]  # => update + digest
+    assert Store(db_path).load()[path]['sha256'] == sha256(path)
+    index.close()
+
+    # digests are not computed again after restart
+    hasher = Hasher()
+    hasher.submit = None  # => should not be called
+    index = Index(str(pkg_dir), store=Store(db_path), hasher=hasher)
+    assert index.metadata[path]['sha256'] == sha256(path)
@@ -5,6 +5,9 @@
 
 from time import time
 
+from pypiple import index as index_module
+from pypiple.index import Fingerprint
+
 __author__ = 'Anderson Bravalheri'
 __copyright__ = 'Anderson Bravalheri'
 __license__ = 'Mozilla Public License Version 2.0'
@@ -57,3 +60,23 @@ def test_diff_list_dirty_packages(package_paths, package_data, index):
     assert added == set()
     assert dirty == set(package_paths[:2])
     assert removed == set()
+
+
+def test_diff_use_given_fingerprints(package_paths, index, monkeypatch):
+    """
+    diff should compare fingerprints instead of reading the file system
+    when the result of scan is given
+    """
+
+    stats = {}
+    for i, path in enumerate(package_paths):
+        stats[path] = Fingerprint(i, 0, i)
+        index.metadata[path].update(stats[path]._asdict())
+
+    monkeypatch.setattr(index_module, 'getmtime', None)  # => no syscall
+    stats[package_paths[0]] = Fingerprint(-1, 0, 0)
+    added, dirty, removed = index.diff(stats)
+
+    assert added == set()
+    assert dirty == set(package_paths[:1])
+    assert removed == set()
@@ -3,8 +3,7 @@
 """Automated tests for pypiple.index.extract_version
 
 Objective:
-    Guarantee extracted versions ignore build metadata and
-    can be properly sorted
+    Guarantee extracted versions can be properly sorted
 """
 from itertools import permutations
 
@@ -17,31 +16,30 @@ __copyright__ = 'Anderson Bravalheri'
 __license__ = 'Mozilla Public License Version 2.0'
 
 
-def test_extract_version_ignore_build():
+def test_extract_version_local_labels():
     """
-    extract_version should ignore build metadata
-    pkgs that diff just for build metadata should have
-    the same sorting precedence
+    extract_version should follow PEP 440 for build metadata (local labels):
+    pkgs that diff just for local labels should sort right after
+    the public version, and before the next one
     """
     pkg1 = {'version': '1.0.0-beta+20130313144700'}
     pkg2 = {'version': '1.0.0-beta+exp.sha.5114f85'}
+    public = {'version': '1.0.0-beta'}
+    final = {'version': '1.0.0'}
 
-    version1 = extract_version(pkg1)
-    version2 = extract_version(pkg2)
+    pkgs = [public, pkg2, pkg1, final]
+    for permutation in permutations(pkgs):
+        assert sorted(permutation, key=extract_version) == pkgs
 
-    assert version1 == version2
-    assert '20130313144700' not in version1
-    assert 'exp.sha.5114f85' not in version2
-    assert version1[0] == '1'
-    assert version1[1] == '0'
-    assert version1[2] == '0'
-    assert version1[3] == 'beta'
+    assert extract_version(pkg1)[:-1] == extract_version(pkg2)[:-1]
 
-    pkgs = [pkg1, pkg2]
-    assert sorted(pkgs, key=extract_version) == pkgs
 
-    pkgs = [pkg2, pkg1]
-    assert sorted(pkgs, key=extract_version) == pkgs
+def test_extract_version_numeric_components():
+    """
+    extract_version should compare components as numbers
+    """
+    pkgs = [{'version': v} for v in ('1.0', '1.0.1', '9.0', '10.0')]
+    assert sorted(reversed(pkgs), key=extract_version) == pkgs
 
 
 @pytest.mark.slow
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.records.Package
+"""
+import pickle
+
+from conftest import build_wheel
+from pypiple.index import Index, retrieve_data
+from pypiple.records import Package
+from pypiple.store import Store
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_package_behaves_like_dict():
+    """
+    Package should expose its fields (and unknown keys) as a dict would
+    """
+    pkg = Package({'name': 'pkg', 'version': '1.0', 'extra': 42})
+
+    assert pkg['name'] == 'pkg'
+    assert pkg.get('maintainer') is None
+    assert pkg.pop('extra') == 42
+    assert 'extra' not in pkg
+    assert dict(pkg) == {'name': 'pkg', 'version': '1.0', 'description': None}
+    assert pickle.loads(pickle.dumps(pkg)) == pkg
+    assert not hasattr(pkg, '__dict__')
+
+
+def test_package_contains_only_iterated_keys():
+    """
+    membership tests should agree with the keys produced by the record
+    (unset fields and unloaded descriptions are not contained)
+    """
+    pkg = Package({'name': 'pkg', 'description': 'Long text', 'extra': 42})
+
+    for key in ('name', 'description', 'extra', 'maintainer', 'missing'):
+        assert (key in pkg) == (key in dict(pkg))
+
+    pkg.unload()
+    assert 'description' not in pkg
+    assert 'description' not in dict(pkg)
+
+
+def test_package_shares_repeated_strings():
+    """
+    strings that repeat between packages should be the same object in memory
+    and classifiers should be stored as tuples
+    """
+    author = ''.join(['Anderson ', 'Bravalheri'])
+    first = Package({'author': author, 'classifiers': ['A :: B']})
+    second = Package({'author': 'Anderson Bravalheri',
+                      'classifiers': ['A :: B']})
+
+    assert first['author'] is second['author']
+    assert first['classifiers'] == ('A :: B',)
+    assert first['classifiers'][0] is second['classifiers'][0]
+
+
+def test_description_loaded_from_disk(tmpdir):
+    """
+    descriptions should not be kept in memory, but read again from the file
+    """
+    path = build_wheel(str(tmpdir), 'pkg', '1.0', description='Long text')
+    index = Index(str(tmpdir))
+    index.update()
+    data = index.metadata[path]
+
+    assert 'description' not in dict(data)
+    assert 'description' not in data
+    assert index.description(path).strip() == 'Long text'
+    assert retrieve_data(path)['description'].strip() == 'Long text'
+
+
+def test_description_loaded_from_store(tmpdir, monkeypatch):
+    """
+    when a store is given, descriptions should be read from it
+    (without decoding the package again)
+    """
+    path = build_wheel(str(tmpdir), 'pkg', '1.0', description='Long text')
+    index = Index(str(tmpdir), store=Store(':memory:'))
+    index.update()
+
+    monkeypatch.setattr('pypiple.index.decode', None)
+    assert index.description(path).strip() == 'Long text'
+
+    # saving the record without description should not erase it
+    index.store.save({path: index.metadata[path]})
+    assert index.description(path).strip() == 'Long text'
@@ -3,9 +3,14 @@
 # pylint: disable=redefined-outer-name
 """Automated tests for pypiple.index.Index#packages
 """
+import os
+import time
 
 import pytest
 
+from conftest import build_sdist, build_wheel
+from pypiple.index import Index
+
 __author__ = 'Anderson Bravalheri'
 __copyright__ = 'Anderson Bravalheri'
 __license__ = 'Mozilla Public License Version 2.0'
@@ -58,3 +63,54 @@ def test_package_versions_are_sorted(small_index):
     assert small_index.packages['some-pkg'][0]['version'] == '3.0.0'
     assert small_index.packages['some-pkg'][1]['version'] == '2.0.0'
     assert small_index.packages['some-pkg'][2]['version'] == '1.0.0'
+
+
+def test_packages_patched_by_update(tmpdir):
+    """
+    packages should be patched (copy-on-write) by update, keeping versions
+    sorted and sharing the releases of packages not affected
+    """
+
+    dirpath = str(tmpdir)
+    build_wheel(dirpath, 'Some_Pkg', '2.0.0')
+    old = build_sdist(dirpath, 'some.pkg', '1.0.0')
+    build_wheel(dirpath, 'other-pkg', '0.1')
+
+    index = Index(dirpath)
+    index.update()
+    releases = index.packages['some-pkg']
+    other = index.packages['other-pkg']
+    assert [pkg['version'] for pkg in releases] == ['2.0.0', '1.0.0']
+
+    time.sleep(0.01)
+    build_wheel(dirpath, 'some-pkg', '1.5.0')
+    os.remove(old)
+    index.update()
+
+    assert index.packages['other-pkg'] is other  # => not regenerated
+    assert [pkg['version'] for pkg in index.packages['some-pkg']] == [
+        '2.0.0', '1.5.0']
+    assert set(index.packages) == {'some-pkg', 'other-pkg'}
+    # => previous generation is not affected
+    assert [pkg['version'] for pkg in releases] == ['2.0.0', '1.0.0']
+
+
+def test_generation_is_immutable(tmpdir):
+    """readers holding a generation should not see later updates"""
+
+    dirpath = str(tmpdir)
+    first = build_wheel(dirpath, 'pkg', '1.0')
+    index = Index(dirpath)
+    index.update()
+    generation = index.generation
+    files = set(generation.files)
+
+    time.sleep(0.01)
+    os.remove(first)
+    build_wheel(dirpath, 'pkg', '2.0')
+    index.update()
+
+    assert set(generation.files) == files
+    assert [pkg['version'] for pkg in generation.packages['pkg']] == ['1.0']
+    assert [pkg['version'] for pkg in index.packages['pkg']] == ['2.0']
+    assert index.generation is not generation
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.index.Index (progressive updates)
+"""
+import time
+
+from conftest import build_wheel
+from pypiple.hasher import Hasher
+from pypiple.index import Index, Progress
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_update_publishes_batches(tmpdir):
+    """update should publish partial generations every batch_size packages
+    """
+    for i in range(5):
+        build_wheel(str(tmpdir), 'pkg{}'.format(i), '1.0')
+    index = Index(str(tmpdir), batch_size=2)
+    published = []
+
+    def listener(modified, removed):
+        """Record the state of the index after each batch"""
+        assert not removed
+        published.append((len(modified), len(index.files), index.progress,
+                          index.generation.mtime is None))
+
+    index.subscribe(listener)
+    assert not index.ready
+    assert index.progress == Progress(0, None)
+
+    modified, _ = index.update()
+    assert len(modified) == 5
+    assert published == [
+        (2, 2, Progress(2, 5), True),
+        (2, 4, Progress(4, 5), True),
+        (1, 5, Progress(5, 5), False),  # => only complete when uptodate
+    ]
+    assert index.ready
+
+
+def test_digests_keep_progress(tmpdir):
+    """updates with nothing to decode should not reset the progress"""
+    for i in range(3):
+        build_wheel(str(tmpdir), 'pkg{}'.format(i), '1.0')
+    index = Index(str(tmpdir), hasher=Hasher())
+    index.update()
+    assert index.progress == Progress(3, 3)
+
+    index.hasher.join()
+    assert not index.uptodate()  # => digests waiting
+    modified, _ = index.update()
+    assert len(modified) == 3
+    assert index.progress == Progress(3, 3)
+
+
+def test_start_serves_partial_contents(tmpdir):
+    """after start, revalidate should not block until the index is ready"""
+    build_wheel(str(tmpdir), 'first', '1.0')
+    index = Index(str(tmpdir))
+    index.start()
+    assert index._refresher.wait(5)  # pylint: disable=protected-access
+    assert index.ready
+    assert list(index.packages) == ['first']
+
+    # => once ready, updates are done inline again (not in background)
+    time.sleep(0.01)
+    build_wheel(str(tmpdir), 'second', '1.0')
+    assert index.revalidate()
+    assert sorted(index.packages) == ['first', 'second']
+    index.close()
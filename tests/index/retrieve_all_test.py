@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.index.retrieve_all
+"""
+import os
+
+from conftest import build_sdist, build_wheel
+from pypiple import index as index_module
+from pypiple.index import Index, retrieve_all
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def populate(dirpath):
+    """Create some valid packages and a broken one"""
+
+    paths = [build_wheel(dirpath, 'pkg{}'.format(i), '1.0') for i in range(4)]
+    paths += [build_sdist(dirpath, 'sdist{}'.format(i), '0.1')
+              for i in range(4)]
+
+    broken = os.path.join(dirpath, 'broken-1.0.whl')
+    with open(broken, 'w'):  # touch file
+        pass
+
+    return paths, broken
+
+
+def test_retrieve_all_parallel_matches_serial(tmpdir):
+    """
+    retrieve_all should produce the same results with or without workers
+    """
+    paths, broken = populate(str(tmpdir))
+
+    serial = retrieve_all(paths + [broken])
+    parallel = retrieve_all(paths + [broken], workers=3, chunksize=2)
+
+    assert parallel == serial
+    assert parallel[broken] is None
+    assert all(parallel[path]['name'] for path in paths)
+
+
+def test_update_with_workers(tmpdir):
+    """
+    Index#update should extract metadata with a pool of processes
+    when workers are given
+    """
+    paths, _ = populate(str(tmpdir))
+
+    index = Index(str(tmpdir), workers=2)
+    modified, removed = index.update()
+
+    assert set(paths) < modified
+    assert removed == set()
+    assert index.metadata[paths[0]]['name'] == 'pkg0'
+
+
+def test_update_shares_pool_between_batches(tmpdir, monkeypatch):
+    """Index#update should create a single pool, used by all batches"""
+    paths, broken = populate(str(tmpdir))
+    pools = []
+    create_pool = index_module.create_pool
+    monkeypatch.setattr(index_module, 'create_pool',
+                        lambda workers: pools.append(workers) or
+                        create_pool(workers))
+
+    index = Index(str(tmpdir), workers=2, batch_size=3)
+    modified, _ = index.update()
+
+    assert pools == [2]
+    assert modified == set(paths) | {broken}
+    assert index.metadata[broken] is None
+    assert index.metadata[paths[-1]]['name'] == 'sdist3'
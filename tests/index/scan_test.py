@@ -43,3 +43,17 @@ def test_scan_not_list_extra_files(package_dir, extra_files):
 
     for name in not_expected:
         assert name not in pkgs
+
+
+def test_scan_return_fingerprints(package_dir, package_paths):
+    """
+    scan should return the stat info of each package, so diff does not
+    need to stat the files again
+    """
+
+    index = Index(package_dir)
+    pkgs = index.scan()
+
+    for path in package_paths:
+        stat = os.stat(path)
+        assert pkgs[path] == (stat.st_mtime_ns, stat.st_size, stat.st_ino)
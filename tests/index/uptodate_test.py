@@ -3,8 +3,10 @@
 """Automated tests for pypiple.index.Index#uptodate
 """
 import os
+import threading
 import time
 
+from conftest import build_wheel
 from pypiple.index import Index
 
 __author__ = 'Anderson Bravalheri'
@@ -39,3 +41,30 @@ def test_uptodate_returns_false_when_dir_is_modified(tmpdir):
         pass
 
     assert not index.uptodate()
+
+
+def test_concurrent_updates_scan_once(tmpdir):
+    """callers waiting for a running update should not scan again"""
+    index = Index(str(tmpdir))
+    index.update()
+    time.sleep(0.01)
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+
+    scans = []
+    original = index.scan
+
+    def slow_scan():
+        """Give time to the other threads to pile up"""
+        scans.append(1)
+        time.sleep(0.1)
+        return original()
+
+    index.scan = slow_scan
+    threads = [threading.Thread(target=index.revalidate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(scans) == 1
+    assert list(index.packages) == ['pkg']
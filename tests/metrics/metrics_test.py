@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.metrics
+"""
+import os
+
+from webob import Request
+
+from conftest import build_wheel
+from pypiple.handlers import MetricsHandler, SimpleCollectionHander
+from pypiple.index import Index
+from pypiple.metrics import REGISTRY, Registry
+from pypiple.middleware import count_responses
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_prometheus_text_format():
+    """registry should render counters, timers and callbacks"""
+    registry = Registry({'requests_total': ('counter', 'Requests')})
+    registry.inc('requests_total', path='/a"b')
+    registry.inc('requests_total', 2, path='/a"b')
+    registry.observe('render_seconds', 0.5)
+    registry.observe('render_seconds', 1.5)
+    registry.register('files', lambda: 42)
+
+    assert registry.value('requests_total', path='/a"b') == 3
+    assert registry.value('render_seconds') == (2.0, 2)
+    assert registry.render().splitlines() == [
+        '# HELP files files',
+        '# TYPE files untyped',
+        'files 42.0',
+        '# HELP render_seconds render_seconds',
+        '# TYPE render_seconds untyped',
+        'render_seconds_sum 2.0',
+        'render_seconds_count 2.0',
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{path="/a\\"b"} 3.0',
+    ]
+
+
+def test_index_and_handlers_instrumented(tmpdir):
+    """
+    index updates and handlers should record timings, failures and
+    response sizes, exposed by MetricsHandler
+    """
+    REGISTRY.clear()
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+    with open(os.path.join(str(tmpdir), 'broken-1.0.tar.gz'), 'wb') as file_:
+        file_.write(b'not a tarball')
+
+    index = Index(str(tmpdir))
+    handler = count_responses(
+        SimpleCollectionHander(index, {'simple': '/simple/'}, {}),
+        'SimpleCollectionHander')
+    body = Request.blank('/simple/').get_response(handler).body
+
+    assert REGISTRY.value('pypiple_index_updates_total') == 1
+    assert REGISTRY.value('pypiple_index_scan_seconds')[1] == 1
+    assert REGISTRY.value('pypiple_index_decode_seconds')[1] == 2
+    assert REGISTRY.value('pypiple_index_decode_failures_total') == 1
+    assert REGISTRY.value('pypiple_response_bytes_total',
+                          handler='SimpleCollectionHander') == len(body)
+
+    text = Request.blank('/metrics').get_response(MetricsHandler()).text
+    assert '# TYPE pypiple_render_seconds summary' in text
+    assert ('pypiple_responses_total{handler="SimpleCollectionHander",'
+            'status="200"} 1.0') in text
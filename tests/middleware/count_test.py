@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.middleware.count_responses
+"""
+import os
+from wsgiref.util import FileWrapper
+
+from webob import Request
+
+from conftest import build_wheel
+from pypiple.handlers import PackageFileHandler, SimpleCollectionHander
+from pypiple.index import Index
+from pypiple.metrics import Registry
+from pypiple.middleware import count_responses
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'packages': '/packages'}
+
+
+def test_conditional_responses_counted(tmpdir):
+    """responses should be recorded after conditional requests are evaluated
+    """
+    build_wheel(str(tmpdir), 'pkg', '1.0')
+    registry = Registry()
+    app = count_responses(
+        SimpleCollectionHander(Index(str(tmpdir)), MOUNT_POINTS, {}),
+        'simple', registry)
+
+    res = Request.blank('/simple/').get_response(app)
+    size = len(res.body)
+    assert registry.value('pypiple_responses_total',
+                          handler='simple', status=200) == 1
+    assert registry.value('pypiple_response_bytes_total',
+                          handler='simple') == size
+
+    res = Request.blank('/simple/', if_none_match=res.etag) \
+        .get_response(app)
+    assert res.status_int == 304
+    assert not res.body  # => body consumed, so the response is recorded
+    assert registry.value('pypiple_responses_total',
+                          handler='simple', status=304) == 1
+    assert registry.value('pypiple_responses_total',
+                          handler='simple', status=200) == 1
+    assert registry.value('pypiple_response_bytes_total',
+                          handler='simple') == size  # => no body
+
+
+def test_files_counted(tmpdir):
+    """package files should be counted, also when sent by the server"""
+    wheel = build_wheel(str(tmpdir), 'pkg', '1.0')
+    size = os.path.getsize(wheel)
+    registry = Registry()
+    app = count_responses(
+        PackageFileHandler(Index(str(tmpdir)), MOUNT_POINTS, {}),
+        'packages', registry)
+    filename = os.path.basename(wheel)
+
+    def get(**kwargs):
+        """Issue a GET request for the wheel"""
+        req = Request.blank('/packages/' + filename, **kwargs)
+        req.urlvars = {'filename': filename}
+        res = req.get_response(app)
+        assert res.body is not None  # => consume the body
+        return res
+
+    res = get(environ={'wsgi.file_wrapper': FileWrapper})
+    assert len(res.body) == size
+    assert registry.value('pypiple_response_bytes_total',
+                          handler='packages') == size
+
+    get(range=(0, 10))
+    assert registry.value('pypiple_responses_total',
+                          handler='packages', status=206) == 1
+    assert registry.value('pypiple_response_bytes_total',
+                          handler='packages') == size + 10
+
+    get(if_none_match=res.etag)
+    assert registry.value('pypiple_responses_total',
+                          handler='packages', status=304) == 1
+    assert registry.value('pypiple_response_bytes_total',
+                          handler='packages') == size + 10
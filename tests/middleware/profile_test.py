@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.middleware.profile_requests
+"""
+import os
+import pstats
+
+import pytest
+from webob import Request, Response
+from webob.dec import wsgify
+
+from pypiple.middleware import PROFILE_HEADER, profile_requests
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+@wsgify
+def hello(req):
+    """Simple WSGI app"""
+    return Response(text=u'hello ' + req.path)
+
+
+def test_disabled_profiling_returns_app():
+    """without rate or token, the app should not be wrapped"""
+    assert profile_requests(hello, directory='/tmp') is hello
+
+
+def test_profiling_requires_directory(tmpdir):
+    """enabling profiling without a directory should be rejected, and
+    missing directories should be created"""
+    with pytest.raises(ValueError):
+        profile_requests(hello, rate=1)
+    with pytest.raises(ValueError):
+        profile_requests(hello, token='secret')
+
+    directory = str(tmpdir.join('profiles', 'app'))
+    profile_requests(hello, directory=directory, rate=1)
+    assert os.path.isdir(directory)
+
+
+def test_dump_failures_do_not_fail_requests(tmpdir):
+    """requests should be answered even if the stats cannot be dumped"""
+    directory = str(tmpdir.join('profiles'))
+    app = profile_requests(hello, directory=directory, rate=1)
+    os.rmdir(directory)  # => e.g. removed by a cleanup job
+
+    res = Request.blank('/').get_response(app)
+    assert res.status_int == 200
+    assert res.text == u'hello /'
+
+
+def test_sampled_requests_are_dumped(tmpdir):
+    """sampled requests should be dumped to the directory"""
+    app = profile_requests(hello, directory=str(tmpdir), rate=1)
+    res = Request.blank('/simple/pkg/').get_response(app)
+    assert res.text == u'hello /simple/pkg/'
+
+    dumps = os.listdir(str(tmpdir))
+    assert len(dumps) == 1
+    assert dumps[0].endswith('_simple_pkg_.prof')
+    stats = pstats.Stats(os.path.join(str(tmpdir), dumps[0]))
+    assert stats.total_calls > 0
+
+
+def test_header_requires_token(tmpdir):
+    """only requests with the right token should return the stats"""
+    app = profile_requests(hello, directory=str(tmpdir), token='secret')
+
+    res = Request.blank('/', headers={PROFILE_HEADER: 'wrong'}).get_response(
+        app)
+    assert res.text == u'hello /'
+    assert not os.listdir(str(tmpdir))
+
+    res = Request.blank('/', headers={PROFILE_HEADER: 'secret'}).get_response(
+        app)
+    assert res.content_type == 'text/plain'
+    assert res.text.startswith(u'200 OK /')
+    assert 'function calls' in res.text
+    assert len(os.listdir(str(tmpdir))) == 1
+
+
+class Stream(object):
+    """Body that records how it is consumed"""
+
+    def __init__(self):
+        self.read = False
+        self.closed = False
+
+    def __iter__(self):
+        self.read = True
+        yield b'data'
+
+    def close(self):
+        """Record the iterable was closed"""
+        self.closed = True
+
+
+def test_bodies_not_buffered(tmpdir):
+    """profiling should not consume the body (e.g. files are streamed)"""
+    stream = Stream()
+
+    @wsgify
+    def download(req):  # pylint: disable=unused-argument
+        """WSGI app streaming a file"""
+        return Response(app_iter=stream, content_length=4)
+
+    app = profile_requests(download, directory=str(tmpdir), rate=1,
+                           token='secret')
+    res = Request.blank('/').get_response(app)
+    assert not stream.read
+    assert res.body == b'data'
+    assert len(os.listdir(str(tmpdir))) == 1
+
+    stream = Stream()
+    res = Request.blank('/', headers={PROFILE_HEADER: 'secret'}).get_response(
+        app)
+    assert 'function calls' in res.text
+    assert not stream.read and stream.closed  # => replaced by the report
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.readers
+"""
+import os
+import tarfile
+import zipfile
+from io import BytesIO
+
+import pkginfo
+
+from conftest import build_sdist, build_wheel, pkg_info
+from pypiple import index as index_module
+from pypiple.index import decode
+from pypiple.readers import read_egg, read_sdist, read_wheel
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_readers_match_pkginfo(tmpdir):
+    """Readers should find the same metadata as pkginfo"""
+    dirpath = str(tmpdir)
+    wheel = build_wheel(dirpath, 'some-pkg', '1.0')
+    sdist = build_sdist(dirpath, 'some-pkg', '1.0')
+    egg = os.path.join(dirpath, 'some_pkg-1.0-py3.egg')
+    with zipfile.ZipFile(egg, 'w') as archive:
+        archive.writestr('EGG-INFO/PKG-INFO', pkg_info('some-pkg', '1.0'))
+
+    assert read_wheel(wheel) == pkginfo.Wheel(wheel).read()
+    assert read_sdist(sdist) == pkginfo.SDist(sdist).read()
+    assert read_egg(egg) == pkginfo.BDist(egg).read()
+
+
+def test_read_egg_without_pkg_info(tmpdir):
+    """read_egg should return None when EGG-INFO/PKG-INFO is missing"""
+    egg = str(tmpdir.join('pkg-1.0-py3.egg'))
+    with zipfile.ZipFile(egg, 'w') as archive:
+        archive.writestr('pkg/PKG-INFO', pkg_info('pkg', '1.0'))
+
+    assert read_egg(egg) is None
+
+
+def test_read_sdist_stops_at_pkg_info(tmpdir):
+    """read_sdist should not read members after PKG-INFO"""
+    path = str(tmpdir.join('pkg-1.0.tar.gz'))
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in [('pkg-1.0/PKG-INFO', pkg_info('pkg', '1.0')),
+                           ('pkg-1.0/big.bin', os.urandom(100000))]:
+            entry = tarfile.TarInfo(name)
+            entry.size = len(data)
+            archive.addfile(entry, BytesIO(data))
+
+    # truncate the archive in the middle of the second member
+    with open(path, 'rb') as file_:
+        data = file_.read()
+    with open(path, 'wb') as file_:
+        file_.write(data[:len(data) // 2])
+
+    assert b'Name: pkg' in read_sdist(path)
+
+
+def test_decode_falls_back_to_pkginfo(tmpdir, monkeypatch):
+    """decode should use pkginfo when readers fail"""
+    wheel = build_wheel(str(tmpdir), 'pkg', '1.0')
+    monkeypatch.setitem(index_module.READERS, 'whl', lambda path: None)
+
+    info, raw = decode(wheel)
+    assert info.name == 'pkg'
+    assert raw == read_wheel(wheel)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.refresher.Refresher running with gevent
+"""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import build_wheel
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+PACKAGES = 300
+
+REVALIDATE_SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import time
+
+import gevent
+
+from pypiple.index import Index
+
+packages, new = sys.argv[1:]
+index = Index(packages, background=True)
+index.update()
+time.sleep(0.01)
+for name in os.listdir(new):
+    os.rename(os.path.join(new, name), os.path.join(packages, name))
+
+gaps = []
+
+
+def ticker():
+    last = time.time()
+    while True:
+        gevent.sleep(0.001)
+        now = time.time()
+        gaps.append(now - last)
+        last = now
+
+
+greenlet = gevent.spawn(ticker)
+start = time.time()
+assert not index.revalidate()  # => scheduled, not blocking
+with gevent.Timeout(30):
+    while not index.revalidate():
+        gevent.sleep(0.001)
+elapsed = time.time() - start
+greenlet.kill()
+
+assert len(index.files) == {total}
+assert max(gaps) < elapsed / 2, (max(gaps), elapsed)
+"""
+
+
+def test_background_update_does_not_block(tmpdir):
+    """with gevent, background updates should not block other greenlets"""
+    pytest.importorskip('gevent')
+    packages = tmpdir.mkdir('packages')
+    new = tmpdir.mkdir('new')
+    build_wheel(str(packages), 'first', '1.0')
+    for i in range(PACKAGES):
+        build_wheel(str(new), 'pkg{}'.format(i), '1.0')
+
+    script = REVALIDATE_SCRIPT.format(total=PACKAGES + 1)
+    subprocess.check_call(
+        [sys.executable, '-c', script, str(packages), str(new)])
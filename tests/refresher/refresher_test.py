@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.refresher.Refresher
+"""
+import threading
+import time
+
+from conftest import build_wheel
+from pypiple.index import Index
+from pypiple.refresher import Refresher
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_triggers_are_coalesced():
+    """
+    triggers received while the function is running should produce
+    a single extra run
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+
+    refresher = Refresher(slow)
+    refresher.trigger()
+    assert started.wait(5)
+    for _ in range(10):
+        refresher.trigger()
+    assert not refresher.wait(0.01)
+
+    release.set()
+    assert refresher.wait(5)
+    assert refresher.runs == 2
+    refresher.stop()
+
+
+def test_index_background_revalidate(tmpdir):
+    """
+    in background mode, revalidate should not block and the current
+    contents should be kept until the update finishes
+    """
+    build_wheel(str(tmpdir), 'first', '1.0')
+    index = Index(str(tmpdir), background=True)
+
+    assert not index.revalidate()
+    index._refresher.wait(5)  # pylint: disable=protected-access
+    assert index.revalidate()
+    assert list(index.packages) == ['first']
+
+    time.sleep(0.01)
+    build_wheel(str(tmpdir), 'second', '1.0')
+    assert not index.revalidate()
+    index._refresher.wait(5)  # pylint: disable=protected-access
+    assert sorted(index.packages) == ['first', 'second']
+    index.close()
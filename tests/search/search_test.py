@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.search
+"""
+import os
+import time
+
+import pytest
+from webob import Request
+
+from conftest import build_wheel
+from pypiple.handlers import SearchHandler
+from pypiple.index import Index
+from pypiple.search import SearchIndex, tokenize
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+MOUNT_POINTS = {'simple': '/simple/', 'search': '/search'}
+
+
+@pytest.fixture()
+def index(tmpdir):
+    """Index with a few packages with different metadata"""
+    dirpath = str(tmpdir)
+    build_wheel(dirpath, 'Web_Framework', '1.0', summary='Build web apps',
+                keywords='http wsgi')
+    build_wheel(dirpath, 'wsgi-tools', '0.1', summary='Helpers',
+                classifiers=['Topic :: Internet :: WWW/HTTP :: WSGI'])
+    build_wheel(dirpath, 'parser', '2.0', summary='Parse web pages',
+                author='Jane Webster')
+    index = Index(dirpath)
+    index.update()
+
+    return index
+
+
+def names(results):
+    """Names of the projects in the search results"""
+    return [name for _, name in results]
+
+
+def test_tokenize():
+    """tokenize should split text and sequences into lowercase terms"""
+    assert tokenize(u'Web_Framework: WSGI-apps') == [
+        'web', 'framework', 'wsgi', 'apps']
+    assert tokenize(['Topic :: Internet', 'WWW/HTTP']) == [
+        'topic', 'internet', 'www', 'http']
+    assert tokenize(None) == []
+
+
+def test_ranked_queries(index):
+    """matches in the name should rank above other fields"""
+    search = SearchIndex(index)
+    assert len(search) == 3
+
+    assert names(search.search('wsgi')) == ['wsgi-tools', 'web-framework']
+    assert names(search.search('web')) == [
+        'web-framework', 'parser']  # => name, then summary
+    assert names(search.search('web wsgi')) == ['web-framework']
+    assert names(search.search('parser')) == ['parser']
+    assert search.search('nothing') == []
+    assert search.search('  ') == []
+
+
+def test_prefix_queries(index):
+    """terms should also match as prefixes, with a lower score"""
+    search = SearchIndex(index)
+
+    assert names(search.search('ws')) == ['wsgi-tools', 'web-framework']
+    assert names(search.search('webst')) == ['parser']  # => author
+    exact, = search.search('parser')
+    prefix, = search.search('pars')
+    assert prefix[0] < exact[0]
+
+
+def test_incremental_updates(index):
+    """the search index should follow the changes in the index"""
+    search = SearchIndex(index)
+
+    time.sleep(0.01)
+    build_wheel(index.path, 'wsgi-server', '1.0', summary='Serve apps')
+    build_wheel(index.path, 'parser', '3.0', summary='Parse documents')
+    os.remove(os.path.join(index.path, 'wsgi_tools-0.1-py2.py3-none-any.whl'))
+    index.update()
+
+    assert names(search.search('wsgi')) == ['wsgi-server', 'web-framework']
+    assert names(search.search('documents')) == ['parser']  # => newest
+    assert search.search('helpers') == []
+    assert len(search) == 3
+
+
+def test_search_handler(index):
+    """SearchHandler should render the results with links to projects"""
+    handler = SearchHandler(index, MOUNT_POINTS, {})
+
+    res = Request.blank('/search?q=wsgi').get_response(handler)
+    assert res.status_int == 200
+    text = res.text
+    assert text.index('/simple/wsgi-tools/') < \
+        text.index('/simple/web-framework/')
+    assert 'Build web apps' in text
+    assert 'value="wsgi"' in text
+
+    res = Request.blank('/search?q=%3Cscript%3E').get_response(handler)
+    assert '<script>' not in res.text
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.snapshot
+"""
+import os
+import zipfile
+
+from conftest import build_sdist, build_wheel
+from pypiple.hasher import Hasher
+from pypiple import index as index_module
+from pypiple.index import Index
+from pypiple.snapshot import Snapshot, SnapshotBuilder, SnapshotIndex, main
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_snapshot_shared_with_workers(tmpdir):
+    """
+    SnapshotIndex should expose the same packages as the builder index,
+    including descriptions, digests and metadata files
+    """
+    pkg_dir = str(tmpdir.mkdir('packages'))
+    snapshot = str(tmpdir.join('packages.snapshot'))
+    wheel = build_wheel(pkg_dir, 'pkg', '1.0', description='Long text')
+    build_sdist(pkg_dir, 'other', '2.0')
+
+    hasher = Hasher()
+    index = Index(pkg_dir, hasher=hasher)
+    builder = SnapshotBuilder(index, snapshot)
+    index.update()
+    hasher.join()
+    assert builder.publish()
+    assert not builder.publish()  # => nothing changed
+
+    worker = SnapshotIndex(pkg_dir, snapshot)
+    assert worker.update() == (set(index.files), set())
+    assert worker.update() is None
+    assert sorted(worker.packages) == ['other', 'pkg']
+    assert worker.algorithm == 'sha256'
+    assert worker.metadata[wheel]['sha256'] == index.metadata[wheel]['sha256']
+    assert worker.description(wheel).strip() == 'Long text'
+    with zipfile.ZipFile(wheel) as archive:
+        raw = archive.read('pkg-1.0.dist-info/METADATA')
+    assert worker.metadata_file(wheel) == raw
+    assert worker.mtime() == index.mtime()
+    index.close()
+
+
+def test_snapshot_switch(tmpdir, monkeypatch):
+    """
+    workers should switch to new snapshots, reporting (and parsing) only
+    the changes
+    """
+    pkg_dir = str(tmpdir.mkdir('packages'))
+    snapshot = str(tmpdir.join('packages.snapshot'))
+    first = build_wheel(pkg_dir, 'pkg', '1.0')
+    second = build_wheel(pkg_dir, 'pkg', '2.0')
+    builder = SnapshotBuilder(Index(pkg_dir), snapshot)
+
+    worker = SnapshotIndex(pkg_dir, snapshot)
+    assert worker.update() is None  # => not published yet
+    builder.publish()
+    worker.update()
+    record = worker.metadata[first]
+
+    os.remove(second)
+    third = build_wheel(pkg_dir, 'pkg', '3.0')
+    builder.publish()
+
+    parsed = []
+    parse = Snapshot.record
+    monkeypatch.setattr(Snapshot, 'record', lambda self, pkg: (
+        parsed.append(pkg) or parse(self, pkg)))
+    assert worker.update() == ({third}, {second})
+    assert parsed == [third]
+    assert worker.metadata[first] is record
+    assert [data['version'] for data in worker.packages['pkg']] == [
+        '3.0', '1.0']
+    assert not [name for name in os.listdir(str(tmpdir))
+                if name.endswith('.tmp')]
+
+
+def test_snapshot_reuses_unchanged_blobs(tmpdir, monkeypatch):
+    """
+    publishing should not decode the unchanged packages again (even
+    without a store), copying their data from the previous snapshot
+    """
+    pkg_dir = str(tmpdir.mkdir('packages'))
+    snapshot = str(tmpdir.join('packages.snapshot'))
+    first = build_wheel(pkg_dir, 'pkg', '1.0', description='First')
+    builder = SnapshotBuilder(Index(pkg_dir), snapshot)
+    builder.publish()
+
+    decoded = []
+    decode = index_module.decode
+    monkeypatch.setattr(index_module, 'decode',
+                        lambda path: decoded.append(path) or decode(path))
+    second = build_wheel(pkg_dir, 'pkg', '2.0', description='Second')
+    assert builder.publish()
+    assert set(decoded) == {second}
+
+    worker = SnapshotIndex(pkg_dir, snapshot)
+    worker.update()
+    assert worker.description(first).strip() == 'First'
+    assert worker.description(second).strip() == 'Second'
+    with zipfile.ZipFile(first) as archive:
+        raw = archive.read('pkg-1.0.dist-info/METADATA')
+    assert worker.metadata_file(first) == raw
+
+
+def test_snapshot_command_line(tmpdir, monkeypatch):
+    """main should publish snapshots of the given directory"""
+    pkg_dir = str(tmpdir.mkdir('packages'))
+    snapshot = str(tmpdir.join('packages.snapshot'))
+    wheel = build_wheel(pkg_dir, 'pkg', '1.0')
+    monkeypatch.setattr(SnapshotBuilder, 'run',
+                        lambda self, interval: self.publish())
+
+    main([pkg_dir, snapshot, '--store', str(tmpdir.join('pkgs.sqlite'))])
+
+    worker = SnapshotIndex(pkg_dir, snapshot)
+    worker.update()
+    assert set(worker.files) == {wheel}
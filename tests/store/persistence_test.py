@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.store.Store
+"""
+import os
+
+from conftest import build_wheel
+from pypiple import index as index_module
+from pypiple.index import Index
+from pypiple.store import Store
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+def test_store_round_trip(tmpdir):
+    """
+    metadata saved in the store should be loaded back after reopening it
+    """
+    db_path = str(tmpdir.join('db.sqlite'))
+    data = {'name': 'pkg', 'version': '1.0', 'mtime': 1.5, 'size': 10,
+            'classifiers': ['A :: B']}
+
+    store = Store(db_path)
+    store.save({'/a/pkg-1.0.whl': data, '/a/broken.whl': None})
+    store.close()
+
+    store = Store(db_path)
+    assert store.load() == {'/a/pkg-1.0.whl': data}
+
+    store.delete(['/a/pkg-1.0.whl'])
+    assert store.load() == {}
+
+
+def test_index_restart_only_decodes_changes(tmpdir, monkeypatch):
+    """
+    Index should be loaded from the store and, after a restart,
+    decode only packages changed in the meantime
+    """
+    pkg_dir = tmpdir.mkdir('packages')
+    db_path = str(tmpdir.join('packages.sqlite'))
+    first = build_wheel(str(pkg_dir), 'first', '1.0')
+    second = build_wheel(str(pkg_dir), 'second', '1.0')
+
+    index = Index(str(pkg_dir), store=Store(db_path))
+    index.update()
+    index.store.close()
+
+    # simulate changes while the server is down
+    os.remove(second)
+    third = build_wheel(str(pkg_dir), 'third', '1.0')
+
+    decoded = []
+    original = index_module.retrieve_data
+    monkeypatch.setattr(
+        index_module, 'retrieve_data',
+        lambda path, *args: decoded.append(path) or original(path, *args))
+
+    index = Index(str(pkg_dir), store=Store(db_path))
+    assert set(index.metadata) == {first, second}
+
+    modified, removed = index.update()
+    assert decoded == [third]
+    assert modified == {third}
+    assert removed == {second}
+    assert set(Store(db_path).load()) == {first, third}
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.version.version_key
+"""
+import random
+
+from pypiple.version import version_key
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+# Example from PEP 440 (in increasing order) + some variations
+ORDERED = [
+    'not-a-version', '0.9',
+    '1.0.dev456', '1.0a1', '1.0a2.dev456', '1.0a12.dev456', '1.0a12',
+    '1.0b1.dev456', '1.0b2', '1.0b2.post345.dev456', '1.0b2.post345',
+    '1.0rc1.dev456', '1.0rc1', '1.0', '1.0+abc.5', '1.0+abc.7', '1.0+5',
+    '1.0.post456.dev34', '1.0.post456', '1.1.dev1', '9.0', '10.0',
+    '1!0.1',
+]
+
+
+def test_version_key_sort_pep440():
+    """version_key should sort versions according to PEP 440"""
+
+    shuffled = ORDERED[:]
+    random.Random(440).shuffle(shuffled)
+    assert sorted(shuffled, key=version_key) == ORDERED
+
+
+def test_version_key_normalize():
+    """version_key should consider equivalent spellings"""
+
+    assert version_key('1.0.0') == version_key('1.0') == version_key('v1')
+    assert version_key('1.0-alpha.1') == version_key('1.0a1')
+    assert version_key('1.0-1') == version_key('1.0.post1')
+    assert version_key('1.0-RC') == version_key('1.0rc0')
+
+
+def test_version_key_memoized():
+    """version_key should parse each version once"""
+
+    assert version_key('3.2.1') is version_key('3.2.1')
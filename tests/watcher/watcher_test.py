@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Automated tests for pypiple.watcher and Index's watch mode
+"""
+import os
+import sys
+import time
+
+import pytest
+
+from conftest import build_wheel
+from pypiple import index as index_module
+from pypiple.index import Index
+from pypiple.watcher import InotifyWatcher, PollingWatcher
+
+__author__ = 'Anderson Bravalheri'
+__copyright__ = 'Anderson Bravalheri'
+__license__ = 'Mozilla Public License Version 2.0'
+
+
+class FakeWatcher(object):
+    """Watcher whose notifications are triggered manually"""
+
+    def __init__(self):
+        self.notify = None
+
+    def start(self, callback):
+        self.notify = callback
+
+    def stop(self):
+        self.notify = None
+
+
+def wait_for(changes, timeout=5):
+    """Wait until changes are reported"""
+    limit = time.time() + timeout
+    while not changes and time.time() < limit:
+        time.sleep(0.01)
+
+    return changes
+
+
+def check_watcher(watcher, dirpath):
+    """Watcher should report changed files"""
+    changes = []
+    watcher.start(changes.append)
+    try:
+        path = build_wheel(dirpath, 'pkg', '1.0')
+        assert path in set().union(*wait_for(changes))
+
+        del changes[:]
+        os.remove(path)
+        assert path in set().union(*wait_for(changes))
+    finally:
+        watcher.stop()
+
+
+def test_polling_watcher_reports_changes(tmpdir):
+    """PollingWatcher should report added and removed files"""
+    check_watcher(PollingWatcher(str(tmpdir), interval=0.01), str(tmpdir))
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason='inotify is only available on Linux')
+def test_inotify_watcher_reports_changes(tmpdir):
+    """InotifyWatcher should report added and removed files"""
+    check_watcher(InotifyWatcher(str(tmpdir), interval=0.01), str(tmpdir))
+
+
+def test_index_watch_mode_applies_notified_paths(tmpdir, monkeypatch):
+    """
+    Index with watcher should not check the file system for freshness and
+    should only look at the notified paths
+    """
+    dirpath = str(tmpdir)
+    first = build_wheel(dirpath, 'first', '1.0')
+    watcher = FakeWatcher()
+    index = Index(dirpath, watcher=watcher)
+
+    assert index.update() == ({first}, set())
+
+    def forbidden(*_):
+        raise AssertionError('should not access the file system')
+
+    monkeypatch.setattr(index_module, 'getmtime', forbidden)
+    monkeypatch.setattr(Index, 'scan', forbidden)
+    assert index.uptodate()
+    assert index.update() is None
+
+    second = build_wheel(dirpath, 'second', '1.0')
+    os.remove(first)
+    watcher.notify({second, first, os.path.join(dirpath, 'README.txt')})
+
+    assert not index.uptodate()
+    assert index.update() == ({second}, {first})
+    assert set(index.files) == {second}
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason='inotify is only available on Linux')
+def test_inotify_watcher_follows_replaced_directory(tmpdir):
+    """
+    InotifyWatcher should keep watching the path after the directory is
+    replaced (e.g. a new directory renamed into place by a deploy)
+    """
+    dirpath = str(tmpdir.join('packages'))
+    os.mkdir(dirpath)
+    first = build_wheel(dirpath, 'first', '1.0')
+    staging = str(tmpdir.mkdir('staging'))
+    build_wheel(staging, 'second', '1.0')
+    index = Index(dirpath, watcher=InotifyWatcher(dirpath, interval=0.01))
+
+    def wait_files(expected, timeout=5):
+        """Wait until the index contains the expected files"""
+        limit = time.time() + timeout
+        while set(index.files) != expected and time.time() < limit:
+            index.update()
+            time.sleep(0.01)
+        return set(index.files)
+
+    try:
+        assert wait_files({first}) == {first}
+
+        os.rename(dirpath, str(tmpdir.join('old')))
+        os.rename(staging, dirpath)
+        second = os.path.join(dirpath, 'second-1.0-py2.py3-none-any.whl')
+        assert wait_files({second}) == {second}
+
+        third = build_wheel(dirpath, 'third', '1.0')  # => new directory
+        assert wait_files({second, third}) == {second, third}
+
+        os.mkdir(os.path.join(dirpath, 'subdir'))  # => IN_CREATE
+        limit = time.time() + 5
+        while index.uptodate() and time.time() < limit:
+            time.sleep(0.01)
+        assert not index.uptodate()  # => noticed
+    finally:
+        index.close()